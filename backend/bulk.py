@@ -0,0 +1,99 @@
+"""Bulk import from the command line.
+
+    python -m backend.bulk ingest cases.zip      # or a directory
+    python -m backend.bulk status 3
+    python -m backend.bulk failures 3
+    python -m backend.bulk resume                # finish imports of stopped processes
+
+``ingest`` and ``resume`` run the import in this process, print a progress
+line every ``--interval`` seconds and finish with the JSON batch report.
+``resume`` takes over only imports whose process has stopped long enough
+for their lease to run out (``BATCH_LEASE_SECONDS``).
+"""
+
+import argparse
+import json
+import sys
+
+from backend.database import connect, init_db
+from backend.services import bulk
+from backend.services.bulk import batch_manager
+
+
+def _progress_line(p: dict) -> str:
+    c = p["counts"]
+    rate = p["analysis"]["per_minute"] or p["ingest"]["per_minute"]
+    eta = f", eta {p['eta_seconds']:.0f}s" if p["eta_seconds"] else ""
+    return (
+        f"batch {p['id']} {p['status']}: {c['completed']}/{p['total']} completed, "
+        f"{c['failed']} failed, {c['submitted']} in flight, {p['cached']} cached"
+        f"{f', {rate}/min' if rate else ''}{eta}"
+    )
+
+
+def _report(batch_id: int):
+    conn = connect()
+    try:
+        report = bulk.progress(conn, batch_id)
+        report["failures"] = bulk.failures(conn, batch_id)
+    finally:
+        conn.close()
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return report
+
+
+def _follow(batch_id: int, interval: float):
+    while not batch_manager.wait(batch_id, timeout=interval):
+        conn = connect()
+        try:
+            print(_progress_line(bulk.progress(conn, batch_id)), file=sys.stderr)
+        finally:
+            conn.close()
+    return _report(batch_id)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import settlement/bid pairs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="import a ZIP archive or directory")
+    ingest.add_argument("path")
+    ingest.add_argument("--interval", type=float, default=10, help="seconds between progress lines")
+    for name in ("status", "failures"):
+        commands.add_parser(name).add_argument("batch_id", type=int)
+    resume = commands.add_parser("resume", help="finish interrupted imports")
+    resume.add_argument("--interval", type=float, default=10)
+    args = parser.parse_args(argv)
+
+    init_db()
+
+    if args.command == "ingest":
+        try:
+            batch_id = batch_manager.start(bulk.open_source(args.path))
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        report = _follow(batch_id, args.interval)
+        return 1 if report["status"] == "failed" else 0
+
+    if args.command == "resume":
+        for batch_id in batch_manager.resume():
+            _follow(batch_id, args.interval)
+        return 0
+
+    conn = connect()
+    try:
+        progress = bulk.progress(conn, args.batch_id)
+        if not progress:
+            print(f"error: batch {args.batch_id} not found", file=sys.stderr)
+            return 2
+        result = progress if args.command == "status" else bulk.failures(conn, args.batch_id)
+    finally:
+        conn.close()
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,11 +5,122 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent
-UPLOAD_DIR = BASE_DIR / "uploads"
-DB_PATH = BASE_DIR / "settlement_ops.db"
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", BASE_DIR / "uploads"))
+DB_PATH = Path(os.getenv("DB_PATH", BASE_DIR / "settlement_ops.db"))
 
-UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+# SQLite connection pool and per-connection pragmas
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", str(64 * 1024)))
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 CLAUDE_MODEL = "claude-sonnet-4-20250514"
 CLAUDE_MAX_TOKENS = 16000
+
+# Shared Anthropic client: connection pool, rate limits and retries.
+# ANTHROPIC_BASE_URL can point at a local stub server for tests/benchmarks.
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL") or None
+ANTHROPIC_TIMEOUT_SECONDS = float(os.getenv("ANTHROPIC_TIMEOUT_SECONDS", "600"))
+ANTHROPIC_MAX_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "20"))
+ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS", "10"))
+# The async client carries chat streams, each holding a connection open
+ANTHROPIC_ASYNC_MAX_CONNECTIONS = int(os.getenv("ANTHROPIC_ASYNC_MAX_CONNECTIONS", "500"))
+ANTHROPIC_REQUESTS_PER_MINUTE = int(os.getenv("ANTHROPIC_REQUESTS_PER_MINUTE", "50"))
+ANTHROPIC_INPUT_TOKENS_PER_MINUTE = int(os.getenv("ANTHROPIC_INPUT_TOKENS_PER_MINUTE", "400000"))
+ANTHROPIC_MAX_RETRIES = int(os.getenv("ANTHROPIC_MAX_RETRIES", "5"))
+ANTHROPIC_RETRY_BASE_SECONDS = float(os.getenv("ANTHROPIC_RETRY_BASE_SECONDS", "1"))
+ANTHROPIC_RETRY_MAX_SECONDS = float(os.getenv("ANTHROPIC_RETRY_MAX_SECONDS", "60"))
+
+# Background analysis jobs
+ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "4"))
+ANALYSIS_JOB_RETENTION_SECONDS = int(os.getenv("ANALYSIS_JOB_RETENTION_SECONDS", "900"))
+# Where analyses run: "inline" (the API process's job pool) or "workers"
+# (separate `python -m backend.worker` processes; the API only queues them)
+ANALYSIS_EXECUTION = os.getenv("ANALYSIS_EXECUTION", "inline")
+# A claimed analysis is leased for this long and the lease renewed every
+# third of it; an analysis whose lease expires (its process died) is claimed
+# again, up to ANALYSIS_MAX_ATTEMPTS times
+ANALYSIS_LEASE_SECONDS = float(os.getenv("ANALYSIS_LEASE_SECONDS", "60"))
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "3"))
+# How often idle workers look for queued analyses, and the API for progress
+# of analyses running in other processes
+ANALYSIS_QUEUE_POLL_SECONDS = float(os.getenv("ANALYSIS_QUEUE_POLL_SECONDS", "1"))
+# Chunked (map-reduce) analysis of long agreements, opted into per request
+ANALYSIS_CHUNK_PAGES = int(os.getenv("ANALYSIS_CHUNK_PAGES", "40"))
+ANALYSIS_CHUNK_OVERLAP_PAGES = int(os.getenv("ANALYSIS_CHUNK_OVERLAP_PAGES", "1"))
+ANALYSIS_CHUNK_CONCURRENCY = int(os.getenv("ANALYSIS_CHUNK_CONCURRENCY", "8"))
+# Times a dropped analysis stream is resumed from its checkpointed sections
+ANALYSIS_STREAM_RESUMES = int(os.getenv("ANALYSIS_STREAM_RESUMES", "2"))
+# How documents are sent for analysis: "pdf" (the whole file) or "hybrid"
+# (extracted text for pages with a good text layer, images for the rest)
+ANALYSIS_INPUT_MODE = os.getenv("ANALYSIS_INPUT_MODE", "pdf")
+HYBRID_MIN_PAGE_CHARS = int(os.getenv("HYBRID_MIN_PAGE_CHARS", "200"))
+HYBRID_MIN_TEXT_QUALITY = float(os.getenv("HYBRID_MIN_TEXT_QUALITY", "0.8"))
+# Above this many image pages (the API's per-request image limit) the whole PDF is sent
+HYBRID_MAX_IMAGES = int(os.getenv("HYBRID_MAX_IMAGES", "100"))
+HYBRID_RASTER_DPI = int(os.getenv("HYBRID_RASTER_DPI", "150"))
+
+# Uploads
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "300")) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+EXTRACTION_PROCESSES = int(os.getenv("EXTRACTION_PROCESSES", str(os.cpu_count() or 1)))
+EXTRACTION_PAGES_PER_TASK = int(os.getenv("EXTRACTION_PAGES_PER_TASK", "25"))
+# Image uploads are converted and downscaled for the model (services/normalize.py):
+# longest edge in pixels, JPEG quality, and the uplink speed used to estimate
+# the transfer time saved per file
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1568"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_UPLINK_MBPS = float(os.getenv("IMAGE_UPLINK_MBPS", "20"))
+
+# Bulk ingestion and batch analysis
+BULK_MAX_UPLOAD_BYTES = int(os.getenv("BULK_MAX_UPLOAD_MB", "20480")) * 1024 * 1024
+BULK_INGEST_WORKERS = int(os.getenv("BULK_INGEST_WORKERS", "4"))
+# Server directory that POST /api/batches/directory may import from; unset disables it
+BULK_IMPORT_ROOT = os.getenv("BULK_IMPORT_ROOT") or None
+# "anthropic" (Message Batches API) or "local" (in-process fake, one messages.create per request)
+BATCH_BACKEND = os.getenv("BATCH_BACKEND", "anthropic")
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "100"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_MB", "128")) * 1024 * 1024
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "30"))
+# A running import is leased to its process for this long and the lease
+# renewed every third of it; imports whose lease expires are resumed elsewhere
+BATCH_LEASE_SECONDS = float(os.getenv("BATCH_LEASE_SECONDS", "60"))
+# A provider batch whose status or results keep failing to load is polled
+# for this long before its requests are given up on
+BATCH_ERROR_TIMEOUT_SECONDS = float(os.getenv("BATCH_ERROR_TIMEOUT_SECONDS", "86400"))
+
+# Case chat retrieval
+CHAT_CONTEXT_BUDGET_CHARS = int(os.getenv("CHAT_CONTEXT_BUDGET_CHARS", "24000"))
+CHAT_TOP_K = int(os.getenv("CHAT_TOP_K", "8"))
+CHAT_PASSAGE_CHARS = int(os.getenv("CHAT_PASSAGE_CHARS", "1200"))
+CHAT_INDEX_CACHE_SIZE = int(os.getenv("CHAT_INDEX_CACHE_SIZE", "64"))
+CHAT_MAX_TOKENS = 4096
+# Stream deltas are coalesced into one SSE frame until either limit is hit
+CHAT_FLUSH_CHARS = int(os.getenv("CHAT_FLUSH_CHARS", "48"))
+CHAT_FLUSH_SECONDS = float(os.getenv("CHAT_FLUSH_SECONDS", "0.05"))
+# Chat sessions: once the un-summarized history exceeds the budget, all but the
+# most recent messages are folded into the session's rolling summary
+CHAT_HISTORY_BUDGET_TOKENS = int(os.getenv("CHAT_HISTORY_BUDGET_TOKENS", "4000"))
+CHAT_KEEP_MESSAGES = int(os.getenv("CHAT_KEEP_MESSAGES", "6"))
+CHAT_SUMMARY_MAX_TOKENS = 1024
+
+# Citation verification against extracted page text
+CITATION_SHINGLE_WORDS = int(os.getenv("CITATION_SHINGLE_WORDS", "2"))
+CITATION_INDEX_CACHE_SIZE = int(os.getenv("CITATION_INDEX_CACHE_SIZE", "32"))
+
+# Metrics (services/metrics.py): send a Server-Timing header with each
+# response's stage and database timings, and log requests slower than this
+# many seconds with the same breakdown (0 disables)
+METRICS_TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "").lower() in ("1", "true", "yes")
+METRICS_SLOW_REQUEST_SECONDS = float(os.getenv("METRICS_SLOW_REQUEST_SECONDS", "10"))
+
+# Response compression: API responses of at least this many bytes are
+# gzip-compressed for clients that accept it (built frontend files are served
+# from their precompressed .br/.gz variants instead, services/assets.py)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
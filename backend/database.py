@@ -1,6 +1,17 @@
+import queue
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
-from backend.config import DB_PATH
+from backend.config import (
+    DB_PATH,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT_SECONDS,
+    DB_BUSY_TIMEOUT_MS,
+    DB_MMAP_SIZE,
+    DB_CACHE_SIZE_KB,
+)
+from backend.services import metrics
 
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS cases (
@@ -10,16 +21,27 @@ CREATE TABLE IF NOT EXISTS cases (
     settlement_filename TEXT NOT NULL,
     settlement_path     TEXT NOT NULL,
     settlement_media_type TEXT NOT NULL,
+    settlement_sha256   TEXT,
 
     bid_filename    TEXT,
     bid_path        TEXT,
     bid_media_type  TEXT,
+    bid_sha256      TEXT,
     has_bid         INTEGER NOT NULL DEFAULT 0,
 
-    settlement_text TEXT,
-    bid_text        TEXT,
+    -- Converted/downscaled copies sent to the model instead of the original
+    -- (services/normalize.py); NULL when the original is sent
+    settlement_model_path       TEXT,
+    settlement_model_media_type TEXT,
+    settlement_model_sha256     TEXT,
+    bid_model_path              TEXT,
+    bid_model_media_type        TEXT,
+    bid_model_sha256            TEXT,
+
+    extraction_status TEXT NOT NULL DEFAULT 'ready',
+    page_count      INTEGER,
+    extraction_seconds REAL,
 
-    analysis_json   TEXT,
     analysis_status TEXT NOT NULL DEFAULT 'pending',
     analysis_error  TEXT,
 
@@ -28,20 +50,677 @@ CREATE TABLE IF NOT EXISTS cases (
     jurisdiction    TEXT,
     settlement_type TEXT
 );
+
+-- Full extracted text per document and the analysis JSON, zlib-compressed
+-- and kept off the cases row (see services/case_data.py)
+CREATE TABLE IF NOT EXISTS case_texts (
+    case_id     INTEGER NOT NULL,
+    doc         TEXT NOT NULL,
+    body        BLOB NOT NULL,
+    PRIMARY KEY (case_id, doc)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS case_analysis (
+    case_id     INTEGER PRIMARY KEY,
+    body        BLOB NOT NULL,
+    sha256      TEXT  -- of the uncompressed JSON, for ETags
+);
+-- Top-level analysis sections completed while the model response streams;
+-- an interrupted analysis resumes after them. Cleared when the analysis is saved.
+CREATE TABLE IF NOT EXISTS analysis_checkpoints (
+    case_id     INTEGER NOT NULL,
+    position    INTEGER NOT NULL,
+    key         TEXT NOT NULL,
+    value       TEXT NOT NULL,  -- the section's JSON
+    prompt_version TEXT NOT NULL,
+    PRIMARY KEY (case_id, position)
+) WITHOUT ROWID;
+
+-- What ingest did to each uploaded file of a document (services/normalize.py)
+CREATE TABLE IF NOT EXISTS document_files (
+    case_id         INTEGER NOT NULL,
+    doc             TEXT NOT NULL,
+    position        INTEGER NOT NULL,
+    filename        TEXT,
+    detected_type   TEXT,
+    action          TEXT NOT NULL,  -- kept, downscaled, converted or bundled
+    pages           INTEGER,
+    original_bytes  INTEGER NOT NULL,
+    normalized_bytes INTEGER NOT NULL,
+    original_width  INTEGER,
+    original_height INTEGER,
+    width           INTEGER,
+    height          INTEGER,
+    seconds         REAL,
+    PRIMARY KEY (case_id, doc, position)
+) WITHOUT ROWID;
+
+-- Extracted text per PDF page (1-indexed, matching citation page numbers)
+CREATE TABLE IF NOT EXISTS document_pages (
+    id          INTEGER PRIMARY KEY,
+    case_id     INTEGER NOT NULL,
+    doc         TEXT NOT NULL,
+    page_no     INTEGER NOT NULL,
+    text        TEXT NOT NULL,
+    UNIQUE (case_id, doc, page_no)
+);
+
+-- Each analysis citation checked against the cited page's text
+-- (services/citations.py): the page the quote was found on and how much of it matched
+CREATE TABLE IF NOT EXISTS citation_checks (
+    case_id     INTEGER NOT NULL,
+    path        TEXT NOT NULL,     -- dotted analysis path the citation supports
+    position    INTEGER NOT NULL,  -- index in that path's citation list
+    doc         TEXT,
+    page        INTEGER,           -- page as cited
+    quote       TEXT,
+    verified_page INTEGER,         -- page holding most of the quote, nearest the cited one
+    score       REAL NOT NULL,     -- share of the quote's shingles found there (0-1)
+    PRIMARY KEY (case_id, path, position)
+) WITHOUT ROWID;
+
+-- Searchable analysis text, one row per top-level section
+CREATE TABLE IF NOT EXISTS analysis_fields (
+    id          INTEGER PRIMARY KEY,
+    case_id     INTEGER NOT NULL,
+    field       TEXT NOT NULL,
+    text        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_fields_case ON analysis_fields (case_id);
+
+-- Full-text indexes over the two tables above (external content, kept in
+-- sync by triggers so writers only touch the base tables)
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    text, content='document_pages', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS document_pages_ai AFTER INSERT ON document_pages BEGIN
+    INSERT INTO pages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS document_pages_ad AFTER DELETE ON document_pages BEGIN
+    INSERT INTO pages_fts (pages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS analysis_fts USING fts5(
+    text, content='analysis_fields', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS analysis_fields_ai AFTER INSERT ON analysis_fields BEGIN
+    INSERT INTO analysis_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS analysis_fields_ad AFTER DELETE ON analysis_fields BEGIN
+    INSERT INTO analysis_fts (analysis_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+
+-- Analysis sections projected for portfolio queries (services/portfolio.py).
+-- Milestones include the named timeline dates (kind = the timeline key);
+-- due_date is the parsed ISO date, NULL when the text has none.
+CREATE TABLE IF NOT EXISTS milestones (
+    id          INTEGER PRIMARY KEY,
+    case_id     INTEGER NOT NULL,
+    kind        TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    label       TEXT,
+    date_text   TEXT,
+    due_date    TEXT,
+    t_minus     TEXT,
+    status      TEXT,
+    owner       TEXT,
+    notes       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_milestones_case ON milestones (case_id, kind, due_date);
+CREATE INDEX IF NOT EXISTS idx_milestones_due ON milestones (due_date);
+CREATE INDEX IF NOT EXISTS idx_milestones_kind_due ON milestones (kind, due_date);
+CREATE INDEX IF NOT EXISTS idx_milestones_status_due ON milestones (status, due_date);
+CREATE INDEX IF NOT EXISTS idx_milestones_owner_due ON milestones (owner COLLATE NOCASE, due_date);
+
+CREATE TABLE IF NOT EXISTS checklist_items (
+    id          INTEGER PRIMARY KEY,
+    case_id     INTEGER NOT NULL,
+    phase       TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    task        TEXT,
+    details     TEXT,
+    deadline_ref TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_checklist_items_case ON checklist_items (case_id);
+CREATE INDEX IF NOT EXISTS idx_checklist_items_phase ON checklist_items (phase, case_id, position);
+
+CREATE TABLE IF NOT EXISTS conflicts (
+    id          INTEGER PRIMARY KEY,
+    case_id     INTEGER NOT NULL,
+    position    INTEGER NOT NULL,
+    category    TEXT,
+    settlement_says TEXT,
+    bid_says    TEXT,
+    severity    TEXT,
+    recommendation TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_conflicts_case ON conflicts (case_id);
+CREATE INDEX IF NOT EXISTS idx_conflicts_severity ON conflicts (severity, case_id, position);
+
+CREATE TABLE IF NOT EXISTS fund_logistics (
+    case_id     INTEGER PRIMARY KEY,
+    gross_settlement TEXT,
+    gross_settlement_amount REAL,
+    admin_cap   TEXT,
+    attorney_fees TEXT,
+    service_awards TEXT,
+    net_fund    TEXT,
+    net_fund_amount REAL,
+    qsf_required INTEGER,
+    tax_id_setup TEXT,
+    payment_methods TEXT  -- JSON array
+);
+CREATE INDEX IF NOT EXISTS idx_fund_logistics_gross ON fund_logistics (gross_settlement_amount);
+
+-- Token usage of each model call made for a case
+CREATE TABLE IF NOT EXISTS model_usage (
+    id          INTEGER PRIMARY KEY,
+    case_id     INTEGER NOT NULL,
+    kind        TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    created_at  TEXT NOT NULL DEFAULT (datetime('now')),
+    input_tokens                INTEGER NOT NULL DEFAULT 0,
+    output_tokens               INTEGER NOT NULL DEFAULT 0,
+    cache_creation_input_tokens INTEGER NOT NULL DEFAULT 0,
+    cache_read_input_tokens     INTEGER NOT NULL DEFAULT 0,
+    -- How the documents were sent ("pdf", "hybrid", "chunked"), the request
+    -- size and the call's wall time, for comparing input modes
+    input_mode      TEXT,
+    request_bytes   INTEGER,
+    latency_seconds REAL
+);
+CREATE INDEX IF NOT EXISTS idx_model_usage_case ON model_usage (case_id);
+
+-- Content-addressed upload store; a blob is removed once no case references it
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256      TEXT PRIMARY KEY,
+    path        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    refcount    INTEGER NOT NULL DEFAULT 0,
+    created_at  TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+-- Bulk imports (services/bulk.py): one row per archive/directory, one item
+-- per settlement/bid pair. Times are Unix timestamps, for throughput.
+CREATE TABLE IF NOT EXISTS batches (
+    id          INTEGER PRIMARY KEY,
+    created_at  TEXT NOT NULL DEFAULT (datetime('now')),
+    source      TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'ingesting',  -- ingesting | analyzing | completed | failed
+    total       INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    started_at  REAL,
+    ingested_at REAL,
+    finished_at REAL,
+    lease_owner TEXT,  -- process running the import, renewed until lease_expires_at
+    lease_expires_at REAL
+);
+CREATE TABLE IF NOT EXISTS batch_items (
+    id          INTEGER PRIMARY KEY,
+    batch_id    INTEGER NOT NULL,
+    position    INTEGER NOT NULL,
+    settlement_name TEXT NOT NULL,
+    bid_name    TEXT,
+    case_id     INTEGER,
+    -- pending | ingested | submitted | completed | failed
+    status      TEXT NOT NULL DEFAULT 'pending',
+    custom_id   TEXT,
+    provider_batch_id TEXT,
+    cached      INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_batch_items_batch ON batch_items (batch_id, status);
+CREATE INDEX IF NOT EXISTS idx_batch_items_provider ON batch_items (provider_batch_id, custom_id);
+CREATE INDEX IF NOT EXISTS idx_batch_items_case ON batch_items (case_id);
+
+-- Analyses to run (services/analysis_queue.py), one row per case. A process
+-- claims a row by taking a lease (owner + expiry) and renews it while it
+-- works; a running row whose lease has expired is claimed again. Times are
+-- Unix timestamps.
+CREATE TABLE IF NOT EXISTS analysis_queue (
+    case_id     INTEGER PRIMARY KEY,
+    status      TEXT NOT NULL DEFAULT 'queued',  -- queued | running | completed | failed
+    stage       TEXT NOT NULL DEFAULT 'queued',
+    chunked     INTEGER NOT NULL DEFAULT 0,
+    input_mode  TEXT,
+    force       INTEGER NOT NULL DEFAULT 0,  -- re-run even if a result is stored or cached
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    cached      INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    enqueued_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_queue_status ON analysis_queue (status, enqueued_at);
+
+-- Case chat sessions (services/chat_sessions.py). Messages up to
+-- summarized_through have been folded into summary and are no longer sent
+-- to the model. Usage columns are set on assistant messages only; the
+-- history_tokens columns estimate the history sent with the turn and what
+-- resending the whole conversation would have cost.
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    id          INTEGER PRIMARY KEY,
+    case_id     INTEGER NOT NULL,
+    title       TEXT NOT NULL,
+    summary     TEXT,
+    summarized_through INTEGER NOT NULL DEFAULT 0,
+    summary_input_tokens  INTEGER NOT NULL DEFAULT 0,
+    summary_output_tokens INTEGER NOT NULL DEFAULT 0,
+    created_at  TEXT NOT NULL DEFAULT (datetime('now')),
+    updated_at  TEXT NOT NULL DEFAULT (datetime('now'))
+);
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_case ON chat_sessions (case_id, updated_at);
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id          INTEGER PRIMARY KEY,
+    session_id  INTEGER NOT NULL,
+    role        TEXT NOT NULL,  -- user | assistant
+    content     TEXT NOT NULL,
+    created_at  TEXT NOT NULL DEFAULT (datetime('now')),
+    input_tokens                INTEGER,
+    output_tokens               INTEGER,
+    cache_creation_input_tokens INTEGER,
+    cache_read_input_tokens     INTEGER,
+    history_tokens      INTEGER,
+    full_history_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, id);
+
+-- Analysis results shared across cases with identical documents
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    cache_key         TEXT PRIMARY KEY,
+    settlement_sha256 TEXT NOT NULL,
+    bid_sha256        TEXT,
+    prompt_version    TEXT NOT NULL,
+    model             TEXT NOT NULL,
+    analysis_json     TEXT NOT NULL,
+    created_at        TEXT NOT NULL DEFAULT (datetime('now'))
+);
 """
 
+# Columns added after a table was first released. CREATE TABLE IF NOT EXISTS
+# leaves existing databases untouched, so these are added on startup.
+ADDED_COLUMNS = {
+    "cases": [
+        ("settlement_sha256", "TEXT"),
+        ("bid_sha256", "TEXT"),
+        ("extraction_status", "TEXT NOT NULL DEFAULT 'ready'"),
+        ("page_count", "INTEGER"),
+        ("extraction_seconds", "REAL"),
+        ("settlement_model_path", "TEXT"),
+        ("settlement_model_media_type", "TEXT"),
+        ("settlement_model_sha256", "TEXT"),
+        ("bid_model_path", "TEXT"),
+        ("bid_model_media_type", "TEXT"),
+        ("bid_model_sha256", "TEXT"),
+    ],
+    "case_analysis": [
+        ("sha256", "TEXT"),
+    ],
+    "model_usage": [
+        ("input_mode", "TEXT"),
+        ("request_bytes", "INTEGER"),
+        ("latency_seconds", "REAL"),
+    ],
+    "analysis_queue": [
+        ("force", "INTEGER NOT NULL DEFAULT 0"),
+    ],
+    "batches": [
+        ("lease_owner", "TEXT"),
+        ("lease_expires_at", "REAL"),
+    ],
+}
+
+
+def _add_missing_columns(conn: sqlite3.Connection):
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+        for name, decl in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+    conn.commit()
+
+
+# Composite indexes for the keyset-paginated, filtered case list, plus a
+# maintained row count per filter value so totals never need COUNT(*).
+_CASE_LIST_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_cases_created ON cases (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_cases_status_created ON cases (analysis_status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_cases_jurisdiction_created ON cases (jurisdiction, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_cases_type_created ON cases (settlement_type, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_cases_bid_created ON cases (has_bid, created_at, id);
+
+CREATE TABLE IF NOT EXISTS case_counts (
+    dimension   TEXT NOT NULL,
+    value       TEXT NOT NULL,
+    n           INTEGER NOT NULL,
+    PRIMARY KEY (dimension, value)
+);
+DELETE FROM case_counts;
+INSERT INTO case_counts (dimension, value, n)
+    SELECT 'all', '', COUNT(*) FROM cases;
+INSERT INTO case_counts (dimension, value, n)
+    SELECT 'analysis_status', analysis_status, COUNT(*) FROM cases GROUP BY 2;
+INSERT INTO case_counts (dimension, value, n)
+    SELECT 'jurisdiction', COALESCE(jurisdiction, ''), COUNT(*) FROM cases GROUP BY 2;
+INSERT INTO case_counts (dimension, value, n)
+    SELECT 'settlement_type', COALESCE(settlement_type, ''), COUNT(*) FROM cases GROUP BY 2;
+INSERT INTO case_counts (dimension, value, n)
+    SELECT 'has_bid', has_bid, COUNT(*) FROM cases GROUP BY 2;
+
+CREATE TRIGGER IF NOT EXISTS cases_count_ai AFTER INSERT ON cases BEGIN
+    INSERT INTO case_counts (dimension, value, n) VALUES
+        ('all', '', 1),
+        ('analysis_status', new.analysis_status, 1),
+        ('jurisdiction', COALESCE(new.jurisdiction, ''), 1),
+        ('settlement_type', COALESCE(new.settlement_type, ''), 1),
+        ('has_bid', new.has_bid, 1)
+    ON CONFLICT (dimension, value) DO UPDATE SET n = n + excluded.n;
+END;
+CREATE TRIGGER IF NOT EXISTS cases_count_ad AFTER DELETE ON cases BEGIN
+    INSERT INTO case_counts (dimension, value, n) VALUES
+        ('all', '', -1),
+        ('analysis_status', old.analysis_status, -1),
+        ('jurisdiction', COALESCE(old.jurisdiction, ''), -1),
+        ('settlement_type', COALESCE(old.settlement_type, ''), -1),
+        ('has_bid', old.has_bid, -1)
+    ON CONFLICT (dimension, value) DO UPDATE SET n = n + excluded.n;
+END;
+CREATE TRIGGER IF NOT EXISTS cases_count_au
+AFTER UPDATE OF analysis_status, jurisdiction, settlement_type, has_bid ON cases BEGIN
+    INSERT INTO case_counts (dimension, value, n) VALUES
+        ('analysis_status', old.analysis_status, -1),
+        ('jurisdiction', COALESCE(old.jurisdiction, ''), -1),
+        ('settlement_type', COALESCE(old.settlement_type, ''), -1),
+        ('has_bid', old.has_bid, -1),
+        ('analysis_status', new.analysis_status, 1),
+        ('jurisdiction', COALESCE(new.jurisdiction, ''), 1),
+        ('settlement_type', COALESCE(new.settlement_type, ''), 1),
+        ('has_bid', new.has_bid, 1)
+    ON CONFLICT (dimension, value) DO UPDATE SET n = n + excluded.n;
+END;
+"""
+
+
+def _move_case_payloads(conn: sqlite3.Connection):
+    """Compress inline settlement_text, bid_text and analysis_json into the
+    side tables and drop the columns from cases."""
+    from backend.services.case_data import compress
+
+    existing = {r[1] for r in conn.execute("PRAGMA table_info(cases)")}
+    for column, table, doc in (
+        ("settlement_text", "case_texts", "settlement"),
+        ("bid_text", "case_texts", "bid"),
+        ("analysis_json", "case_analysis", None),
+    ):
+        if column not in existing:
+            continue
+        rows = conn.execute(
+            f"SELECT id, {column} FROM cases WHERE {column} IS NOT NULL"
+        ).fetchall()
+        if doc:
+            conn.executemany(
+                "INSERT OR REPLACE INTO case_texts (case_id, doc, body) VALUES (?, ?, ?)",
+                [(case_id, doc, compress(text)) for case_id, text in rows],
+            )
+        else:
+            conn.executemany(
+                "INSERT OR REPLACE INTO case_analysis (case_id, body) VALUES (?, ?)",
+                [(case_id, compress(text)) for case_id, text in rows],
+            )
+        conn.execute(f"ALTER TABLE cases DROP COLUMN {column}")
+
+
+def _hash_case_analysis(conn: sqlite3.Connection):
+    """Fill in case_analysis.sha256 for analyses stored without one."""
+    from backend.services.case_data import decompress, digest
+
+    rows = conn.execute("SELECT case_id, body FROM case_analysis WHERE sha256 IS NULL").fetchall()
+    conn.executemany(
+        "UPDATE case_analysis SET sha256 = ? WHERE case_id = ?",
+        [(digest(decompress(body)), case_id) for case_id, body in rows],
+    )
+
+
+def _project_analyses(conn: sqlite3.Connection):
+    """Fill the portfolio tables from analyses stored before they existed."""
+    from backend.services import portfolio
+
+    portfolio.backfill(conn)
+
+
+def _verify_citations(conn: sqlite3.Connection):
+    """Check the citations of analyses stored before verification existed."""
+    from backend.services import citations
+
+    citations.backfill(conn)
+
+
+def _queue_page_extraction(conn: sqlite3.Connection):
+    """Mark cases stored before per-page text existed for re-extraction.
+
+    Their documents are still on disk; startup extracts every case left
+    'extracting' (``extraction.resume_pending``), which fills document_pages,
+    the page index and the citation checks.
+    """
+    conn.execute(
+        """UPDATE cases SET extraction_status = 'extracting'
+           WHERE extraction_status = 'ready'
+             AND 'application/pdf' IN (settlement_media_type, bid_media_type)
+             AND id NOT IN (SELECT case_id FROM document_pages)"""
+    )
+
+
+# Schema changes beyond what SCHEMA and ADDED_COLUMNS can express (indexes on
+# added columns, backfills, triggers). Each step, an SQL script or a function
+# taking the connection, runs once in its own transaction, in order, and
+# PRAGMA user_version records how many have been applied. Append only.
+MIGRATIONS = [
+    _CASE_LIST_INDEXES,
+    _move_case_payloads,
+    _hash_case_analysis,
+    _project_analyses,
+    _verify_citations,
+    _queue_page_extraction,
+]
+
+
+def _migrate(conn: sqlite3.Connection):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        if callable(step):
+            conn.execute("BEGIN")
+            try:
+                step(conn)
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        else:
+            conn.executescript(f"BEGIN;\n{step}\nPRAGMA user_version = {number};\nCOMMIT;")
+
 
 def init_db():
     conn = sqlite3.connect(str(DB_PATH))
     conn.execute("PRAGMA journal_mode=WAL")
     conn.executescript(SCHEMA)
+    _add_missing_columns(conn)
+    _migrate(conn)
     conn.close()
 
 
-def get_db():
-    conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
+class TimedConnection(sqlite3.Connection):
+    """A connection whose statements are timed into the query metrics."""
+
+    def execute(self, sql, parameters=(), /):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.observe_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, parameters, /):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            metrics.observe_query(sql, time.perf_counter() - started)
+
+
+def _configure(conn: sqlite3.Connection) -> sqlite3.Connection:
     conn.row_factory = sqlite3.Row
-    try:
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous = NORMAL")  # durable enough under WAL
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+def connect() -> sqlite3.Connection:
+    """Open a dedicated connection for long-running work outside the request
+    cycle (e.g. background jobs), configured like pooled ones."""
+    return _configure(
+        sqlite3.connect(str(DB_PATH), check_same_thread=False, factory=TimedConnection)
+    )
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no pooled connection frees up within DB_POOL_TIMEOUT_SECONDS."""
+
+
+class ConnectionPool:
+    """A bounded pool of configured SQLite connections.
+
+    Connections are opened lazily up to ``size`` and handed out most recently
+    used first, so a lightly loaded process keeps its page cache warm.
+    """
+
+    def __init__(self, path: str, size: int, timeout: float):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._in_use = 0
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_seconds = 0.0
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            self._acquired += 1
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+                if self._opened < self.size:
+                    self._opened += 1
+                    conn = _configure(sqlite3.connect(
+                        self.path, check_same_thread=False, factory=TimedConnection
+                    ))
+            if conn is not None:
+                self._in_use += 1
+                return conn
+            self._waits += 1
+
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"No database connection available within {self.timeout}s")
+        with self._lock:
+            self._wait_seconds += time.perf_counter() - started
+            self._in_use += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "opened": self._opened,
+                "in_use": self._in_use,
+                "idle": self._opened - self._in_use,
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "wait_seconds": round(self._wait_seconds, 4),
+            }
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._opened = self._in_use
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(str(DB_PATH), DB_POOL_SIZE, DB_POOL_TIMEOUT_SECONDS)
+        return _pool
+
+
+def get_db():
+    with get_pool().connection() as conn:
         yield conn
-    finally:
-        conn.close()
+
+
+# All writes in this process go through one lock, so writers queue here in
+# order instead of racing for SQLite's file lock and failing with
+# "database is locked". busy_timeout still covers other processes.
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """Run a write transaction on the serialized writer path.
+
+    Commits on success, rolls back on error. ``BEGIN IMMEDIATE`` takes the
+    database write lock up front so a transaction never fails half way
+    through on lock upgrade.
+    """
+    waiting = time.perf_counter()
+    with _write_lock:
+        started = time.perf_counter()
+        metrics.DB_TRANSACTION_SECONDS.observe(started - waiting, "lock_wait")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+        finally:
+            metrics.DB_TRANSACTION_SECONDS.observe(time.perf_counter() - started, "held")
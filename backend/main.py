@@ -3,15 +3,31 @@
 import os
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
 
-from backend.database import init_db
-from backend.routers import cases
+from backend.config import COMPRESS_LEVEL, COMPRESS_MIN_BYTES
+from backend.database import connect, get_pool, init_db
+from backend.routers import batches, cases, portfolio
+from backend.services import extraction, metrics, search
+from backend.services.bulk import batch_manager
+from backend.services.jobs import job_manager
 
 app = FastAPI(title="Settlement Ops API")
 
+# Inside the metrics middleware, so request timings include compression and
+# response bytes are counted as sent. Stored documents are already compressed.
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=COMPRESS_MIN_BYTES,
+    compresslevel=COMPRESS_LEVEL,
+    exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/pdf",),
+)
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -20,11 +36,21 @@ app.add_middleware(
 )
 
 app.include_router(cases.router)
+app.include_router(portfolio.router)
+app.include_router(batches.router)
 
 
 @app.on_event("startup")
 def startup():
     init_db()
+    conn = connect()
+    try:
+        search.backfill(conn)
+        extraction.resume_pending(conn)
+    finally:
+        conn.close()
+    batch_manager.watch()
+    job_manager.start()
 
 
 @app.get("/api/health")
@@ -32,16 +58,37 @@ def health():
     return {"status": "ok"}
 
 
-# Serve the Vite-built frontend in production
+@app.get("/api/ready")
+def ready():
+    """Readiness: the database answers through the pool. Includes pool stats."""
+    pool = get_pool()
+    try:
+        with pool.connection() as conn:
+            conn.execute("SELECT 1").fetchone()
+    except Exception as e:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "error": str(e), "db_pool": pool.stats()},
+        )
+    return {"status": "ready", "db_pool": pool.stats()}
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition of the process's metrics."""
+    for state, value in get_pool().stats().items():
+        if state in ("opened", "in_use", "idle"):
+            metrics.DB_POOL.set(value, state)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# Serve the Vite-built frontend in production (services/assets.py)
 _dist = Path(__file__).resolve().parent.parent / "dist"
 if _dist.is_dir():
-    from fastapi.responses import FileResponse
+    from backend.services.assets import Frontend
 
-    app.mount("/assets", StaticFiles(directory=_dist / "assets"), name="assets")
+    _frontend = Frontend(_dist)
 
     @app.get("/{full_path:path}")
-    def serve_spa(full_path: str):
-        file = _dist / full_path
-        if file.is_file():
-            return FileResponse(file)
-        return FileResponse(_dist / "index.html")
+    def serve_spa(full_path: str, request: Request):
+        return _frontend.response(request, full_path)
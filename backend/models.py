@@ -2,12 +2,32 @@ from pydantic import BaseModel
 from typing import Optional
 
 
+class DocumentFile(BaseModel):
+    doc: str  # "settlement" or "bid"
+    position: int
+    filename: Optional[str] = None
+    detected_type: Optional[str] = None  # from the file's magic bytes
+    action: str  # "kept", "downscaled", "converted" or "bundled"
+    pages: Optional[int] = None
+    original_bytes: int
+    normalized_bytes: int
+    original_width: Optional[int] = None
+    original_height: Optional[int] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    seconds: Optional[float] = None
+    bytes_saved: int
+    transfer_seconds_saved: float  # at IMAGE_UPLINK_MBPS
+
+
 class UploadResponse(BaseModel):
     id: int
     settlement_filename: str
     bid_filename: Optional[str] = None
     has_bid: bool
     analysis_status: str
+    extraction_status: str = "ready"
+    files: list[DocumentFile] = []
 
 
 class AnalyzeResponse(BaseModel):
@@ -18,6 +38,18 @@ class AnalyzeResponse(BaseModel):
     cached: bool = False
 
 
+class AnalysisJobResponse(BaseModel):
+    job_id: str
+    case_id: int
+    status: str  # "queued" | "running" | "completed" | "failed"
+    stage: str
+    chunked: bool = False
+    input_mode: Optional[str] = None
+    force: bool = False
+    analysis_error: Optional[str] = None
+    events_url: str
+
+
 class CaseDetail(BaseModel):
     id: int
     created_at: str
@@ -25,6 +57,9 @@ class CaseDetail(BaseModel):
     bid_filename: Optional[str] = None
     has_bid: bool
     analysis_status: str
+    extraction_status: str = "ready"
+    page_count: Optional[int] = None
+    extraction_pages_per_sec: Optional[float] = None
     analysis_json: Optional[dict] = None
     analysis_error: Optional[str] = None
     case_name: Optional[str] = None
@@ -33,6 +68,13 @@ class CaseDetail(BaseModel):
     settlement_type: Optional[str] = None
 
 
+class PageText(BaseModel):
+    case_id: int
+    doc: str  # "settlement" or "bid"
+    page_no: int
+    text: str
+
+
 class CaseListItem(BaseModel):
     id: int
     created_at: str
@@ -46,14 +88,213 @@ class CaseListItem(BaseModel):
     settlement_type: Optional[str] = None
 
 
+class CaseListPage(BaseModel):
+    items: list[CaseListItem]
+    next_cursor: Optional[str] = None
+    total: int
+    total_is_estimate: bool = False
+
+
+class SearchHit(BaseModel):
+    case_id: int
+    case_name: Optional[str] = None
+    doc: str  # "settlement", "bid" or "analysis"
+    page_no: Optional[int] = None  # 1-indexed, for document hits
+    field: Optional[str] = None  # analysis section, for analysis hits
+    snippet: str
+    score: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    hits: list[SearchHit]
+
+
+class UsageTotals(BaseModel):
+    kind: str  # "analysis", "batch_analysis" or "chat"
+    calls: int
+    cache_hits: int
+    input_tokens: int
+    output_tokens: int
+    cache_creation_input_tokens: int
+    cache_read_input_tokens: int
+
+
+class UsageResponse(BaseModel):
+    case_id: int
+    usage: list[UsageTotals]
+
+
+class InputModeStats(BaseModel):
+    input_mode: str  # "pdf", "hybrid" or "chunked"
+    calls: int
+    cases: int
+    avg_request_bytes: Optional[float] = None
+    avg_input_tokens: Optional[float] = None  # including prompt-cache reads and writes
+    avg_output_tokens: Optional[float] = None
+    avg_latency_seconds: Optional[float] = None
+
+
+class DeadlineItem(BaseModel):
+    case_id: int
+    case_name: Optional[str] = None
+    case_number: Optional[str] = None
+    kind: str  # "milestone" or a timeline key such as "claims_deadline"
+    label: Optional[str] = None
+    date_text: Optional[str] = None
+    due_date: Optional[str] = None  # ISO date parsed from date_text
+    t_minus: Optional[str] = None
+    status: Optional[str] = None
+    owner: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class ConflictItem(BaseModel):
+    case_id: int
+    case_name: Optional[str] = None
+    case_number: Optional[str] = None
+    category: Optional[str] = None
+    settlement_says: Optional[str] = None
+    bid_says: Optional[str] = None
+    severity: Optional[str] = None
+    recommendation: Optional[str] = None
+
+
+class ChecklistItem(BaseModel):
+    case_id: int
+    case_name: Optional[str] = None
+    case_number: Optional[str] = None
+    phase: str
+    task: Optional[str] = None
+    details: Optional[str] = None
+    deadline_ref: Optional[str] = None
+
+
+class FundItem(BaseModel):
+    case_id: int
+    case_name: Optional[str] = None
+    case_number: Optional[str] = None
+    gross_settlement: Optional[str] = None
+    gross_settlement_amount: Optional[float] = None
+    admin_cap: Optional[str] = None
+    attorney_fees: Optional[str] = None
+    service_awards: Optional[str] = None
+    net_fund: Optional[str] = None
+    net_fund_amount: Optional[float] = None
+    qsf_required: Optional[bool] = None
+    tax_id_setup: Optional[str] = None
+    payment_methods: list[str] = []
+
+
+class CitationCheck(BaseModel):
+    path: str  # dotted analysis path, e.g. "timeline.milestones[0].date"
+    position: int
+    doc: Optional[str] = None
+    page: Optional[int] = None  # as cited
+    quote: Optional[str] = None
+    verified_page: Optional[int] = None  # where the quote was found
+    score: float  # share of the quote found on verified_page, 0-1
+
+
+class CitationReport(BaseModel):
+    case_id: int
+    total: int
+    verified: int  # score >= 0.6
+    corrected: int  # verified on a different page than cited
+    unmatched: int
+    citations: list[CitationCheck]
+
+
+class BatchDirectoryRequest(BaseModel):
+    path: str  # directory under BULK_IMPORT_ROOT
+
+
+class BatchThroughput(BaseModel):
+    done: int
+    seconds: Optional[float] = None
+    per_minute: Optional[float] = None
+
+
+class BatchProgress(BaseModel):
+    id: int
+    source: str
+    status: str  # "ingesting", "analyzing", "completed" or "failed"
+    created_at: str
+    error: Optional[str] = None
+    total: int
+    counts: dict[str, int]  # items per status: pending, ingested, submitted, completed, failed
+    cached: int  # completed from the analysis cache
+    provider_batches: list[str]
+    ingest: BatchThroughput
+    analysis: BatchThroughput
+    eta_seconds: Optional[float] = None
+
+
+class BatchFailure(BaseModel):
+    position: int
+    settlement_name: str
+    bid_name: Optional[str] = None
+    case_id: Optional[int] = None
+    error: Optional[str] = None
+
+
 class DeleteResponse(BaseModel):
     deleted: bool
 
 
+class ChatRequest(BaseModel):
+    message: str
+    session_id: Optional[int] = None  # omitted: start a new session
+
+
+class ChatSessionItem(BaseModel):
+    id: int
+    title: str
+    created_at: str
+    updated_at: str
+    message_count: int
+    compacted: bool  # older turns have been folded into a summary
+
+
+class ChatSessionList(BaseModel):
+    case_id: int
+    sessions: list[ChatSessionItem]
+
+
 class ChatMessage(BaseModel):
+    id: int
     role: str  # "user" or "assistant"
     content: str
+    created_at: str
+    # Assistant messages: usage of the turn, and estimated tokens of the
+    # history sent with it versus resending the whole conversation
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cache_creation_input_tokens: Optional[int] = None
+    cache_read_input_tokens: Optional[int] = None
+    history_tokens: Optional[int] = None
+    full_history_tokens: Optional[int] = None
 
 
-class ChatRequest(BaseModel):
+class ChatSessionUsage(BaseModel):
+    turns: int
+    input_tokens: int
+    output_tokens: int
+    cache_creation_input_tokens: int
+    cache_read_input_tokens: int
+    history_tokens: int
+    full_history_tokens: int
+    summary_input_tokens: int
+    summary_output_tokens: int
+
+
+class ChatSessionDetail(BaseModel):
+    id: int
+    case_id: int
+    title: str
+    created_at: str
+    updated_at: str
+    summary: Optional[str] = None
+    summarized_through: int
     messages: list[ChatMessage]
+    usage: ChatSessionUsage
@@ -2,8 +2,13 @@
 Python port of prompts.js — prompt definitions for Settlement Ops AI analysis.
 """
 
+import functools
+import hashlib
 import json
 
+# Marks the end of a stable prompt prefix for Anthropic prompt caching.
+CACHE_CONTROL = {"type": "ephemeral"}
+
 OUTPUT_SCHEMA = {
     "case_name": "string",
     "case_number": "string",
@@ -95,6 +100,7 @@ OUTPUT_SCHEMA = {
 }
 
 
+@functools.lru_cache(maxsize=2)
 def build_system_prompt(has_bid: bool) -> str:
     schema = OUTPUT_SCHEMA if has_bid else {**OUTPUT_SCHEMA, "conflict_audit": []}
     schema_str = json.dumps(schema, separators=(",", ":"))
@@ -121,46 +127,219 @@ def build_system_prompt(has_bid: bool) -> str:
     return "\n".join(parts)
 
 
-def build_chat_system_prompt(analysis_json: dict, settlement_text: str, bid_text: str = None) -> str:
-    """Build system prompt for the case chatbot, grounded in analysis + raw text."""
-    analysis_str = json.dumps(analysis_json, indent=2)
+@functools.lru_cache(maxsize=2)
+def build_chunk_system_prompt(has_bid: bool) -> str:
+    """System prompt for one page range of a long Settlement (chunked analysis)."""
+    schema = OUTPUT_SCHEMA if has_bid else {**OUTPUT_SCHEMA, "conflict_audit": []}
+    schema_str = json.dumps(schema, separators=(",", ":"))
+
+    parts = [
+        "You are an expert Legal Operations and Class Action Project Manager.",
+        f'You will receive one excerpt (a range of pages) of a long Settlement Agreement{" and the complete Administrative Bid" if has_bid else ""}.',
+        "The other excerpts are analyzed separately and the results are merged, so report only what this excerpt states.",
+        "Respond ONLY with valid JSON (no markdown, no backticks) using this structure:",
+        schema_str,
+        "Use ONLY the provided documents.",
+        "Use null for fields and [] for lists this excerpt does not address; do not write placeholders such as [TBD] for them.",
+        "Use strict legal terminology.",
+        "List every milestone, deadline and operational task this excerpt supports.",
+        "For every factual data point you extract, record its source in the 'citations' object.",
+        "The key is the dotted JSON path (e.g. 'fund_logistics.gross_settlement', 'timeline.milestones[0].date', 'timeline.preliminary_approval').",
+        "Each value is an array of {doc, page, quote} objects.",
+        "'doc' must be 'settlement' or 'bid'. For the settlement, 'page' is the page number within the excerpt (1 = its first page); for the bid, the 1-indexed PDF page number. 'quote' is a verbatim 30-80 character excerpt from that page.",
+        "If a data point cannot be traced to a specific page, omit its citation entry.",
+    ]
+    if has_bid:
+        parts.append("Record in conflict_audit only conflicts between this excerpt and the Bid.")
+    else:
+        parts.append('Set "conflict_audit" to an empty array since no Bid was provided.')
+
+    return "\n".join(parts)
+
+
+def build_chunk_system_blocks(has_bid: bool) -> list:
+    return [{"type": "text", "text": build_chunk_system_prompt(has_bid), "cache_control": CACHE_CONTROL}]
+
+
+def build_system_blocks(has_bid: bool) -> list:
+    """System prompt as a cacheable text block for ``messages.create(system=...)``."""
+    return [{"type": "text", "text": build_system_prompt(has_bid), "cache_control": CACHE_CONTROL}]
+
+
+# Identifies the prompt/schema revision in analysis cache keys; changes whenever
+# the schema or the wording of the whole-document or chunk system prompts changes.
+PROMPT_VERSION = hashlib.sha256(
+    "".join(
+        build(has_bid) for build in (build_system_prompt, build_chunk_system_prompt) for has_bid in (True, False)
+    ).encode("utf-8")
+).hexdigest()[:16]
+
+
+def _format_passage(passage: dict) -> str:
+    doc = "Settlement" if passage["doc"] == "settlement" else "Bid"
+    where = f"{doc} p. {passage['page_no']}" if passage.get("page_no") else doc
+    return f"[{where}]\n{passage['text']}"
 
-    # Truncate raw text to 50K chars each to stay within context limits
-    max_text = 50_000
-    settlement_excerpt = (settlement_text or "")[:max_text]
-    bid_excerpt = (bid_text or "")[:max_text] if bid_text else None
 
+def build_chat_system_prompt(core_analysis: dict, summary: str = None) -> list:
+    """Build the system prompt for the case chatbot as cacheable text blocks.
+
+    Only content that is stable for the whole conversation goes in the cached
+    block (the instructions and the core analysis fields), so it is served
+    from the prompt cache on every turn after the first. The summary of
+    compacted turns follows it uncached. Per-turn excerpts are sent with the
+    question via ``build_chat_turn``.
+    """
     parts = [
         "You are an expert legal operations assistant for class action settlement administration.",
-        "Answer questions using ONLY the provided documents below. Be concise, use bullet points where helpful, and cite which document (Settlement or Bid) your information comes from.",
-        "If the answer is not found in the provided documents, say so clearly — do not speculate.",
-        "",
-        "=== STRUCTURED ANALYSIS ===",
-        analysis_str,
+        "Answer questions using ONLY the provided documents. Be concise, use bullet points where helpful, and cite the document and page your information comes from, e.g. (Settlement p. 12).",
+        "Each question arrives with excerpts retrieved for it from the documents and the structured analysis; they are not the full documents. If the answer is not found in them, say so clearly — do not speculate.",
         "",
-        "=== SETTLEMENT AGREEMENT TEXT ===",
-        settlement_excerpt,
+        "=== STRUCTURED ANALYSIS (CORE FIELDS) ===",
+        json.dumps(core_analysis, indent=2),
     ]
+    blocks = [{"type": "text", "text": "\n".join(parts), "cache_control": CACHE_CONTROL}]
+    if summary:
+        blocks.append({"type": "text", "text": "=== EARLIER CONVERSATION (SUMMARY) ===\n" + summary})
+    return blocks
 
-    if bid_excerpt:
-        parts.append("")
-        parts.append("=== ADMINISTRATIVE BID TEXT ===")
-        parts.append(bid_excerpt)
 
-    return "\n".join(parts)
+CHAT_SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a settlement administration analyst and an assistant about one class action case.
+Merge the previous summary (if any) with the new turns into one updated summary. Keep every question asked, the facts, figures, dates and page citations given in answers, and any open follow-ups or decisions. Drop pleasantries and repetition. Write plain prose or short bullets, no more than 400 words, and nothing else."""
+
+
+def build_chat_summary_request(previous_summary: str, messages: list) -> list:
+    """Messages asking for the rolling summary to be extended with ``messages``."""
+    parts = []
+    if previous_summary:
+        parts += ["=== PREVIOUS SUMMARY ===", previous_summary, ""]
+    parts.append("=== NEW TURNS ===")
+    parts.extend(f"{m['role'].upper()}: {m['content']}\n" for m in messages)
+    return [{"role": "user", "content": "\n".join(parts)}]
+
+
+def build_chat_turn(analysis_sections: dict, passages: list, question: str) -> list:
+    """Content blocks for the latest user turn: retrieved grounding, then the question."""
+    parts = []
+    if analysis_sections:
+        parts += [
+            "=== STRUCTURED ANALYSIS (RELEVANT SECTIONS) ===",
+            json.dumps(analysis_sections, indent=2),
+            "",
+        ]
+    parts.append("=== DOCUMENT EXCERPTS ===")
+    parts.extend(_format_passage(p) + "\n" for p in passages)
+    if not passages:
+        parts.append("(No matching document text was found.)")
+
+    return [
+        {"type": "text", "text": "\n".join(parts)},
+        {"type": "text", "text": question},
+    ]
+
+
+def build_chat_messages(messages: list, analysis_sections: dict, passages: list) -> list:
+    """Conversation for the API: history unchanged (with a cache breakpoint on its
+    last turn) and the grounding excerpts attached to the newest user message."""
+    history = [dict(m) for m in messages[:-1]]
+    if history:
+        last = history[-1]
+        last["content"] = [{"type": "text", "text": last["content"], "cache_control": CACHE_CONTROL}]
+    latest = messages[-1]
+    return history + [{
+        "role": latest["role"],
+        "content": build_chat_turn(analysis_sections, passages, latest["content"]),
+    }]
+
+
+def _file_block(data: str, media_type: str, **extra) -> dict:
+    # PDFs are document blocks; photos and scans are image blocks
+    block_type = "image" if media_type.startswith("image/") else "document"
+    return {"type": block_type, "source": {"type": "base64", "media_type": media_type, "data": data}, **extra}
 
 
 def build_user_content(has_bid: bool, b1: str, media_type1: str,
                        b2: str = None, media_type2: str = None) -> list:
+    # The cache breakpoint on the last document caches system prompt + documents,
+    # so re-running an analysis of the same files reads them from the cache.
     if has_bid:
         return [
-            {"type": "document", "source": {"type": "base64", "media_type": media_type1, "data": b1}},
+            _file_block(b1, media_type1),
             {"type": "text", "text": "DOCUMENT 1: Settlement Agreement."},
-            {"type": "document", "source": {"type": "base64", "media_type": media_type2, "data": b2}},
+            _file_block(b2, media_type2, cache_control=CACHE_CONTROL),
             {"type": "text", "text": "DOCUMENT 2: Administrative Bid/Proposal. Cross-reference both and produce JSON."},
         ]
 
     return [
-        {"type": "document", "source": {"type": "base64", "media_type": media_type1, "data": b1}},
+        _file_block(b1, media_type1, cache_control=CACHE_CONTROL),
         {"type": "text", "text": "This is the Settlement Agreement. Analyze it and produce the JSON output. No Bid was provided, so leave conflict_audit as an empty array."},
     ]
+
+
+def build_chunk_user_content(b1: str, media_type1: str, first_page: int, last_page: int,
+                             total_pages: int, b2: str = None, media_type2: str = None) -> list:
+    # The Bid goes first with the cache breakpoint, so every excerpt of the
+    # same case reads system prompt + Bid from the prompt cache.
+    content = []
+    if b2:
+        content += [
+            _file_block(b2, media_type2, cache_control=CACHE_CONTROL),
+            {"type": "text", "text": "DOCUMENT 2: Administrative Bid/Proposal (complete)."},
+        ]
+    content += [
+        _file_block(b1, media_type1),
+        {"type": "text", "text": f"DOCUMENT 1: Settlement Agreement, pages {first_page}-{last_page} of {total_pages}. Analyze this excerpt and produce the JSON output."},
+    ]
+    return content
+
+
+_HYBRID_DOCUMENTS = {
+    "settlement": ("Settlement", "DOCUMENT 1: Settlement Agreement."),
+    "bid": ("Bid", "DOCUMENT 2: Administrative Bid/Proposal."),
+}
+
+
+def build_hybrid_user_content(documents: list) -> list:
+    """User content for a hybrid analysis (see ``services/hybrid.py``).
+
+    ``documents`` holds, per document, either its whole file
+    (``{"doc", "pdf": {"data", "media_type"}}``) or its pages
+    (``{"doc", "pages": [{"page", "text"} or {"page", "image"}]}``). Text
+    pages are tagged "[Settlement p. N]" and runs of them share one block;
+    each page image follows its own tag.
+    """
+    content = []
+    for document in documents:
+        tag, title = _HYBRID_DOCUMENTS[document["doc"]]
+        if "pdf" in document:
+            content += [
+                _file_block(document["pdf"]["data"], document["pdf"]["media_type"]),
+                {"type": "text", "text": title},
+            ]
+            continue
+        content.append({"type": "text", "text": (
+            f"{title} Pages with a usable text layer are given as extracted text, "
+            f"the rest as page images; each is preceded by its [{tag} p. N] marker, "
+            "the 1-indexed PDF page number to cite."
+        )})
+        run = []
+        for page in document["pages"]:
+            marker = f"[{tag} p. {page['page']}]"
+            if "text" in page:
+                run.append(f"{marker}\n{page['text'].strip()}")
+                continue
+            content.append({"type": "text", "text": "\n\n".join(run + [marker])})
+            content.append({"type": "image", "source": {
+                "type": "base64", "media_type": "image/jpeg", "data": page["image"],
+            }})
+            run = []
+        if run:
+            content.append({"type": "text", "text": "\n\n".join(run)})
+    # Cache system prompt + documents, as build_user_content does
+    content[-1]["cache_control"] = CACHE_CONTROL
+    has_bid = any(d["doc"] == "bid" for d in documents)
+    content.append({"type": "text", "text": (
+        "Cross-reference both and produce JSON." if has_bid else
+        "Analyze the Settlement Agreement and produce the JSON output. No Bid was provided, so leave conflict_audit as an empty array."
+    )})
+    return content
@@ -0,0 +1,72 @@
+"""Bulk imports: ZIP upload or server directory in, per-batch progress out."""
+
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from backend.config import BULK_IMPORT_ROOT, BULK_MAX_UPLOAD_BYTES
+from backend.database import get_db
+from backend.models import BatchDirectoryRequest, BatchFailure, BatchProgress
+from backend.services import bulk, storage
+from backend.services.bulk import batch_manager
+
+router = APIRouter(prefix="/api/batches", tags=["batches"])
+
+
+def _start(db, source) -> dict:
+    try:
+        batch_id = batch_manager.start(source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return bulk.progress(db, batch_id)
+
+
+@router.post("", response_model=BatchProgress, status_code=202)
+async def upload_batch(archive: UploadFile = File(...), db=Depends(get_db)):
+    """Import a ZIP of settlement/bid pairs (see ``backend.services.bulk`` for the layout)."""
+    try:
+        path = await storage.spool_upload(archive, BULK_MAX_UPLOAD_BYTES)
+    except storage.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        source = await run_in_threadpool(bulk.ZipSource, str(path), True)
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="Upload is not a valid ZIP archive")
+    source.label = archive.filename or source.label
+    return await run_in_threadpool(_start, db, source)
+
+
+@router.post("/directory", response_model=BatchProgress, status_code=202)
+def import_directory(body: BatchDirectoryRequest, db=Depends(get_db)):
+    """Import a directory on the server, which must be under ``BULK_IMPORT_ROOT``."""
+    if not BULK_IMPORT_ROOT:
+        raise HTTPException(status_code=403, detail="Directory import is disabled")
+    root = Path(BULK_IMPORT_ROOT).resolve()
+    path = (root / body.path).resolve()
+    if not path.is_relative_to(root):
+        raise HTTPException(status_code=403, detail="Path is outside the import root")
+    if not path.is_dir():
+        raise HTTPException(status_code=404, detail="Directory not found")
+    return _start(db, bulk.DirectorySource(str(path)))
+
+
+@router.get("", response_model=list[BatchProgress])
+def list_batches(limit: int = Query(50, ge=1, le=500), db=Depends(get_db)):
+    return bulk.list_batches(db, limit)
+
+
+@router.get("/{batch_id}", response_model=BatchProgress)
+def get_batch(batch_id: int, db=Depends(get_db)):
+    progress = bulk.progress(db, batch_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return progress
+
+
+@router.get("/{batch_id}/failures", response_model=list[BatchFailure])
+def get_batch_failures(batch_id: int, db=Depends(get_db)):
+    if not bulk.progress(db, batch_id):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return bulk.failures(db, batch_id)
@@ -1,167 +1,469 @@
 """API endpoints for case management: upload, analyze, get, list, delete, chat."""
 
+import base64
+import hashlib
 import json
 import os
-import uuid
+from datetime import date, timedelta
+from typing import Optional
 
-import anthropic
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from fastapi.responses import FileResponse, StreamingResponse
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File, Form
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 
-from backend.config import UPLOAD_DIR, ANTHROPIC_API_KEY, CLAUDE_MODEL
-from backend.database import get_db
+from backend.config import MAX_UPLOAD_BYTES
+from backend.database import connect, get_db, transaction
 from backend.models import (
     UploadResponse,
     AnalyzeResponse,
+    AnalysisJobResponse,
     CaseDetail,
     CaseListItem,
+    CaseListPage,
+    CitationReport,
     DeleteResponse,
+    DocumentFile,
     ChatRequest,
+    ChatSessionDetail,
+    ChatSessionList,
+    InputModeStats,
+    PageText,
+    SearchResponse,
+    UsageResponse,
 )
-from backend.services.extraction import get_media_type, extract_text
-from backend.services.analysis import run_analysis
-from backend.prompts import build_chat_system_prompt
+from backend.services.extraction import get_media_type, submit_extraction
+from backend.services.jobs import JobConflict, job_manager
+from backend.services import (
+    analysis_queue, case_data, chat, chat_sessions, citations, metrics, normalize, portfolio,
+    search, storage,
+)
+from backend.services.usage import input_mode_summary, usage_summary
 
 router = APIRouter(prefix="/api/cases", tags=["cases"])
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _analysis_response(
+    request: Request,
+    fields: dict,
+    analysis_sha256: Optional[str],
+    load_analysis,
+) -> Response:
+    """JSON response of ``fields`` plus the stored analysis JSON, spliced in as-is.
+
+    The strong ETag covers the other fields and the analysis hash, so a GET
+    with a matching ``If-None-Match`` gets a 304 without ``load_analysis``
+    (which returns the JSON text, or None) ever being called.
+    """
+    head = json.dumps(fields)
+    etag = '"' + hashlib.sha256(f"{head}\n{analysis_sha256}".encode()).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.method in ("GET", "HEAD") and _etag_matches(
+        request.headers.get("if-none-match"), etag
+    ):
+        return Response(status_code=304, headers=headers)
+
+    analysis_json = (load_analysis() if analysis_sha256 else None) or "null"
+    body = f'{head[:-1]}, "analysis_json": {analysis_json}}}'
+    return Response(body, media_type="application/json", headers=headers)
+
+
 @router.post("/upload", response_model=UploadResponse)
 async def upload_case(
     files: list[UploadFile] = File(...),
+    settlement_files: Optional[int] = Form(
+        None, ge=1, description="How many leading files are pages of the settlement (rest: the bid)"
+    ),
     db=Depends(get_db),
 ):
-    """Upload case files. First file = settlement, second = bid (if any)."""
-    if not files:
-        raise HTTPException(status_code=400, detail="At least one file is required")
-
-    settlement = files[0]
-    bid = files[1] if len(files) > 1 else None
-
-    # Save settlement file
-    settlement_ext = settlement.filename.rsplit(".", 1)[-1] if "." in settlement.filename else "pdf"
-    settlement_stored = f"{uuid.uuid4().hex}.{settlement_ext}"
-    settlement_path = str(UPLOAD_DIR / settlement_stored)
-    content = await settlement.read()
-    with open(settlement_path, "wb") as f:
-        f.write(content)
+    """Upload case files. First file = settlement, second = bid (if any).
 
-    settlement_media = get_media_type(settlement.filename)
-    settlement_text = extract_text(settlement_path, settlement_media)
+    A document photographed or scanned one page per file is sent as several
+    files with ``settlement_files`` set; each document's files are bundled
+    into one PDF. Images are converted and downscaled for the model at
+    ingest, and ``files`` in the response reports what was done to each.
 
-    # Save bid file if provided
+    Files are streamed to disk in chunks; text extraction runs on a worker
+    pool and the case reports ``extraction_status = 'extracting'`` until done.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="At least one file is required")
+    if settlement_files is None:
+        groups = {"settlement": files[:1], "bid": files[1:2]}
+    elif settlement_files > len(files):
+        raise HTTPException(status_code=400, detail="settlement_files exceeds the number of files")
+    else:
+        groups = {"settlement": files[:settlement_files], "bid": files[settlement_files:]}
+
+    stored = []
+    try:
+        # Save each file (deduplicated by content)
+        uploads = {}
+        with metrics.stage("upload", "store"):
+            for doc, group in groups.items():
+                uploads[doc] = []
+                for upload in group:
+                    digest, path = await storage.store_upload(db, upload, MAX_UPLOAD_BYTES)
+                    stored.append(digest)
+                    uploads[doc].append(
+                        (upload.filename, path, digest, get_media_type(upload.filename))
+                    )
+    except BaseException as e:
+        # Any failure part-way (too large, disk error, client gone) drops the
+        # references already taken; shielded so it also runs when cancelled
+        with anyio.CancelScope(shield=True):
+            for digest in stored:
+                await run_in_threadpool(storage.release, db, digest)
+        if isinstance(e, storage.UploadTooLarge):
+            raise HTTPException(status_code=413, detail=str(e))
+        raise
+
+    def prepare_documents() -> dict:
+        docs = {}
+        try:
+            for doc, doc_files in uploads.items():
+                if doc_files:
+                    docs[doc] = normalize.prepare(db, doc_files)
+        except ValueError:
+            for prepared in docs.values():
+                for digest in (prepared["sha256"], prepared["model_sha256"]):
+                    if digest:
+                        storage.release(db, digest)
+            for doc, doc_files in uploads.items():
+                if doc not in docs:
+                    for _, _, digest, _ in doc_files:
+                        storage.release(db, digest)
+            raise
+        return docs
+
+    try:
+        with metrics.stage("upload", "normalize"):
+            docs = await run_in_threadpool(prepare_documents)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+    settlement = docs["settlement"]
+    bid = docs.get("bid")
     has_bid = bid is not None
-    bid_filename = None
-    bid_path = None
-    bid_media = None
-    bid_text = None
-
-    if has_bid:
-        bid_ext = bid.filename.rsplit(".", 1)[-1] if "." in bid.filename else "pdf"
-        bid_stored = f"{uuid.uuid4().hex}.{bid_ext}"
-        bid_path = str(UPLOAD_DIR / bid_stored)
-        bid_content = await bid.read()
-        with open(bid_path, "wb") as f:
-            f.write(bid_content)
-        bid_filename = bid.filename
-        bid_media = get_media_type(bid.filename)
-        bid_text = extract_text(bid_path, bid_media)
-
-    cursor = db.execute(
-        """INSERT INTO cases
-            (settlement_filename, settlement_path, settlement_media_type,
-             bid_filename, bid_path, bid_media_type, has_bid,
-             settlement_text, bid_text)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        (
-            settlement.filename,
-            settlement_path,
-            settlement_media,
-            bid_filename,
-            bid_path,
-            bid_media,
-            int(has_bid),
-            settlement_text,
-            bid_text,
-        ),
-    )
-    db.commit()
-    case_id = cursor.lastrowid
+
+    def insert_case() -> int:
+        with transaction(db):
+            cursor = db.execute(
+                """INSERT INTO cases
+                    (settlement_filename, settlement_path, settlement_media_type, settlement_sha256,
+                     settlement_model_path, settlement_model_media_type, settlement_model_sha256,
+                     bid_filename, bid_path, bid_media_type, bid_sha256,
+                     bid_model_path, bid_model_media_type, bid_model_sha256, has_bid,
+                     extraction_status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'extracting')""",
+                (*normalize.case_values(settlement, bid), int(has_bid)),
+            )
+            for doc, prepared in docs.items():
+                normalize.save_report(db, cursor.lastrowid, doc, prepared["files"])
+        return cursor.lastrowid
+
+    with metrics.stage("upload", "insert"):
+        case_id = await run_in_threadpool(insert_case)
+    submit_extraction(case_id)
 
     return UploadResponse(
         id=case_id,
-        settlement_filename=settlement.filename,
-        bid_filename=bid_filename,
+        settlement_filename=settlement["filename"],
+        bid_filename=bid["filename"] if bid else None,
         has_bid=has_bid,
         analysis_status="pending",
+        extraction_status="extracting",
+        files=[
+            {"doc": doc, "position": i, **normalize.with_savings(f)}
+            for doc, prepared in docs.items()
+            for i, f in enumerate(prepared["files"])
+        ],
     )
 
 
-@router.post("/{case_id}/analyze", response_model=AnalyzeResponse)
-def analyze_case(case_id: int, db=Depends(get_db)):
-    """Run AI analysis on a case. Returns cached result if already completed."""
-    row = db.execute("SELECT id FROM cases WHERE id = ?", (case_id,)).fetchone()
+@router.post(
+    "/{case_id}/analyze",
+    response_model=AnalyzeResponse,
+    responses={202: {"model": AnalysisJobResponse}},
+)
+def analyze_case(
+    case_id: int,
+    request: Request,
+    mode: str = Query("sync", pattern="^(sync|async)$"),
+    chunked: bool = Query(False, description="Analyze a long settlement as concurrent page ranges"),
+    input_mode: Optional[str] = Query(
+        None, pattern="^(pdf|hybrid)$", description="Defaults to ANALYSIS_INPUT_MODE"
+    ),
+    force: bool = Query(False, description="Re-run even if a result is stored or cached"),
+    db=Depends(get_db),
+):
+    """Run AI analysis on a case. Returns cached result if already completed.
+
+    ``mode=async`` returns 202 with a job handle immediately; progress is
+    streamed from the job's ``events_url``. Requests for a case that is
+    already being analyzed attach to the running job in either mode, or get
+    a 409 if it was started with options (below) that would not answer them.
+    Cases whose analysis is pending in a running bulk import also get a 409.
+
+    ``chunked=true`` splits a long settlement PDF into page ranges analyzed
+    concurrently and merged (``ANALYSIS_CHUNK_PAGES`` pages each).
+    ``input_mode=hybrid`` sends extracted text for pages with a good text
+    layer and page images for the rest instead of the whole PDFs. Results
+    are cached per mode; ``force=true`` calls the model again regardless,
+    for comparing the modes on the same documents.
+    """
+    row = db.execute(
+        """SELECT c.analysis_status, a.sha256
+           FROM cases c LEFT JOIN case_analysis a ON a.case_id = c.id
+           WHERE c.id = ?""",
+        (case_id,),
+    ).fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Case not found")
 
-    result = run_analysis(db, case_id)
+    # Already analyzed: answer from the stored result without starting a job
+    if mode == "sync" and not force and row["analysis_status"] == "completed" and row["sha256"]:
+        fields = AnalyzeResponse(id=case_id, analysis_status="completed", cached=True)
+        return _analysis_response(
+            request,
+            fields.model_dump(exclude={"analysis_json"}),
+            row["sha256"],
+            lambda: case_data.load_analysis(db, case_id),
+        )
+
+    try:
+        job, _ = job_manager.submit(db, case_id, chunked=chunked, input_mode=input_mode, force=force)
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if mode == "async":
+        return JSONResponse(
+            status_code=202,
+            content=AnalysisJobResponse(**job.snapshot()).model_dump(),
+            headers={"Location": f"/api/cases/jobs/{job.id}"},
+        )
+
+    result = job.wait()
 
     if result["analysis_status"] == "failed":
         raise HTTPException(status_code=500, detail=result["analysis_error"])
 
-    return AnalyzeResponse(**result)
+    analysis_json = result.pop("analysis_json")
+    return _analysis_response(
+        request,
+        AnalyzeResponse(**result).model_dump(exclude={"analysis_json"}),
+        case_data.digest(analysis_json),
+        lambda: analysis_json,
+    )
+
+
+@router.get("/search", response_model=SearchResponse)
+def search_cases(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    case_id: Optional[int] = None,
+    source: Optional[str] = Query(None, pattern="^(documents|analysis)$"),
+    db=Depends(get_db),
+):
+    """Full-text search across all cases' document pages and analyses."""
+    hits = search.search(db, q, limit=limit, case_id=case_id, source=source)
+    return SearchResponse(query=q, hits=hits)
+
+
+@router.get("/analysis-modes", response_model=list[InputModeStats])
+def get_analysis_modes(db=Depends(get_db)):
+    """Request size, input tokens and latency of analysis calls per input mode."""
+    return input_mode_summary(db)
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobResponse)
+def get_job(job_id: str):
+    """Get the current state of an analysis job."""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return AnalysisJobResponse(**job.snapshot())
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream an analysis job's progress as server-sent events until it finishes.
+
+    Events are ``stage`` changes, ``section`` (a top-level analysis section,
+    e.g. ``summary``, as soon as the model finishes it) and a final
+    ``completed`` or ``failed``. Reconnecting replays everything so far.
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def generate():
+        async for event in job.stream():
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
 
 
 @router.get("/{case_id}", response_model=CaseDetail)
-def get_case(case_id: int, db=Depends(get_db)):
-    """Get full case details including analysis."""
-    row = db.execute("SELECT * FROM cases WHERE id = ?", (case_id,)).fetchone()
+def get_case(case_id: int, request: Request, db=Depends(get_db)):
+    """Get full case details including analysis.
+
+    Sends a strong ETag; an unchanged case answers ``If-None-Match`` with 304.
+    """
+    row = db.execute(
+        """SELECT c.id, c.created_at, c.settlement_filename, c.bid_filename, c.has_bid,
+                  c.analysis_status, c.extraction_status, c.page_count, c.extraction_seconds,
+                  c.analysis_error, c.case_name, c.case_number, c.jurisdiction,
+                  c.settlement_type, a.sha256 AS analysis_sha256
+           FROM cases c LEFT JOIN case_analysis a ON a.case_id = c.id
+           WHERE c.id = ?""",
+        (case_id,),
+    ).fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Case not found")
 
-    analysis_json = None
-    if row["analysis_json"]:
-        analysis_json = json.loads(row["analysis_json"])
+    pages_per_sec = None
+    if row["page_count"] and row["extraction_seconds"]:
+        pages_per_sec = round(row["page_count"] / row["extraction_seconds"], 1)
 
-    return CaseDetail(
+    detail = CaseDetail(
         id=row["id"],
         created_at=row["created_at"],
         settlement_filename=row["settlement_filename"],
         bid_filename=row["bid_filename"],
         has_bid=bool(row["has_bid"]),
         analysis_status=row["analysis_status"],
-        analysis_json=analysis_json,
+        extraction_status=row["extraction_status"],
+        page_count=row["page_count"],
+        extraction_pages_per_sec=pages_per_sec,
         analysis_error=row["analysis_error"],
         case_name=row["case_name"],
         case_number=row["case_number"],
         jurisdiction=row["jurisdiction"],
         settlement_type=row["settlement_type"],
     )
+    return _analysis_response(
+        request,
+        detail.model_dump(exclude={"analysis_json"}),
+        row["analysis_sha256"],
+        lambda: case_data.load_analysis(db, case_id),
+    )
 
 
-@router.get("", response_model=list[CaseListItem])
-def list_cases(db=Depends(get_db)):
-    """List all cases (lightweight, no analysis_json)."""
+def _encode_cursor(created_at: str, case_id: int) -> str:
+    raw = json.dumps([created_at, case_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, case_id = json.loads(raw)
+        return str(created_at), int(case_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _case_total(db, filters: dict, has_date_range: bool) -> tuple[int, bool]:
+    """Row count for the listing from the maintained case_counts table.
+
+    Exact for no filter or a single one; with several filters (or a date
+    range) the smallest matching count is returned as an upper bound.
+    """
+    dimensions = [("all", "")] + [(k, str(v)) for k, v in filters.items()]
+    counts = []
+    for dimension, value in dimensions:
+        row = db.execute(
+            "SELECT n FROM case_counts WHERE dimension = ? AND value = ?", (dimension, value)
+        ).fetchone()
+        counts.append(row["n"] if row else 0)
+    return min(counts), len(filters) > 1 or has_date_range
+
+
+@router.get("", response_model=CaseListPage)
+def list_cases(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    status: Optional[str] = Query(None, description="analysis_status"),
+    jurisdiction: Optional[str] = None,
+    settlement_type: Optional[str] = None,
+    has_bid: Optional[bool] = None,
+    created_from: Optional[date] = Query(None, description="Created on or after (YYYY-MM-DD)"),
+    created_to: Optional[date] = Query(None, description="Created on or before (YYYY-MM-DD)"),
+    db=Depends(get_db),
+):
+    """List cases newest first (lightweight, no analysis_json).
+
+    Pages are keyset-paginated on (created_at, id): pass ``next_cursor`` back
+    as ``cursor`` for the following page.
+    """
+    filters = {
+        k: v
+        for k, v in (
+            ("analysis_status", status),
+            ("jurisdiction", jurisdiction),
+            ("settlement_type", settlement_type),
+            ("has_bid", int(has_bid) if has_bid is not None else None),
+        )
+        if v is not None
+    }
+    where = [f"{k} = ?" for k in filters]
+    params = list(filters.values())
+    if created_from:
+        where.append("created_at >= ?")
+        params.append(created_from.isoformat())
+    if created_to:
+        where.append("created_at < ?")
+        params.append((created_to + timedelta(days=1)).isoformat())
+    if cursor:
+        where.append("(created_at, id) < (?, ?)")
+        params.extend(_decode_cursor(cursor))
+
     rows = db.execute(
-        """SELECT id, created_at, settlement_filename, bid_filename, has_bid,
-                  analysis_status, case_name, case_number, jurisdiction, settlement_type
-           FROM cases ORDER BY created_at DESC"""
+        f"""SELECT id, created_at, settlement_filename, bid_filename, has_bid,
+                   analysis_status, case_name, case_number, jurisdiction, settlement_type
+            FROM cases
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?""",
+        params + [limit + 1],
     ).fetchall()
 
-    return [
-        CaseListItem(
-            id=r["id"],
-            created_at=r["created_at"],
-            settlement_filename=r["settlement_filename"],
-            bid_filename=r["bid_filename"],
-            has_bid=bool(r["has_bid"]),
-            analysis_status=r["analysis_status"],
-            case_name=r["case_name"],
-            case_number=r["case_number"],
-            jurisdiction=r["jurisdiction"],
-            settlement_type=r["settlement_type"],
-        )
-        for r in rows
-    ]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+    total, estimate = _case_total(db, filters, bool(created_from or created_to))
+    return CaseListPage(
+        items=[
+            CaseListItem(
+                id=r["id"],
+                created_at=r["created_at"],
+                settlement_filename=r["settlement_filename"],
+                bid_filename=r["bid_filename"],
+                has_bid=bool(r["has_bid"]),
+                analysis_status=r["analysis_status"],
+                case_name=r["case_name"],
+                case_number=r["case_number"],
+                jurisdiction=r["jurisdiction"],
+                settlement_type=r["settlement_type"],
+            )
+            for r in rows
+        ],
+        next_cursor=next_cursor,
+        total=total,
+        total_is_estimate=estimate,
+    )
 
 
 @router.get("/{case_id}/pdf/{doc_type}")
@@ -170,12 +472,15 @@ def serve_pdf(case_id: int, doc_type: str, db=Depends(get_db)):
     if doc_type not in ("settlement", "bid"):
         raise HTTPException(status_code=400, detail="doc_type must be 'settlement' or 'bid'")
 
-    row = db.execute("SELECT * FROM cases WHERE id = ?", (case_id,)).fetchone()
+    row = db.execute(
+        f"SELECT {doc_type}_path AS path, {doc_type}_media_type AS media_type FROM cases WHERE id = ?",
+        (case_id,),
+    ).fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Case not found")
 
-    file_path = row[f"{doc_type}_path"]
-    media_type = row[f"{doc_type}_media_type"]
+    file_path = row["path"]
+    media_type = row["media_type"]
 
     if not file_path or not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail=f"No {doc_type} file found")
@@ -187,57 +492,156 @@ def serve_pdf(case_id: int, doc_type: str, db=Depends(get_db)):
     )
 
 
-@router.post("/{case_id}/chat")
-def chat_case(case_id: int, body: ChatRequest, db=Depends(get_db)):
-    """Stream a chat response grounded in the case's analysis and document text."""
+@router.get("/{case_id}/pages/{doc_type}/{page_no}", response_model=PageText)
+def get_page(case_id: int, doc_type: str, page_no: int, db=Depends(get_db)):
+    """Get the extracted text of a single 1-indexed document page."""
+    if doc_type not in ("settlement", "bid"):
+        raise HTTPException(status_code=400, detail="doc_type must be 'settlement' or 'bid'")
+
     row = db.execute(
-        "SELECT analysis_json, settlement_text, bid_text FROM cases WHERE id = ?",
-        (case_id,),
+        "SELECT text FROM document_pages WHERE case_id = ? AND doc = ? AND page_no = ?",
+        (case_id, doc_type, page_no),
     ).fetchone()
     if not row:
-        raise HTTPException(status_code=404, detail="Case not found")
-    if not row["analysis_json"]:
-        raise HTTPException(status_code=400, detail="Case has no analysis yet")
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    return PageText(case_id=case_id, doc=doc_type, page_no=page_no, text=row["text"])
+
+
+@router.post("/{case_id}/chat")
+async def chat_case(case_id: int, body: ChatRequest, request: Request):
+    """Stream a chat response grounded in the case's analysis and document text.
+
+    Only the new message is sent; the conversation is kept server-side in a
+    chat session (created with the first stored exchange when ``session_id``
+    is omitted, and named in a "session" SSE frame). Runs on the event loop
+    end to end (no threadpool thread is held while the reply streams) and
+    stops the upstream request if the client disconnects. The session is
+    compacted after the reply is sent.
+    """
+    if not body.message.strip():
+        raise HTTPException(status_code=400, detail="Message is empty")
+
+    def prepare() -> tuple[dict, dict]:
+        conn = connect()
+        try:
+            row = conn.execute("SELECT id FROM cases WHERE id = ?", (case_id,)).fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Case not found")
+            stored_json = case_data.load_analysis(conn, case_id)
+            if not stored_json:
+                raise HTTPException(status_code=400, detail="Case has no analysis yet")
+            try:
+                return chat.prepare_turn(
+                    conn, case_id, json.loads(stored_json), body.session_id, body.message
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+        finally:
+            conn.close()
+
+    params, turn = await run_in_threadpool(prepare)
+    return StreamingResponse(
+        chat.stream_chat(request, case_id, params, turn),
+        media_type="text/event-stream",
+        background=BackgroundTask(chat.compact_after_turn, case_id, turn),
+    )
+
 
-    analysis_json = json.loads(row["analysis_json"])
-    system_prompt = build_chat_system_prompt(
-        analysis_json, row["settlement_text"], row["bid_text"]
+@router.get("/{case_id}/chat/sessions", response_model=ChatSessionList)
+def list_chat_sessions(case_id: int, db=Depends(get_db)):
+    """A case's chat sessions, most recently used first."""
+    row = db.execute("SELECT id FROM cases WHERE id = ?", (case_id,)).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return ChatSessionList(case_id=case_id, sessions=chat_sessions.list_sessions(db, case_id))
+
+
+@router.get("/{case_id}/chat/sessions/{session_id}", response_model=ChatSessionDetail)
+def get_chat_session(case_id: int, session_id: int, db=Depends(get_db)):
+    """A chat session's messages (to resume it), summary and token usage."""
+    session = chat_sessions.get_session(db, case_id, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return ChatSessionDetail(
+        **{k: session[k] for k in session.keys() if k in ChatSessionDetail.model_fields},
+        messages=chat_sessions.session_messages(db, session_id),
+        usage=chat_sessions.session_usage(db, session),
     )
 
-    messages = [{"role": m.role, "content": m.content} for m in body.messages]
 
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+@router.delete("/{case_id}/chat/sessions/{session_id}", response_model=DeleteResponse)
+def delete_chat_session(case_id: int, session_id: int, db=Depends(get_db)):
+    """Delete a chat session and its messages."""
+    if chat_sessions.get_session(db, case_id, session_id) is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    with transaction(db):
+        chat_sessions.delete_session(db, session_id)
+    return DeleteResponse(deleted=True)
 
-    def generate():
-        with client.messages.stream(
-            model=CLAUDE_MODEL,
-            max_tokens=4096,
-            system=system_prompt,
-            messages=messages,
-        ) as stream:
-            for text in stream.text_stream:
-                payload = json.dumps({"type": "delta", "text": text})
-                yield f"data: {payload}\n\n"
-        yield f"data: {json.dumps({'type': 'stop'})}\n\n"
 
-    return StreamingResponse(generate(), media_type="text/event-stream")
+@router.get("/{case_id}/usage", response_model=UsageResponse)
+def get_usage(case_id: int, db=Depends(get_db)):
+    """Model token usage for a case, including prompt-cache reads and writes."""
+    row = db.execute("SELECT id FROM cases WHERE id = ?", (case_id,)).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return UsageResponse(case_id=case_id, usage=usage_summary(db, case_id))
+
+
+@router.get("/{case_id}/citations", response_model=CitationReport)
+def get_case_citations(case_id: int, db=Depends(get_db)):
+    """Each analysis citation checked against the extracted text: the page
+    its quote was found on and a 0-1 match score. Empty until both the
+    analysis and text extraction have finished."""
+    row = db.execute("SELECT id FROM cases WHERE id = ?", (case_id,)).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return citations.report(db, case_id)
+
+
+@router.get("/{case_id}/files", response_model=list[DocumentFile])
+def get_case_files(case_id: int, db=Depends(get_db)):
+    """What ingest did to each uploaded file, with the bytes it saved."""
+    row = db.execute("SELECT id FROM cases WHERE id = ?", (case_id,)).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return normalize.report(db, case_id)
 
 
 @router.delete("/{case_id}", response_model=DeleteResponse)
 def delete_case(case_id: int, db=Depends(get_db)):
-    """Delete a case and its uploaded files."""
+    """Delete a case and release its uploaded files."""
     row = db.execute(
-        "SELECT settlement_path, bid_path FROM cases WHERE id = ?", (case_id,)
+        """SELECT settlement_path, settlement_sha256, settlement_model_sha256,
+                  bid_path, bid_sha256, bid_model_sha256
+           FROM cases WHERE id = ?""",
+        (case_id,),
     ).fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Case not found")
 
-    # Remove files from disk
-    for path in [row["settlement_path"], row["bid_path"]]:
-        if path and os.path.exists(path):
+    with transaction(db):
+        search.remove_case(db, case_id)
+        case_data.remove_case(db, case_id)
+        portfolio.remove_case(db, case_id)
+        citations.remove_case(db, case_id)
+        normalize.remove_case(db, case_id)
+        analysis_queue.remove_case(db, case_id)
+        chat_sessions.remove_case(db, case_id)
+        db.execute("DELETE FROM model_usage WHERE case_id = ?", (case_id,))
+        db.execute("DELETE FROM cases WHERE id = ?", (case_id,))
+
+    # Files are shared between cases with identical content; only remove
+    # them once nothing references them. Pre-dedup uploads own their file.
+    for doc_type in ("settlement", "bid"):
+        digest = row[f"{doc_type}_sha256"]
+        path = row[f"{doc_type}_path"]
+        if digest:
+            storage.release(db, digest)
+        elif path and os.path.exists(path):
             os.remove(path)
-
-    db.execute("DELETE FROM cases WHERE id = ?", (case_id,))
-    db.commit()
+        if row[f"{doc_type}_model_sha256"]:
+            storage.release(db, row[f"{doc_type}_model_sha256"])
 
     return DeleteResponse(deleted=True)
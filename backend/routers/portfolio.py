@@ -0,0 +1,67 @@
+"""Cross-case (portfolio) queries over the projected analysis tables."""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from backend.database import get_db
+from backend.models import ChecklistItem, ConflictItem, DeadlineItem, FundItem
+from backend.services import portfolio
+from backend.services.portfolio import CHECKLIST_PHASES, TIMELINE_DATES
+
+router = APIRouter(prefix="/api/portfolio", tags=["portfolio"])
+
+
+@router.get("/deadlines", response_model=list[DeadlineItem])
+def list_deadlines(
+    within_days: int = Query(30, ge=0, le=3650),
+    kind: Optional[str] = Query(
+        None, pattern=f"^({'|'.join(('milestone',) + TIMELINE_DATES)})$"
+    ),
+    status: Optional[str] = Query(None, description="Milestone status, e.g. critical"),
+    owner: Optional[str] = None,
+    include_overdue: bool = False,
+    limit: int = Query(200, ge=1, le=1000),
+    db=Depends(get_db),
+):
+    """Dated milestones and timeline deadlines due in the next ``within_days`` days.
+
+    e.g. ``?kind=claims_deadline&within_days=30`` for upcoming claims deadlines.
+    """
+    return portfolio.deadlines(
+        db, within_days, kind=kind, status=status, owner=owner,
+        include_overdue=include_overdue, limit=limit,
+    )
+
+
+@router.get("/conflicts", response_model=list[ConflictItem])
+def list_conflicts(
+    severity: Optional[str] = Query(None, pattern="^(critical|warning|info)$"),
+    open_only: bool = Query(False, description="Skip cases whose distribution date has passed"),
+    limit: int = Query(200, ge=1, le=1000),
+    db=Depends(get_db),
+):
+    """Settlement/bid conflicts across cases."""
+    return portfolio.conflicts(db, severity=severity, open_only=open_only, limit=limit)
+
+
+@router.get("/checklist", response_model=list[ChecklistItem])
+def list_checklist(
+    phase: Optional[str] = Query(None, pattern=f"^({'|'.join(CHECKLIST_PHASES)})$"),
+    case_id: Optional[int] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db=Depends(get_db),
+):
+    """Operational checklist items across cases."""
+    return portfolio.checklist(db, phase=phase, case_id=case_id, limit=limit)
+
+
+@router.get("/funds", response_model=list[FundItem])
+def list_funds(
+    qsf_required: Optional[bool] = None,
+    min_gross: Optional[float] = Query(None, ge=0, description="Minimum gross settlement in dollars"),
+    limit: int = Query(200, ge=1, le=1000),
+    db=Depends(get_db),
+):
+    """Fund logistics per case, largest gross settlement first."""
+    return portfolio.funds(db, qsf_required=qsf_required, min_gross=min_gross, limit=limit)
@@ -1,121 +1,428 @@
 """Claude API call via anthropic SDK, JSON parsing, and caching."""
 
 import base64
+import hashlib
 import json
 import re
+import logging
 import sqlite3
+import time
+from typing import Any, Callable, Optional
 
 import anthropic
 
-from backend.config import ANTHROPIC_API_KEY, CLAUDE_MODEL, CLAUDE_MAX_TOKENS
-from backend.prompts import build_system_prompt, build_user_content
+from backend.config import CLAUDE_MODEL, CLAUDE_MAX_TOKENS, ANALYSIS_STREAM_RESUMES, ANALYSIS_INPUT_MODE
+from backend.database import transaction
+from backend.prompts import PROMPT_VERSION, build_system_blocks, build_user_content
+from backend.services import case_data, citations, hybrid, llm, map_reduce, metrics, portfolio, search
+from backend.services.json_stream import MemberParser
+from backend.services.usage import record_usage
 
+logger = logging.getLogger(__name__)
 
-def run_analysis(conn: sqlite3.Connection, case_id: int) -> dict:
-    """Run Claude analysis for a case. Returns dict with status, json, cached flag."""
-    row = conn.execute("SELECT * FROM cases WHERE id = ?", (case_id,)).fetchone()
+
+def analysis_cache_key(settlement_sha256: str, bid_sha256: Optional[str], mode: str = "pdf") -> str:
+    """Key for results that can be shared by any case with the same documents.
+
+    ``mode`` is how the documents were analyzed ("pdf", "hybrid" or
+    "chunked"), so a result is only handed out for a request in the same
+    mode and the modes can be compared on the same documents.
+    """
+    parts = [settlement_sha256, bid_sha256 or "", PROMPT_VERSION, CLAUDE_MODEL, mode]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _lookup_cached_analysis(conn: sqlite3.Connection, row: sqlite3.Row, mode: str) -> Optional[str]:
+    if not row["settlement_sha256"]:
+        return None
+    hit = conn.execute(
+        "SELECT analysis_json FROM analysis_cache WHERE cache_key = ?",
+        (analysis_cache_key(row["settlement_sha256"], row["bid_sha256"], mode),),
+    ).fetchone()
+    return hit["analysis_json"] if hit else None
+
+
+def _store_cached_analysis(
+    conn: sqlite3.Connection, row: sqlite3.Row, analysis_json_str: str, mode: str
+):
+    if not row["settlement_sha256"]:
+        return
+    conn.execute(
+        """INSERT OR REPLACE INTO analysis_cache
+            (cache_key, settlement_sha256, bid_sha256, prompt_version, model, analysis_json)
+        VALUES (?, ?, ?, ?, ?, ?)""",
+        (
+            analysis_cache_key(row["settlement_sha256"], row["bid_sha256"], mode),
+            row["settlement_sha256"],
+            row["bid_sha256"],
+            PROMPT_VERSION,
+            CLAUDE_MODEL,
+            analysis_json_str,
+        ),
+    )
+
+
+def _save_analysis(conn: sqlite3.Connection, case_id: int, analysis: dict, analysis_json_str: str):
+    """Store a completed analysis on the case, denormalizing key fields for listing."""
+    case_data.save_analysis(conn, case_id, analysis_json_str)
+    conn.execute(
+        """UPDATE cases SET
+            analysis_status = 'completed',
+            analysis_error = NULL,
+            case_name = ?,
+            case_number = ?,
+            jurisdiction = ?,
+            settlement_type = ?
+        WHERE id = ?""",
+        (
+            analysis.get("case_name"),
+            analysis.get("case_number"),
+            analysis.get("jurisdiction"),
+            analysis.get("settlement_type"),
+            case_id,
+        ),
+    )
+    search.index_analysis(conn, case_id, analysis)
+    portfolio.sync_analysis(conn, case_id, analysis)
+    citations.verify_case(conn, case_id, analysis)
+    case_data.clear_checkpoints(conn, case_id)
+
+
+# The model is sent the normalized copy of an upload where there is one
+_CASE_COLUMNS = """analysis_status, has_bid,
+    COALESCE(settlement_model_path, settlement_path) AS settlement_path,
+    COALESCE(settlement_model_media_type, settlement_media_type) AS settlement_media_type,
+    settlement_sha256,
+    COALESCE(bid_model_path, bid_path) AS bid_path,
+    COALESCE(bid_model_media_type, bid_media_type) AS bid_media_type,
+    bid_sha256"""
+
+
+def _result(
+    case_id: int, analysis_json: Optional[str], error: Optional[str] = None, cached: bool = False
+) -> dict:
+    return {
+        "id": case_id,
+        "analysis_status": "failed" if error else "completed",
+        "analysis_json": analysis_json,
+        "analysis_error": error,
+        "cached": cached,
+    }
+
+
+def load_case(conn: sqlite3.Connection, case_id: int) -> sqlite3.Row:
+    """The columns of a case that analysis needs. Raises ValueError if missing."""
+    row = conn.execute(f"SELECT {_CASE_COLUMNS} FROM cases WHERE id = ?", (case_id,)).fetchone()
     if not row:
         raise ValueError(f"Case {case_id} not found")
+    return row
 
-    # Return cached result
-    if row["analysis_status"] == "completed" and row["analysis_json"]:
-        return {
-            "id": case_id,
-            "analysis_status": "completed",
-            "analysis_json": json.loads(row["analysis_json"]),
-            "analysis_error": None,
-            "cached": True,
-        }
 
-    # Mark as processing
-    conn.execute(
-        "UPDATE cases SET analysis_status = 'processing' WHERE id = ?",
-        (case_id,),
+def reuse_analysis(
+    conn: sqlite3.Connection, case_id: int, row: sqlite3.Row, mode: str = "pdf"
+) -> Optional[dict]:
+    """Result without a model call: the case's own stored analysis, or one of
+    identical documents from another case analyzed in the same ``mode``
+    (saved to this case). Else None."""
+    stored_json = None
+    if row["analysis_status"] == "completed":
+        stored_json = case_data.load_analysis(conn, case_id)
+    if stored_json:
+        return _result(case_id, stored_json, cached=True)
+
+    cached_json = _lookup_cached_analysis(conn, row, mode)
+    if cached_json:
+        analysis = json.loads(cached_json)
+        with transaction(conn):
+            _save_analysis(conn, case_id, analysis, cached_json)
+        return _result(case_id, cached_json, cached=True)
+    return None
+
+
+def build_analysis_params(row: sqlite3.Row) -> dict:
+    """Messages API parameters for analyzing a case's documents."""
+    has_bid = bool(row["has_bid"])
+
+    # Read file and encode to base64
+    with open(row["settlement_path"], "rb") as f:
+        b1 = base64.standard_b64encode(f.read()).decode("ascii")
+
+    b2 = None
+    if has_bid and row["bid_path"]:
+        with open(row["bid_path"], "rb") as f:
+            b2 = base64.standard_b64encode(f.read()).decode("ascii")
+
+    system_prompt = build_system_blocks(has_bid)
+    user_content = build_user_content(
+        has_bid,
+        b1=b1,
+        media_type1=row["settlement_media_type"],
+        b2=b2,
+        media_type2=row["bid_media_type"],
     )
-    conn.commit()
+    return {
+        "model": CLAUDE_MODEL,
+        "max_tokens": CLAUDE_MAX_TOKENS,
+        "system": system_prompt,
+        "messages": [{"role": "user", "content": user_content}],
+    }
 
-    try:
-        has_bid = bool(row["has_bid"])
-
-        # Read file and encode to base64
-        with open(row["settlement_path"], "rb") as f:
-            b1 = base64.standard_b64encode(f.read()).decode("ascii")
-
-        b2 = None
-        if has_bid and row["bid_path"]:
-            with open(row["bid_path"], "rb") as f:
-                b2 = base64.standard_b64encode(f.read()).decode("ascii")
-
-        system_prompt = build_system_prompt(has_bid)
-        user_content = build_user_content(
-            has_bid,
-            b1=b1,
-            media_type1=row["settlement_media_type"],
-            b2=b2,
-            media_type2=row["bid_media_type"],
-        )
 
-        client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-        response = client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=CLAUDE_MAX_TOKENS,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_content}],
-        )
+def request_bytes(params: dict) -> int:
+    """Size of a Messages API request body, for comparing input modes."""
+    return len(json.dumps(params, separators=(",", ":")))
 
-        # Extract text from response
-        text = "".join(
-            block.text for block in response.content if hasattr(block, "text")
-        )
 
-        # Parse JSON from response
-        match = re.search(r"\{[\s\S]*\}", text)
-        if not match:
-            raise ValueError("Could not parse JSON from AI response")
+def parse_text(text: str) -> dict:
+    """The JSON object in model output text, for replies that were not parsed
+    as they streamed. Raises ValueError if there is none."""
+    match = re.search(r"\{[\s\S]*\}", text)
+    if not match:
+        raise ValueError("Could not parse JSON from AI response")
+    return json.loads(match.group(0))
+
+
+def parse_response(response) -> dict:
+    """The JSON object in a model response. Raises ValueError if there is none."""
+    return parse_text("".join(
+        block.text for block in response.content if hasattr(block, "text")
+    ))
+
 
-        analysis = json.loads(match.group(0))
-        analysis_json_str = json.dumps(analysis)
+def _resumable(e: Exception, opened: bool) -> bool:
+    """Whether a failed analysis stream is worth resending: it dropped
+    mid-response, or failed to open for a transient reason (connection,
+    rate limit, overload). Client errors such as an oversized document are not.
+    """
+    if isinstance(e, anthropic.APIStatusError) and 400 <= e.status_code < 500:
+        return llm.is_retryable(e)
+    return opened or llm.is_retryable(e)
 
-        # Denormalize key fields for listing
+
+def stream_analysis(
+    conn: sqlite3.Connection,
+    case_id: int,
+    params: dict,
+    on_section: Optional[Callable[[str, Any], None]] = None,
+    input_mode: str = "pdf",
+) -> dict:
+    """Stream the analysis response and return the analysis object.
+
+    Each top-level section is checkpointed and passed to ``on_section`` as
+    soon as it closes. If the stream drops, or an earlier attempt for this
+    case was interrupted, the request is resent with the checkpointed
+    sections prefilled as the start of the assistant's reply, so the model
+    continues after them instead of starting over.
+
+    Usage is recorded per attempt under ``input_mode``, with the request
+    size and the attempt's wall time. Checkpoints are tagged with the input
+    mode too, so sections from an interrupted attempt in one mode are never
+    prefilled into a request in the other.
+
+    The object is built from the parsed sections; the full text is only
+    searched for JSON if the reply could not be parsed section by section.
+    Raises ValueError if neither yields an object.
+    """
+    emit = on_section or (lambda key, value: None)
+    checkpoint_tag = f"{PROMPT_VERSION}:{input_mode}"
+    with transaction(conn):
+        case_data.drop_stale_checkpoints(conn, case_id, checkpoint_tag)
+    sections = case_data.load_checkpoints(conn, case_id, checkpoint_tag)
+    for key, value_json in sections:
+        emit(key, json.loads(value_json))
+
+    for attempt in range(ANALYSIS_STREAM_RESUMES + 1):
+        request = params
+        prefix = ""
+        if sections:
+            prefix = "{" + "".join(f"{json.dumps(k)}:{v}," for k, v in sections)
+            request = {
+                **params,
+                "messages": params["messages"] + [{"role": "assistant", "content": prefix}],
+            }
+        parser = MemberParser()
+        parser.feed(prefix)
+        parts = [prefix]
+        stream = None
+        started = time.perf_counter()
+        try:
+            with llm.stream_message(**request) as stream:
+                for text in stream.text_stream:
+                    parts.append(text)
+                    if parser is None:
+                        continue
+                    try:
+                        completed = parser.feed(text)
+                    except ValueError:
+                        parser = None  # malformed section; the final parse reports it
+                        continue
+                    for key, value in completed:
+                        value_json = json.dumps(value)
+                        with transaction(conn):
+                            case_data.save_checkpoint(
+                                conn, case_id, len(sections), key, value_json, checkpoint_tag
+                            )
+                        sections.append((key, value_json))
+                        emit(key, value)
+        except Exception as e:
+            if attempt == ANALYSIS_STREAM_RESUMES or not _resumable(e, stream is not None):
+                raise
+            logger.warning(
+                "Analysis stream for case %s dropped after %d sections; resuming",
+                case_id, len(sections), exc_info=True,
+            )
+        else:
+            if parser is not None and parser.done:
+                return parser.result
+            return parse_text("".join(parts))
+        finally:
+            usage = llm.stream_usage(stream) if stream is not None else None
+            if usage is not None:
+                with transaction(conn):
+                    record_usage(
+                        conn, case_id, "analysis", usage,
+                        input_mode=input_mode,
+                        request_bytes=request_bytes(request),
+                        latency_seconds=time.perf_counter() - started,
+                    )
+
+
+def save_result(
+    conn: sqlite3.Connection, case_id: int, row: sqlite3.Row, analysis: dict, mode: str = "pdf"
+) -> dict:
+    """Store a finished analysis on the case and in the analysis cache under ``mode``."""
+    analysis_json_str = json.dumps(analysis)
+    with transaction(conn):
+        _save_analysis(conn, case_id, analysis, analysis_json_str)
+        _store_cached_analysis(conn, row, analysis_json_str, mode)
+    return _result(case_id, analysis_json_str)
+
+
+def save_response(
+    conn: sqlite3.Connection,
+    case_id: int,
+    row: sqlite3.Row,
+    response,
+    kind: str = "analysis",
+) -> dict:
+    """Record usage, parse and store a model response for a case.
+
+    Raises ValueError if the response holds no JSON object.
+    """
+    with transaction(conn):
+        record_usage(conn, case_id, kind, getattr(response, "usage", None))
+    return save_result(conn, case_id, row, parse_response(response))
+
+
+def mark_failed(conn: sqlite3.Connection, case_id: int, error: str) -> dict:
+    with transaction(conn):
         conn.execute(
-            """UPDATE cases SET
-                analysis_json = ?,
-                analysis_status = 'completed',
-                analysis_error = NULL,
-                case_name = ?,
-                case_number = ?,
-                jurisdiction = ?,
-                settlement_type = ?
-            WHERE id = ?""",
-            (
-                analysis_json_str,
-                analysis.get("case_name"),
-                analysis.get("case_number"),
-                analysis.get("jurisdiction"),
-                analysis.get("settlement_type"),
-                case_id,
-            ),
+            "UPDATE cases SET analysis_status = 'failed', analysis_error = ? WHERE id = ?",
+            (error, case_id),
         )
-        conn.commit()
+    return _result(case_id, None, error)
+
+
+def run_analysis(
+    conn: sqlite3.Connection,
+    case_id: int,
+    progress: Optional[Callable[[str], None]] = None,
+    chunked: bool = False,
+    on_section: Optional[Callable[[str, Any], None]] = None,
+    input_mode: Optional[str] = None,
+    force: bool = False,
+) -> dict:
+    """Run Claude analysis for a case. Returns dict with status, json, cached flag.
+
+    ``analysis_json`` in the result is the stored JSON text, so callers can
+    send it on without a parse/serialize round trip.
+
+    ``chunked`` analyzes a long settlement PDF as concurrent page ranges and
+    merges the results (see ``map_reduce``); short or non-PDF settlements
+    are analyzed whole either way.
 
-        return {
-            "id": case_id,
-            "analysis_status": "completed",
-            "analysis_json": analysis,
-            "analysis_error": None,
-            "cached": False,
-        }
+    ``input_mode`` (default ``ANALYSIS_INPUT_MODE``) is "pdf" to send the
+    documents whole or "hybrid" to send extracted text for pages with a good
+    text layer and images of the rest (see ``hybrid``); hybrid falls back to
+    whole documents when it does not apply. Results are cached per mode.
 
+    ``force`` skips the stored and cached results and calls the model again,
+    e.g. to compare input modes on documents already analyzed.
+
+    ``progress`` is called with each stage name as the analysis advances
+    ("reading_files", "model_call", "parsing", "persisted"), and
+    ``on_section`` with each top-level section of a streamed response as
+    soon as it is complete.
+    """
+    report = progress or (lambda stage: None)
+
+    row = load_case(conn, case_id)
+    try:
+        ranges = map_reduce.plan_chunks(row) if chunked else None
     except Exception as e:
+        return mark_failed(conn, case_id, str(e))
+
+    # Hybrid requests that fall back to whole documents are cached as
+    # "hybrid" too: that is what a hybrid request for these documents yields
+    mode = "chunked" if ranges else (input_mode or ANALYSIS_INPUT_MODE)
+
+    # Return the stored result, or one for identical documents
+    result = None if force else reuse_analysis(conn, case_id, row, mode)
+    if result:
+        if row["analysis_status"] != "completed":
+            report("persisted")
+        return result
+
+    # Mark as processing
+    with transaction(conn):
         conn.execute(
-            "UPDATE cases SET analysis_status = 'failed', analysis_error = ? WHERE id = ?",
-            (str(e), case_id),
+            "UPDATE cases SET analysis_status = 'processing' WHERE id = ?",
+            (case_id,),
         )
-        conn.commit()
-        return {
-            "id": case_id,
-            "analysis_status": "failed",
-            "analysis_json": None,
-            "analysis_error": str(e),
-            "cached": False,
-        }
+
+    try:
+        report("reading_files")
+        with metrics.stage("analysis", "reading_files"):
+            if ranges:
+                chunk_params = map_reduce.build_chunk_params(row, ranges)
+            else:
+                params = None
+                if mode == "hybrid":
+                    params = hybrid.build_params(conn, case_id, row)
+                used_mode = "hybrid" if params else "pdf"
+                params = params or build_analysis_params(row)
+
+        if ranges:
+            report("model_call")
+            with metrics.stage("analysis", "model_call"):
+                timed = map_reduce.call_chunks(chunk_params)
+            responses = [response for response, _ in timed]
+
+            report("parsing")
+            with transaction(conn):
+                for params, (response, seconds) in zip(chunk_params, timed):
+                    record_usage(
+                        conn, case_id, "analysis", getattr(response, "usage", None),
+                        input_mode="chunked",
+                        request_bytes=request_bytes(params),
+                        latency_seconds=seconds,
+                    )
+            with metrics.stage("analysis", "parsing"):
+                analysis = map_reduce.merge([parse_response(r) for r in responses], ranges)
+            with metrics.stage("analysis", "persist"):
+                result = save_result(conn, case_id, row, analysis, "chunked")
+            report("persisted")
+            return result
+
+        report("model_call")
+        with metrics.stage("analysis", "model_call"):
+            analysis = stream_analysis(conn, case_id, params, on_section, used_mode)
+
+        report("parsing")
+        with metrics.stage("analysis", "persist"):
+            result = save_result(conn, case_id, row, analysis, mode)
+        report("persisted")
+        return result
+
+    except Exception as e:
+        return mark_failed(conn, case_id, str(e))
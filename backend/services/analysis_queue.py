@@ -0,0 +1,228 @@
+"""Durable analysis queue with leases, shared by the API and worker processes.
+
+Each requested analysis is a row of ``analysis_queue``. A process runs it
+by claiming the row: one ``UPDATE ... RETURNING`` inside a write transaction
+sets the process as ``lease_owner`` until ``lease_expires_at``, so of any
+number of processes exactly one gets it. While it works, the owner's
+``LeaseKeeper`` pushes the expiry forward every third of
+``ANALYSIS_LEASE_SECONDS``. If the process dies, the lease runs out and the
+row is claimed again by whoever looks next; the analysis resumes from the
+sections it had checkpointed. A case whose claims keep expiring is failed
+after ``ANALYSIS_MAX_ATTEMPTS``.
+"""
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+from backend.config import ANALYSIS_LEASE_SECONDS, ANALYSIS_MAX_ATTEMPTS
+from backend.database import connect, transaction
+from backend.services.analysis import mark_failed, run_analysis
+
+logger = logging.getLogger(__name__)
+
+TERMINAL = ("completed", "failed")
+
+
+def owner_id() -> str:
+    """A lease owner name unique to this process (and this start of it)."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def enqueue(
+    conn: sqlite3.Connection,
+    case_id: int,
+    chunked: bool = False,
+    input_mode: Optional[str] = None,
+    force: bool = False,
+) -> bool:
+    """Queue an analysis of a case unless one is already queued or running.
+
+    Returns whether it was queued. Runs inside the caller's transaction.
+    """
+    cur = conn.execute(
+        """INSERT INTO analysis_queue (case_id, chunked, input_mode, force, enqueued_at)
+           VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT (case_id) DO UPDATE SET
+               status = 'queued', stage = 'queued', chunked = excluded.chunked,
+               input_mode = excluded.input_mode, force = excluded.force, lease_owner = NULL, lease_expires_at = NULL,
+               attempts = 0, cached = 0, error = NULL,
+               enqueued_at = excluded.enqueued_at, finished_at = NULL
+           WHERE analysis_queue.status IN ('completed', 'failed')""",
+        (case_id, int(chunked), input_mode, int(force), time.time()),
+    )
+    return cur.rowcount > 0
+
+
+def claim(
+    conn: sqlite3.Connection, owner: str, case_id: Optional[int] = None
+) -> Optional[sqlite3.Row]:
+    """Lease the longest-waiting claimable analysis (or ``case_id``'s): one
+    that is queued, or running under an expired lease.
+
+    Returns its row (case_id, chunked, input_mode, force, attempts) or None. Runs
+    inside the caller's transaction.
+    """
+    now = time.time()
+    only = "AND case_id = ?" if case_id is not None else ""
+    return conn.execute(
+        f"""UPDATE analysis_queue
+            SET status = 'running', stage = 'claimed', lease_owner = ?,
+                lease_expires_at = ?, attempts = attempts + 1
+            WHERE case_id = (
+                SELECT case_id FROM analysis_queue
+                WHERE (status = 'queued' OR (status = 'running' AND lease_expires_at < ?)) {only}
+                ORDER BY enqueued_at, case_id
+                LIMIT 1
+            )
+            RETURNING case_id, chunked, input_mode, force, attempts""",
+        (owner, now + ANALYSIS_LEASE_SECONDS, now, *([case_id] if case_id is not None else [])),
+    ).fetchone()
+
+
+def renew(conn: sqlite3.Connection, owner: str) -> int:
+    """Extend every lease ``owner`` holds. Returns how many it holds."""
+    return conn.execute(
+        """UPDATE analysis_queue SET lease_expires_at = ?
+           WHERE lease_owner = ? AND status = 'running'""",
+        (time.time() + ANALYSIS_LEASE_SECONDS, owner),
+    ).rowcount
+
+
+def set_stage(conn: sqlite3.Connection, case_id: int, owner: str, stage: str):
+    conn.execute(
+        "UPDATE analysis_queue SET stage = ? WHERE case_id = ? AND lease_owner = ?",
+        (stage, case_id, owner),
+    )
+
+
+def finish(conn: sqlite3.Connection, case_id: int, owner: str, result: dict) -> bool:
+    """Record the outcome of a claimed analysis and drop its lease.
+
+    Returns False if ``owner`` no longer held the lease (it expired and the
+    analysis was claimed again). Runs inside the caller's transaction.
+    """
+    return conn.execute(
+        """UPDATE analysis_queue
+           SET status = ?, stage = ?, cached = ?, error = ?, finished_at = ?,
+               lease_owner = NULL, lease_expires_at = NULL
+           WHERE case_id = ? AND lease_owner = ?""",
+        (
+            result["analysis_status"], result["analysis_status"], int(result.get("cached", False)),
+            result.get("analysis_error"), time.time(), case_id, owner,
+        ),
+    ).rowcount > 0
+
+
+def release(conn: sqlite3.Connection, owner: str) -> int:
+    """Hand every analysis ``owner`` is running back to the queue (on shutdown)."""
+    return conn.execute(
+        """UPDATE analysis_queue
+           SET status = 'queued', stage = 'queued', lease_owner = NULL, lease_expires_at = NULL
+           WHERE lease_owner = ? AND status = 'running'""",
+        (owner,),
+    ).rowcount
+
+
+def prune(conn: sqlite3.Connection, before: float) -> int:
+    """Delete rows of analyses that finished before ``before``."""
+    return conn.execute(
+        "DELETE FROM analysis_queue WHERE status IN ('completed', 'failed') AND finished_at < ?",
+        (before,),
+    ).rowcount
+
+
+def remove_case(conn: sqlite3.Connection, case_id: int):
+    conn.execute("DELETE FROM analysis_queue WHERE case_id = ?", (case_id,))
+
+
+def execute(
+    conn: sqlite3.Connection,
+    owner: str,
+    claimed: sqlite3.Row,
+    progress: Optional[Callable[[str], None]] = None,
+    on_section: Optional[Callable[[str, Any], None]] = None,
+) -> dict:
+    """Run a claimed analysis and record its outcome in the queue.
+
+    Stages are written to the queue row (for processes watching it) and
+    passed to ``progress``. Returns the ``run_analysis`` result.
+    """
+    case_id = claimed["case_id"]
+
+    def report(stage: str):
+        with transaction(conn):
+            set_stage(conn, case_id, owner, stage)
+        if progress:
+            progress(stage)
+
+    try:
+        if claimed["attempts"] > ANALYSIS_MAX_ATTEMPTS:
+            result = mark_failed(
+                conn, case_id,
+                f"Analysis abandoned after {ANALYSIS_MAX_ATTEMPTS} attempts (worker lost or crashed)",
+            )
+        else:
+            result = run_analysis(
+                conn, case_id, progress=report, chunked=bool(claimed["chunked"]),
+                on_section=on_section, input_mode=claimed["input_mode"], force=bool(claimed["force"]),
+            )
+    except Exception as e:
+        result = {
+            "id": case_id,
+            "analysis_status": "failed",
+            "analysis_json": None,
+            "analysis_error": str(e),
+            "cached": False,
+        }
+    with transaction(conn):
+        if not finish(conn, case_id, owner, result):
+            logger.warning("Lease on the analysis of case %s expired before it finished", case_id)
+    return result
+
+
+class LeaseKeeper:
+    """Renews one owner's leases on a daemon thread while the process runs.
+
+    ``renew_leases`` and ``seconds`` default to the analysis queue's; bulk
+    imports pass their own.
+    """
+
+    def __init__(
+        self,
+        owner: str,
+        renew_leases: Callable[[sqlite3.Connection, str], int] = renew,
+        seconds: float = ANALYSIS_LEASE_SECONDS,
+    ):
+        self.owner = owner
+        self._renew = renew_leases
+        self._seconds = seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="lease-keeper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        conn = connect()
+        try:
+            while not self._stop.wait(self._seconds / 3):
+                try:
+                    with transaction(conn):
+                        self._renew(conn, self.owner)
+                except Exception:
+                    logger.exception("Renewing leases failed")
+        finally:
+            conn.close()
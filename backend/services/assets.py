@@ -0,0 +1,126 @@
+"""The built frontend (``dist/``), indexed once at startup.
+
+Every file is recorded with its stat result, media type and a content ETag,
+so serving a request is a dict lookup rather than filesystem checks. Vite
+names everything under ``assets/`` by content hash; those files are cached
+by browsers for a year as immutable, while ``index.html`` and other
+unhashed files are revalidated (``no-cache`` + ETag) so a deploy is picked
+up on the next load.
+
+``npm run build`` writes Brotli (``.br``) and gzip (``.gz``) variants of the
+compressible files next to them (``precompress.js``); the smallest variant
+the client's ``Accept-Encoding`` allows is sent with ``Content-Encoding``.
+Files without variants are left to the gzip middleware.
+"""
+
+import hashlib
+import mimetypes
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Content-Encoding -> file suffix, in order of preference at equal q-values
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+def _etag(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:32]
+
+
+def build_manifest(dist: Path) -> dict[str, dict]:
+    """Relative URL path -> entry for every file under ``dist``."""
+    manifest = {}
+    for path in sorted(dist.rglob("*")):
+        if not path.is_file() or path.suffix in ENCODINGS.values():
+            continue
+        stat = path.stat()
+        rel = path.relative_to(dist).as_posix()
+        variants = {}
+        for encoding, suffix in ENCODINGS.items():
+            variant = path.with_name(path.name + suffix)
+            if variant.is_file():
+                variant_stat = variant.stat()
+                if variant_stat.st_size < stat.st_size:
+                    variants[encoding] = (str(variant), variant_stat)
+        manifest[rel] = {
+            "path": str(path),
+            "stat": stat,
+            "media_type": mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+            "etag": _etag(path),
+            "cache_control": IMMUTABLE if rel.startswith("assets/") else REVALIDATE,
+            "variants": variants,
+        }
+    return manifest
+
+
+def accepted_encodings(header: str) -> dict[str, float]:
+    """Content codings of an ``Accept-Encoding`` header with their q-values."""
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header: str, available) -> Optional[str]:
+    """The preferred encoding in ``available`` the client accepts, or None for identity."""
+    accepted = accepted_encodings(header or "")
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        if encoding not in available:
+            continue
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class Frontend:
+    """Serves the files of one ``dist`` directory from its manifest."""
+
+    def __init__(self, dist: Path):
+        self.dist = dist
+        self.manifest = build_manifest(dist)
+
+    def response(self, request: Request, path: str) -> Response:
+        entry = self.manifest.get(path)
+        if entry is None:
+            if path.startswith("assets/"):
+                # A missing hashed asset must not be answered with (cacheable) HTML
+                raise HTTPException(status_code=404, detail="Not found")
+            entry = self.manifest.get("index.html")
+            if entry is None:
+                raise HTTPException(status_code=404, detail="Not found")
+
+        encoding = choose_encoding(request.headers.get("accept-encoding"), entry["variants"])
+        etag = f'"{entry["etag"]}-{encoding}"' if encoding else f'"{entry["etag"]}"'
+        headers = {"Cache-Control": entry["cache_control"], "ETag": etag}
+        if encoding:
+            # Identity responses get Vary from the gzip middleware
+            headers["Vary"] = "Accept-Encoding"
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        file_path, stat = entry["path"], entry["stat"]
+        if encoding:
+            file_path, stat = entry["variants"][encoding]
+            headers["Content-Encoding"] = encoding
+        return FileResponse(file_path, media_type=entry["media_type"], headers=headers, stat_result=stat)
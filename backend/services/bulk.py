@@ -0,0 +1,655 @@
+"""Bulk ingestion of settlement/bid pairs and batch analysis.
+
+A bulk import reads a ZIP archive or a directory, streams each document into
+the content-addressed store on a pool of workers (text extraction starts as
+soon as each case is stored), then sends the analyses through the Message
+Batches API. Results are written back per provider batch as each one ends.
+
+Pairs come from ``manifest.json`` (a list of ``{"settlement": path, "bid":
+path}``) or ``manifest.csv`` (columns ``settlement,bid``) at the top of the
+source; without a manifest, each folder holding one settlement and at most
+one file with "bid" in its name is a case, and any other document is a
+settlement-only case.
+
+A running import is leased to its process (``lease_owner``), which renews
+the lease every third of ``BATCH_LEASE_SECONDS``. Only imports whose lease
+has run out, i.e. whose process stopped, are resumed by another process.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import posixpath
+import sqlite3
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from backend.config import (
+    MAX_UPLOAD_BYTES,
+    BULK_INGEST_WORKERS,
+    BATCH_MAX_REQUESTS,
+    BATCH_MAX_BYTES,
+    BATCH_POLL_SECONDS,
+    BATCH_ERROR_TIMEOUT_SECONDS,
+    BATCH_LEASE_SECONDS,
+)
+from backend.database import connect, transaction
+from backend.services import analysis, analysis_queue, message_batches, normalize, storage
+from backend.services.extraction import get_media_type, submit_extraction
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_EXTENSIONS = {"pdf", "png", "jpg", "jpeg", "gif", "webp"}
+ITEM_STATUSES = ("pending", "ingested", "submitted", "completed", "failed")
+
+# Rough size of the prompt and JSON framing around the documents in a batch request
+_REQUEST_OVERHEAD_BYTES = 32 * 1024
+
+
+class ZipSource:
+    """Documents inside a ZIP archive. ``owned`` archives are deleted on close."""
+
+    def __init__(self, path: str, owned: bool = False):
+        self.path = path
+        self.owned = owned
+        self.label = os.path.basename(path)
+        self._zip = zipfile.ZipFile(path)
+
+    def names(self) -> list[str]:
+        return [i.filename for i in self._zip.infolist() if not i.is_dir()]
+
+    def open(self, name: str) -> BinaryIO:
+        return self._zip.open(name)
+
+    def close(self):
+        self._zip.close()
+        if self.owned:
+            Path(self.path).unlink(missing_ok=True)
+
+
+class DirectorySource:
+    """Documents under a directory on the server."""
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+        self.label = str(self.root)
+
+    def names(self) -> list[str]:
+        return sorted(
+            p.relative_to(self.root).as_posix() for p in self.root.rglob("*") if p.is_file()
+        )
+
+    def open(self, name: str) -> BinaryIO:
+        path = (self.root / name).resolve()
+        if not path.is_relative_to(self.root):
+            raise ValueError(f"{name} is outside the import directory")
+        return open(path, "rb")
+
+    def close(self):
+        pass
+
+
+def open_source(path: str, owned: bool = False):
+    """A ZipSource or DirectorySource for ``path``. Raises ValueError otherwise."""
+    if os.path.isdir(path):
+        return DirectorySource(path)
+    if zipfile.is_zipfile(path):
+        return ZipSource(path, owned=owned)
+    raise ValueError(f"{path} is neither a directory nor a ZIP archive")
+
+
+def _is_document(name: str) -> bool:
+    base = posixpath.basename(name)
+    if name.startswith("__MACOSX/") or base.startswith("."):
+        return False
+    return base.rsplit(".", 1)[-1].lower() in DOCUMENT_EXTENSIONS if "." in base else False
+
+
+def plan_cases(source) -> list[dict]:
+    """Settlement/bid pairs in a source, in order. Entries that cannot be
+    imported carry an ``error`` and are recorded as failed items."""
+    names = source.names()
+    for manifest in ("manifest.json", "manifest.csv"):
+        if manifest in names:
+            with source.open(manifest) as f:
+                text = f.read().decode("utf-8-sig")
+            if manifest.endswith(".json"):
+                entries = json.loads(text)
+            else:
+                entries = list(csv.DictReader(io.StringIO(text)))
+            if not isinstance(entries, list):
+                raise ValueError(f"{manifest} must be a list of settlement/bid pairs")
+            plan = []
+            for entry in entries:
+                settlement = (entry.get("settlement") or "").strip()
+                bid = (entry.get("bid") or "").strip() or None
+                missing = [n for n in (settlement, bid) if n and n not in names]
+                plan.append({
+                    "settlement": settlement or "(missing)",
+                    "bid": bid,
+                    "error": (
+                        "No settlement file given" if not settlement
+                        else f"Not found: {', '.join(missing)}" if missing
+                        else None
+                    ),
+                })
+            return plan
+
+    folders: dict[str, list[str]] = {}
+    for name in names:
+        if _is_document(name):
+            folders.setdefault(posixpath.dirname(name), []).append(name)
+
+    plan = []
+    for folder, files in sorted(folders.items()):
+        bids = [f for f in files if "bid" in posixpath.basename(f).lower()]
+        settlements = [f for f in files if f not in bids]
+        if folder and len(settlements) == 1 and len(bids) <= 1:
+            plan.append({"settlement": settlements[0], "bid": bids[0] if bids else None, "error": None})
+            continue
+        plan += [{"settlement": f, "bid": None, "error": None} for f in settlements]
+        plan += [
+            {"settlement": f, "bid": None, "error": "Bid file could not be paired with a settlement"}
+            for f in bids
+        ]
+    return plan
+
+
+def _finish_item(conn: sqlite3.Connection, item_id: int, error: Optional[str] = None, cached=False):
+    with transaction(conn):
+        conn.execute(
+            """UPDATE batch_items SET status = ?, error = ?, cached = ?, finished_at = ?
+               WHERE id = ?""",
+            ("failed" if error else "completed", error, int(cached), time.time(), item_id),
+        )
+
+
+def renew(conn: sqlite3.Connection, owner: str) -> int:
+    """Extend the lease of every running import ``owner`` holds. Returns how many."""
+    return conn.execute(
+        """UPDATE batches SET lease_expires_at = ?
+           WHERE lease_owner = ? AND status IN ('ingesting', 'analyzing')""",
+        (time.time() + BATCH_LEASE_SECONDS, owner),
+    ).rowcount
+
+
+class BatchManager:
+    """Runs bulk imports on background threads, one runner thread per import."""
+
+    def __init__(self):
+        self.owner = analysis_queue.owner_id()
+        self._keeper = analysis_queue.LeaseKeeper(self.owner, renew, BATCH_LEASE_SECONDS)
+        self._lock = threading.Lock()
+        self._running: dict[int, threading.Event] = {}
+        self._watcher: Optional[threading.Thread] = None
+
+    def start(self, source) -> int:
+        """Plan and record an import from ``source`` and start it. Returns the batch id.
+
+        Raises ValueError if the source holds nothing to import.
+        """
+        try:
+            plan = plan_cases(source)
+        except (ValueError, KeyError, UnicodeDecodeError) as e:
+            source.close()
+            raise ValueError(f"Invalid manifest: {e}")
+        if not plan:
+            source.close()
+            raise ValueError("No documents found to import")
+
+        conn = connect()
+        try:
+            with transaction(conn):
+                batch_id = conn.execute(
+                    """INSERT INTO batches (source, total, started_at, lease_owner, lease_expires_at)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    (source.label, len(plan), time.time(), self.owner, time.time() + BATCH_LEASE_SECONDS),
+                ).lastrowid
+                conn.executemany(
+                    """INSERT INTO batch_items
+                        (batch_id, position, settlement_name, bid_name, status, error, finished_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    [
+                        (
+                            batch_id, i, p["settlement"], p["bid"],
+                            "failed" if p["error"] else "pending", p["error"],
+                            time.time() if p["error"] else None,
+                        )
+                        for i, p in enumerate(plan)
+                    ],
+                )
+        finally:
+            conn.close()
+
+        self._spawn(batch_id, source)
+        return batch_id
+
+    def resume(self) -> list[int]:
+        """Take over unfinished imports whose process stopped (their lease ran out).
+
+        Documents not yet stored cannot be re-read (uploaded archives are
+        temporary), so those items fail; everything stored is analyzed, and
+        provider batches already submitted are polled for their results.
+        Returns the ids of the imports taken over.
+        """
+        conn = connect()
+        try:
+            now = time.time()
+            with transaction(conn):
+                ids = [
+                    r["id"]
+                    for r in conn.execute(
+                        """UPDATE batches SET lease_owner = ?, lease_expires_at = ?
+                           WHERE status IN ('ingesting', 'analyzing')
+                             AND (lease_owner IS NULL OR lease_owner != ?)
+                             AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                           RETURNING id""",
+                        (self.owner, now + BATCH_LEASE_SECONDS, self.owner, now),
+                    ).fetchall()
+                ]
+                conn.executemany(
+                    """UPDATE batch_items
+                       SET status = 'failed', error = 'Interrupted before ingestion', finished_at = ?
+                       WHERE batch_id = ? AND status = 'pending'""",
+                    [(now, batch_id) for batch_id in ids],
+                )
+        finally:
+            conn.close()
+        for batch_id in ids:
+            logger.info("Resuming bulk import %s", batch_id)
+            self._spawn(batch_id, None)
+        return ids
+
+    def watch(self):
+        """Resume stopped imports now, and from then on whenever a lease runs out."""
+        self.resume()
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="bulk-watcher", daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(BATCH_LEASE_SECONDS / 3)
+            try:
+                self.resume()
+            except Exception:
+                logger.exception("Resuming bulk imports failed")
+
+    def is_running(self, batch_id: int) -> bool:
+        with self._lock:
+            return batch_id in self._running
+
+    def wait(self, batch_id: int, timeout: Optional[float] = None) -> bool:
+        """Block until an import started in this process finishes."""
+        with self._lock:
+            done = self._running.get(batch_id)
+        return done.wait(timeout) if done else True
+
+    def _spawn(self, batch_id: int, source):
+        self._keeper.start()
+        with self._lock:
+            self._running[batch_id] = threading.Event()
+        threading.Thread(
+            target=self._run, args=(batch_id, source), name=f"bulk-{batch_id}", daemon=True
+        ).start()
+
+    def _run(self, batch_id: int, source):
+        conn = connect()
+        try:
+            if source is not None:
+                self._ingest(conn, batch_id, source)
+            with transaction(conn):
+                conn.execute(
+                    """UPDATE batches SET status = 'analyzing', ingested_at = COALESCE(ingested_at, ?)
+                       WHERE id = ?""",
+                    (time.time(), batch_id),
+                )
+            backend = message_batches.get_backend()
+            self._submit(conn, batch_id, backend)
+            self._collect(conn, batch_id, backend)
+            status, error = "completed", None
+        except Exception as e:
+            logger.exception("Bulk import %s failed", batch_id)
+            status, error = "failed", str(e)
+        finally:
+            if source is not None:
+                source.close()
+        try:
+            with transaction(conn):
+                conn.execute(
+                    """UPDATE batches SET status = ?, error = ?, finished_at = ?,
+                                          lease_owner = NULL, lease_expires_at = NULL
+                       WHERE id = ? AND lease_owner = ?""",
+                    (status, error, time.time(), batch_id, self.owner),
+                )
+        finally:
+            conn.close()
+            with self._lock:
+                self._running.pop(batch_id).set()
+
+    # -- ingestion ---------------------------------------------------------
+
+    def _ingest(self, conn: sqlite3.Connection, batch_id: int, source):
+        items = conn.execute(
+            """SELECT id, settlement_name, bid_name FROM batch_items
+               WHERE batch_id = ? AND status = 'pending' ORDER BY position""",
+            (batch_id,),
+        ).fetchall()
+        with ThreadPoolExecutor(max_workers=BULK_INGEST_WORKERS, thread_name_prefix="ingest") as pool:
+            list(pool.map(lambda item: self._ingest_item(item, source), items))
+
+    def _ingest_item(self, item: sqlite3.Row, source):
+        """Store, normalize and record one pair. Any error fails only this
+        item, after releasing what it had stored."""
+        conn = connect()
+        stored = []
+        try:
+            docs = {}
+            for doc, name in (("settlement", item["settlement_name"]), ("bid", item["bid_name"])):
+                if not name:
+                    continue
+                with source.open(name) as f:
+                    digest, path = storage.store_file(conn, f, name, MAX_UPLOAD_BYTES)
+                stored.append(digest)
+                docs[doc] = normalize.prepare(
+                    conn, [(posixpath.basename(name), path, digest, get_media_type(name))]
+                )
+                if docs[doc]["model_sha256"]:
+                    stored.append(docs[doc]["model_sha256"])
+
+            with transaction(conn):
+                case_id = conn.execute(
+                    """INSERT INTO cases
+                        (settlement_filename, settlement_path, settlement_media_type, settlement_sha256,
+                         settlement_model_path, settlement_model_media_type, settlement_model_sha256,
+                         bid_filename, bid_path, bid_media_type, bid_sha256,
+                         bid_model_path, bid_model_media_type, bid_model_sha256, has_bid,
+                         extraction_status)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'extracting')""",
+                    (*normalize.case_values(docs["settlement"], docs.get("bid")), int("bid" in docs)),
+                ).lastrowid
+                for doc, prepared in docs.items():
+                    normalize.save_report(conn, case_id, doc, prepared["files"])
+                conn.execute(
+                    "UPDATE batch_items SET status = 'ingested', case_id = ? WHERE id = ?",
+                    (case_id, item["id"]),
+                )
+        except Exception as e:
+            if not isinstance(e, (OSError, KeyError, ValueError, zipfile.BadZipFile)):
+                logger.exception("Ingesting bulk import item %s failed", item["id"])
+            for digest in stored:
+                storage.release(conn, digest)
+            _finish_item(conn, item["id"], error=str(e))
+            return
+        finally:
+            conn.close()
+        submit_extraction(case_id)
+
+    # -- analysis ----------------------------------------------------------
+
+    def _submit(self, conn: sqlite3.Connection, batch_id: int, backend):
+        """Send every stored, unanalyzed case to the batch backend.
+
+        Cases whose documents were analyzed before are completed from the
+        analysis cache; cases with identical documents share one request.
+        """
+        submitted = dict(
+            conn.execute(
+                """SELECT custom_id, provider_batch_id FROM batch_items
+                   WHERE batch_id = ? AND status = 'submitted'""",
+                (batch_id,),
+            ).fetchall()
+        )
+        items = conn.execute(
+            """SELECT id, case_id FROM batch_items
+               WHERE batch_id = ? AND status = 'ingested' ORDER BY position""",
+            (batch_id,),
+        ).fetchall()
+
+        requests: list[dict] = []
+        size = 0
+
+        def flush():
+            nonlocal requests, size
+            if not requests:
+                return
+            provider_id = backend.create(requests)
+            custom_ids = [r["custom_id"] for r in requests]
+            submitted.update((c, provider_id) for c in custom_ids)
+            placeholders = ", ".join("?" * len(custom_ids))
+            with transaction(conn):
+                conn.execute(
+                    f"""UPDATE batch_items SET status = 'submitted', provider_batch_id = ?
+                        WHERE batch_id = ? AND status = 'ingested' AND custom_id IN ({placeholders})""",
+                    (provider_id, batch_id, *custom_ids),
+                )
+                conn.execute(
+                    f"""UPDATE cases SET analysis_status = 'processing'
+                        WHERE id IN (SELECT case_id FROM batch_items
+                                     WHERE provider_batch_id = ? AND custom_id IN ({placeholders}))""",
+                    (provider_id, *custom_ids),
+                )
+            logger.info("Bulk import %s: submitted %d requests as %s", batch_id, len(custom_ids), provider_id)
+            requests, size = [], 0
+
+        queued = set()
+        for item in items:
+            try:
+                row = analysis.load_case(conn, item["case_id"])
+                if analysis.reuse_analysis(conn, item["case_id"], row):
+                    _finish_item(conn, item["id"], cached=True)
+                    continue
+                custom_id = analysis.analysis_cache_key(row["settlement_sha256"], row["bid_sha256"])
+                with transaction(conn):
+                    conn.execute(
+                        "UPDATE batch_items SET custom_id = ? WHERE id = ?", (custom_id, item["id"])
+                    )
+                if custom_id in submitted:
+                    # Identical documents already sent in an earlier request
+                    with transaction(conn):
+                        conn.execute(
+                            """UPDATE batch_items SET status = 'submitted', provider_batch_id = ?
+                               WHERE id = ?""",
+                            (submitted[custom_id], item["id"]),
+                        )
+                    continue
+                if custom_id in queued:
+                    continue
+
+                request_size = _REQUEST_OVERHEAD_BYTES + sum(
+                    os.path.getsize(row[f"{doc}_path"]) * 4 // 3
+                    for doc in ("settlement", "bid")
+                    if row[f"{doc}_path"]
+                )
+                if requests and (
+                    len(requests) >= BATCH_MAX_REQUESTS or size + request_size > BATCH_MAX_BYTES
+                ):
+                    flush()
+                requests.append(
+                    {"custom_id": custom_id, "params": analysis.build_analysis_params(row)}
+                )
+                queued.add(custom_id)
+                size += request_size
+            except (OSError, ValueError) as e:
+                analysis.mark_failed(conn, item["case_id"], str(e))
+                _finish_item(conn, item["id"], error=str(e))
+        flush()
+
+    def _collect(self, conn: sqlite3.Connection, batch_id: int, backend):
+        """Poll submitted provider batches and write results as each one ends.
+
+        A provider batch whose status or results fail to load is polled again
+        until it has failed for ``BATCH_ERROR_TIMEOUT_SECONDS``; only then,
+        or once the provider no longer has it, are its items failed.
+        """
+        failing: dict[str, float] = {}  # provider batch id -> first failure
+        while True:
+            pending = [
+                r[0]
+                for r in conn.execute(
+                    """SELECT DISTINCT provider_batch_id FROM batch_items
+                       WHERE batch_id = ? AND status = 'submitted'""",
+                    (batch_id,),
+                ).fetchall()
+            ]
+            if not pending:
+                return
+            for provider_id in pending:
+                try:
+                    if backend.retrieve(provider_id)["status"] != "ended":
+                        continue
+                    for result in backend.results(provider_id):
+                        self._apply(conn, batch_id, result)
+                    error = "No result returned for this request"
+                except message_batches.BatchNotFound:
+                    error = f"Provider batch {provider_id} is no longer available"
+                except Exception as e:
+                    since = failing.setdefault(provider_id, time.monotonic())
+                    if time.monotonic() - since < BATCH_ERROR_TIMEOUT_SECONDS:
+                        logger.warning(
+                            "Bulk import %s: polling provider batch %s failed; retrying",
+                            batch_id, provider_id, exc_info=True,
+                        )
+                        continue
+                    error = f"Provider batch {provider_id} could not be read: {e}"
+                for item in conn.execute(
+                    """SELECT id, case_id FROM batch_items
+                       WHERE batch_id = ? AND provider_batch_id = ? AND status = 'submitted'""",
+                    (batch_id, provider_id),
+                ).fetchall():
+                    analysis.mark_failed(conn, item["case_id"], error)
+                    _finish_item(conn, item["id"], error=error)
+            time.sleep(BATCH_POLL_SECONDS)
+
+    def _apply(self, conn: sqlite3.Connection, batch_id: int, result: dict):
+        items = conn.execute(
+            """SELECT id, case_id FROM batch_items
+               WHERE batch_id = ? AND custom_id = ? AND status = 'submitted' ORDER BY position""",
+            (batch_id, result["custom_id"]),
+        ).fetchall()
+        if not items:
+            return
+
+        error = result["error"]
+        if result["type"] == "succeeded":
+            first = items[0]
+            try:
+                row = analysis.load_case(conn, first["case_id"])
+                analysis.save_response(
+                    conn, first["case_id"], row, result["message"], kind="batch_analysis"
+                )
+            except Exception as e:
+                error = str(e)
+            else:
+                _finish_item(conn, first["id"])
+                # Followers with identical documents now hit the analysis cache
+                for item in items[1:]:
+                    try:
+                        row = analysis.load_case(conn, item["case_id"])
+                        reused = analysis.reuse_analysis(conn, item["case_id"], row)
+                        _finish_item(conn, item["id"], None if reused else "Shared result missing", True)
+                    except ValueError as e:
+                        _finish_item(conn, item["id"], error=str(e))
+                return
+
+        for item in items:
+            analysis.mark_failed(conn, item["case_id"], error or result["type"])
+            _finish_item(conn, item["id"], error=error or result["type"])
+
+
+def active_batch(conn: sqlite3.Connection, case_id: int) -> Optional[int]:
+    """The running bulk import that will analyze the case, if any."""
+    row = conn.execute(
+        """SELECT i.batch_id FROM batch_items i JOIN batches b ON b.id = i.batch_id
+           WHERE i.case_id = ? AND i.status IN ('ingested', 'submitted')
+             AND b.status IN ('ingesting', 'analyzing')""",
+        (case_id,),
+    ).fetchone()
+    return row["batch_id"] if row else None
+
+
+def _rate(done: int, seconds: Optional[float]) -> Optional[float]:
+    return round(done / seconds * 60, 2) if seconds else None
+
+
+def progress(conn: sqlite3.Connection, batch_id: int) -> Optional[dict]:
+    """Status, per-status item counts, throughput and ETA of a bulk import."""
+    batch = conn.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+    if not batch:
+        return None
+    counts = dict.fromkeys(ITEM_STATUSES, 0)
+    counts.update(
+        conn.execute(
+            "SELECT status, COUNT(*) FROM batch_items WHERE batch_id = ? GROUP BY status",
+            (batch_id,),
+        ).fetchall()
+    )
+    stats = conn.execute(
+        """SELECT SUM(cached) AS cached,
+                  SUM(case_id IS NOT NULL) AS ingested,
+                  SUM(case_id IS NOT NULL AND status IN ('completed', 'failed')) AS analyzed
+           FROM batch_items WHERE batch_id = ?""",
+        (batch_id,),
+    ).fetchone()
+    provider_batches = [
+        r[0]
+        for r in conn.execute(
+            """SELECT DISTINCT provider_batch_id FROM batch_items
+               WHERE batch_id = ? AND provider_batch_id IS NOT NULL""",
+            (batch_id,),
+        ).fetchall()
+    ]
+
+    now = batch["finished_at"] or time.time()
+    ingest_seconds = (batch["ingested_at"] or now) - batch["started_at"]
+    analysis_seconds = now - batch["ingested_at"] if batch["ingested_at"] else None
+    analyzed = stats["analyzed"] or 0
+    remaining = counts["ingested"] + counts["submitted"]
+    analysis_rate = analyzed / analysis_seconds if analysis_seconds and analyzed else None
+
+    return {
+        "id": batch["id"],
+        "source": batch["source"],
+        "status": batch["status"],
+        "created_at": batch["created_at"],
+        "error": batch["error"],
+        "total": batch["total"],
+        "counts": counts,
+        "cached": stats["cached"] or 0,
+        "provider_batches": provider_batches,
+        "ingest": {
+            "done": stats["ingested"] or 0,
+            "seconds": round(ingest_seconds, 2),
+            "per_minute": _rate(stats["ingested"] or 0, ingest_seconds),
+        },
+        "analysis": {
+            "done": analyzed,
+            "seconds": round(analysis_seconds, 2) if analysis_seconds else None,
+            "per_minute": _rate(analyzed, analysis_seconds),
+        },
+        "eta_seconds": round(remaining / analysis_rate, 1) if analysis_rate and remaining else None,
+    }
+
+
+def failures(conn: sqlite3.Connection, batch_id: int) -> list[dict]:
+    rows = conn.execute(
+        """SELECT position, settlement_name, bid_name, case_id, error FROM batch_items
+           WHERE batch_id = ? AND status = 'failed' ORDER BY position""",
+        (batch_id,),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def list_batches(conn: sqlite3.Connection, limit: int = 50) -> list[dict]:
+    rows = conn.execute("SELECT id FROM batches ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [progress(conn, r["id"]) for r in rows]
+
+
+batch_manager = BatchManager()
@@ -0,0 +1,103 @@
+"""Large per-case payloads (extracted text, analysis JSON), stored compressed.
+
+These live in side tables keyed by case id rather than on the ``cases`` row,
+so listing and file-serving queries never page them in. Callers that need
+them load them explicitly.
+"""
+
+import hashlib
+import sqlite3
+import zlib
+from typing import Optional
+
+COMPRESSION_LEVEL = 6
+
+
+def compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decompress(body: bytes) -> str:
+    return zlib.decompress(body).decode("utf-8")
+
+
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def save_text(conn: sqlite3.Connection, case_id: int, doc: str, text: Optional[str]):
+    """Store (or with ``None``, remove) a document's full text, inside the caller's transaction."""
+    if text is None:
+        conn.execute("DELETE FROM case_texts WHERE case_id = ? AND doc = ?", (case_id, doc))
+        return
+    conn.execute(
+        "INSERT OR REPLACE INTO case_texts (case_id, doc, body) VALUES (?, ?, ?)",
+        (case_id, doc, compress(text)),
+    )
+
+
+def load_text(conn: sqlite3.Connection, case_id: int, doc: str) -> Optional[str]:
+    row = conn.execute(
+        "SELECT body FROM case_texts WHERE case_id = ? AND doc = ?", (case_id, doc)
+    ).fetchone()
+    return decompress(row["body"]) if row else None
+
+
+def save_analysis(conn: sqlite3.Connection, case_id: int, analysis_json_str: str):
+    """Store a case's analysis JSON, inside the caller's transaction."""
+    conn.execute(
+        "INSERT OR REPLACE INTO case_analysis (case_id, body, sha256) VALUES (?, ?, ?)",
+        (case_id, compress(analysis_json_str), digest(analysis_json_str)),
+    )
+
+
+def load_analysis(conn: sqlite3.Connection, case_id: int) -> Optional[str]:
+    """The stored analysis JSON string for a case, or None."""
+    row = conn.execute(
+        "SELECT body FROM case_analysis WHERE case_id = ?", (case_id,)
+    ).fetchone()
+    return decompress(row["body"]) if row else None
+
+
+def save_checkpoint(
+    conn: sqlite3.Connection, case_id: int, position: int, key: str, value_json: str,
+    prompt_version: str,
+):
+    """Record a completed section of an in-progress analysis, inside the caller's transaction."""
+    conn.execute(
+        """INSERT OR REPLACE INTO analysis_checkpoints
+            (case_id, position, key, value, prompt_version)
+        VALUES (?, ?, ?, ?, ?)""",
+        (case_id, position, key, value_json, prompt_version),
+    )
+
+
+def load_checkpoints(
+    conn: sqlite3.Connection, case_id: int, prompt_version: str
+) -> list[tuple[str, str]]:
+    """``(key, value JSON)`` of the sections checkpointed so far, in response order."""
+    rows = conn.execute(
+        """SELECT key, value FROM analysis_checkpoints
+           WHERE case_id = ? AND prompt_version = ? ORDER BY position""",
+        (case_id, prompt_version),
+    ).fetchall()
+    return [(r["key"], r["value"]) for r in rows]
+
+
+def drop_stale_checkpoints(conn: sqlite3.Connection, case_id: int, prompt_version: str):
+    """Drop checkpoints written under another prompt version or input mode."""
+    conn.execute(
+        "DELETE FROM analysis_checkpoints WHERE case_id = ? AND prompt_version != ?",
+        (case_id, prompt_version),
+    )
+
+
+def clear_checkpoints(conn: sqlite3.Connection, case_id: int):
+    conn.execute("DELETE FROM analysis_checkpoints WHERE case_id = ?", (case_id,))
+
+
+def remove_case(conn: sqlite3.Connection, case_id: int):
+    """Drop a case's stored text and analysis, inside the caller's transaction."""
+    conn.execute("DELETE FROM case_texts WHERE case_id = ?", (case_id,))
+    conn.execute("DELETE FROM case_analysis WHERE case_id = ?", (case_id,))
+    clear_checkpoints(conn, case_id)
@@ -0,0 +1,149 @@
+"""Case chat: request assembly and async SSE streaming of the model's reply."""
+
+import json
+import sqlite3
+import time
+from typing import AsyncIterator, Optional
+
+import anyio
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from backend.config import CLAUDE_MODEL, CHAT_MAX_TOKENS, CHAT_FLUSH_CHARS, CHAT_FLUSH_SECONDS
+from backend.database import connect, transaction
+from backend.prompts import build_chat_system_prompt, build_chat_messages
+from backend.services import chat_sessions, llm, metrics, retrieval
+from backend.services.usage import record_usage
+
+
+def build_chat_params(
+    conn: sqlite3.Connection,
+    case_id: int,
+    analysis: dict,
+    messages: list[dict],
+    summary: Optional[str] = None,
+) -> dict:
+    """Messages API parameters for one chat turn, grounded via retrieval."""
+    sections, passages = retrieval.select_context(
+        conn, case_id, analysis, retrieval.retrieval_query(messages) or ""
+    )
+    return {
+        "model": CLAUDE_MODEL,
+        "max_tokens": CHAT_MAX_TOKENS,
+        "system": build_chat_system_prompt(retrieval.core_sections(analysis), summary),
+        "messages": build_chat_messages(messages, sections, passages),
+    }
+
+
+def prepare_turn(
+    conn: sqlite3.Connection, case_id: int, analysis: dict, session_id: Optional[int], question: str
+) -> tuple[dict, dict]:
+    """Parameters for the next turn of a session (a new one if ``session_id`` is None).
+
+    Returns (params, turn); ``turn`` is what ``stream_chat`` needs to store
+    the exchange. A new session is only created when its first exchange is
+    stored. Raises ValueError for a session not belonging to the case.
+    """
+    if session_id is None:
+        summary, messages, recent = None, [], []
+    else:
+        session = chat_sessions.get_session(conn, case_id, session_id)
+        if session is None:
+            raise ValueError("Chat session not found")
+        # Normally already done after the previous reply; catches up if that failed
+        if chat_sessions.compact(conn, case_id, session_id):
+            session = chat_sessions.get_session(conn, case_id, session_id)
+        summary = session["summary"]
+        messages, recent = chat_sessions.history(conn, session)
+    sent, full = chat_sessions.history_tokens(summary, messages, recent)
+    turn = {
+        "session_id": session_id,
+        "question": question,
+        "history_tokens": sent,
+        "full_history_tokens": full,
+    }
+    history = chat_sessions.plain(recent) + [{"role": "user", "content": question}]
+    return build_chat_params(conn, case_id, analysis, history, summary), turn
+
+
+def _sse(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def _save_turn(case_id: int, turn: dict, reply: str, usage):
+    conn = connect()
+    try:
+        with transaction(conn):
+            record_usage(conn, case_id, "chat", usage)
+            if turn["session_id"] is None:
+                turn["session_id"] = chat_sessions.create_session(conn, case_id, turn["question"])
+            chat_sessions.add_turn(
+                conn, turn["session_id"], turn["question"], reply, usage,
+                turn["history_tokens"], turn["full_history_tokens"],
+            )
+    finally:
+        conn.close()
+
+
+def compact_after_turn(case_id: int, turn: dict):
+    """Background task: compact the turn's session once its reply has been sent."""
+    if turn["session_id"] is not None:
+        chat_sessions.compact_after_turn(case_id, turn["session_id"])
+
+
+async def stream_chat(
+    request: Request, case_id: int, params: dict, turn: dict
+) -> AsyncIterator[str]:
+    """Yield SSE frames for a chat reply, then store the exchange in its session.
+
+    A "session" frame names the session: first for an existing one, and
+    just before "stop" for a new one, which is created when the exchange is
+    stored. Deltas are batched into frames of at least CHAT_FLUSH_CHARS
+    characters or CHAT_FLUSH_SECONDS of age. If the client goes away the
+    upstream stream is closed straight away so it stops generating (and
+    billing); the partial reply is kept. A turn that was never billed is not
+    stored, so a failed first turn leaves no empty session behind.
+    """
+    stream = None
+    reply = []
+    saved = False
+
+    async def save():
+        nonlocal saved
+        saved = True
+        # Input tokens are billed even when the reply was cut short; shielded
+        # so the write still happens when the response task is cancelled.
+        usage = llm.stream_usage(stream) if stream is not None else None
+        if usage is not None:
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(_save_turn, case_id, turn, "".join(reply), usage)
+
+    new_session = turn["session_id"] is None
+    metrics.CHATS_IN_FLIGHT.inc()
+    try:
+        if not new_session:
+            yield _sse({"type": "session", "session_id": turn["session_id"]})
+        async with llm.astream_message(**params) as stream:
+            buffer = []
+            buffered = 0
+            last_flush = time.monotonic()
+            async for text in stream.text_stream:
+                reply.append(text)
+                buffer.append(text)
+                buffered += len(text)
+                if buffered < CHAT_FLUSH_CHARS and time.monotonic() - last_flush < CHAT_FLUSH_SECONDS:
+                    continue
+                if await request.is_disconnected():
+                    return
+                yield _sse({"type": "delta", "text": "".join(buffer)})
+                buffer, buffered, last_flush = [], 0, time.monotonic()
+            if buffer:
+                yield _sse({"type": "delta", "text": "".join(buffer)})
+        await save()
+        if new_session and turn["session_id"] is not None:
+            yield _sse({"type": "session", "session_id": turn["session_id"]})
+        yield _sse({"type": "stop"})
+    finally:
+        metrics.CHATS_IN_FLIGHT.dec()
+        if not saved:
+            await save()
@@ -0,0 +1,206 @@
+"""Persisted case chat sessions with a rolling summary of older turns.
+
+The client sends only its new message; the conversation is kept here. Once
+the turns not yet summarized exceed ``CHAT_HISTORY_BUDGET_TOKENS``, all but
+the last ``CHAT_KEEP_MESSAGES`` are folded into the session's summary by a
+separate model call, and from then on only the summary and the recent turns
+are sent. Each assistant message records the token usage of its turn and
+estimates of the history it was sent with versus the whole conversation.
+"""
+
+import logging
+import sqlite3
+from typing import Optional
+
+from backend.config import (
+    CLAUDE_MODEL, CHAT_HISTORY_BUDGET_TOKENS, CHAT_KEEP_MESSAGES, CHAT_SUMMARY_MAX_TOKENS,
+)
+from backend.database import connect, transaction
+from backend.prompts import CHAT_SUMMARY_SYSTEM_PROMPT, build_chat_summary_request
+from backend.services import llm
+from backend.services.usage import USAGE_FIELDS, record_usage
+
+logger = logging.getLogger(__name__)
+
+TITLE_CHARS = 80
+
+
+def plain(messages: list[dict]) -> list[dict]:
+    """Stored messages as Messages API role/content dicts."""
+    return [{"role": m["role"], "content": m["content"]} for m in messages]
+
+
+def _tokens(messages: list[dict], summary: Optional[str] = None) -> int:
+    """Estimated input tokens of a history (and summary)."""
+    if not messages and not summary:
+        return 0
+    return llm.estimate_input_tokens({"system": summary or "", "messages": plain(messages)})
+
+
+def create_session(conn: sqlite3.Connection, case_id: int, first_message: str) -> int:
+    """Start a session titled after its first message, inside the caller's transaction."""
+    title = " ".join(first_message.split())
+    if len(title) > TITLE_CHARS:
+        title = title[: TITLE_CHARS - 1].rstrip() + "…"
+    return conn.execute(
+        "INSERT INTO chat_sessions (case_id, title) VALUES (?, ?)", (case_id, title or "Chat")
+    ).lastrowid
+
+
+def get_session(conn: sqlite3.Connection, case_id: int, session_id: int) -> Optional[sqlite3.Row]:
+    return conn.execute(
+        "SELECT * FROM chat_sessions WHERE id = ? AND case_id = ?", (session_id, case_id)
+    ).fetchone()
+
+
+def list_sessions(conn: sqlite3.Connection, case_id: int) -> list[dict]:
+    """A case's sessions, most recently used first."""
+    rows = conn.execute(
+        """SELECT s.id, s.title, s.created_at, s.updated_at, s.summary IS NOT NULL AS compacted,
+                  COUNT(m.id) AS message_count
+           FROM chat_sessions s LEFT JOIN chat_messages m ON m.session_id = s.id
+           WHERE s.case_id = ?
+           GROUP BY s.id
+           ORDER BY s.updated_at DESC, s.id DESC""",
+        (case_id,),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def session_messages(conn: sqlite3.Connection, session_id: int) -> list[dict]:
+    """Every message of a session, with per-turn usage on assistant messages."""
+    rows = conn.execute(
+        "SELECT * FROM chat_messages WHERE session_id = ? ORDER BY id", (session_id,)
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def session_usage(conn: sqlite3.Connection, session: sqlite3.Row) -> dict:
+    """Token totals of a session's turns and summary calls."""
+    row = conn.execute(
+        f"""SELECT COUNT(*) AS turns,
+                   {", ".join(f"COALESCE(SUM({f}), 0) AS {f}" for f in USAGE_FIELDS)},
+                   COALESCE(SUM(history_tokens), 0) AS history_tokens,
+                   COALESCE(SUM(full_history_tokens), 0) AS full_history_tokens
+            FROM chat_messages WHERE session_id = ? AND role = 'assistant'""",
+        (session["id"],),
+    ).fetchone()
+    usage = dict(row)
+    usage["summary_input_tokens"] = session["summary_input_tokens"]
+    usage["summary_output_tokens"] = session["summary_output_tokens"]
+    return usage
+
+
+def history(conn: sqlite3.Connection, session: sqlite3.Row) -> tuple[list[dict], list[dict]]:
+    """(all messages, messages not yet folded into the summary), oldest first."""
+    rows = conn.execute(
+        "SELECT id, role, content FROM chat_messages WHERE session_id = ? ORDER BY id",
+        (session["id"],),
+    ).fetchall()
+    messages = [dict(r) for r in rows]
+    recent = [m for m in messages if m["id"] > session["summarized_through"]]
+    return messages, recent
+
+
+def history_tokens(summary: Optional[str], messages: list[dict], recent: list[dict]) -> tuple[int, int]:
+    """Estimated tokens of the history sent with a turn, and of the full conversation."""
+    return _tokens(recent, summary), _tokens(messages)
+
+
+def add_turn(
+    conn: sqlite3.Connection,
+    session_id: int,
+    question: str,
+    reply: str,
+    usage,
+    history_tokens: int,
+    full_history_tokens: int,
+):
+    """Append a question and its reply, inside the caller's transaction.
+
+    Both are written together so the stored history always alternates.
+    """
+    conn.execute(
+        "INSERT INTO chat_messages (session_id, role, content) VALUES (?, 'user', ?)",
+        (session_id, question),
+    )
+    values = [getattr(usage, f, None) or 0 for f in USAGE_FIELDS]
+    conn.execute(
+        f"""INSERT INTO chat_messages
+            (session_id, role, content, {", ".join(USAGE_FIELDS)}, history_tokens, full_history_tokens)
+            VALUES (?, 'assistant', ?, ?, ?, ?, ?, ?, ?)""",
+        (session_id, reply, *values, history_tokens, full_history_tokens),
+    )
+    conn.execute("UPDATE chat_sessions SET updated_at = datetime('now') WHERE id = ?", (session_id,))
+
+
+def _to_fold(recent: list[dict]) -> list[dict]:
+    """The oldest recent messages to summarize, or [] while within budget."""
+    keep = CHAT_KEEP_MESSAGES + CHAT_KEEP_MESSAGES % 2  # cut between turns
+    if len(recent) <= keep or _tokens(recent) <= CHAT_HISTORY_BUDGET_TOKENS:
+        return []
+    return recent[: len(recent) - keep]
+
+
+def compact(conn: sqlite3.Connection, case_id: int, session_id: int) -> bool:
+    """Fold a session's older turns into its summary if it is over budget.
+
+    Makes the summary call outside any transaction. Returns whether the
+    summary was updated; of concurrent compactions the first to commit wins.
+    """
+    session = conn.execute("SELECT * FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+    if session is None:
+        return False
+    _, recent = history(conn, session)
+    fold = _to_fold(recent)
+    if not fold:
+        return False
+
+    message = llm.create_message(
+        model=CLAUDE_MODEL,
+        max_tokens=CHAT_SUMMARY_MAX_TOKENS,
+        system=CHAT_SUMMARY_SYSTEM_PROMPT,
+        messages=build_chat_summary_request(session["summary"], plain(fold)),
+    )
+    summary = "".join(b.text for b in message.content if b.type == "text").strip()
+    if not summary:
+        raise ValueError("Model returned an empty chat summary")
+    usage = message.usage
+    with transaction(conn):
+        record_usage(conn, case_id, "chat_summary", usage)
+        return conn.execute(
+            """UPDATE chat_sessions
+               SET summary = ?, summarized_through = ?,
+                   summary_input_tokens = summary_input_tokens + ?,
+                   summary_output_tokens = summary_output_tokens + ?
+               WHERE id = ? AND summarized_through = ?""",
+            (
+                summary, fold[-1]["id"],
+                usage.input_tokens or 0, usage.output_tokens or 0,
+                session_id, session["summarized_through"],
+            ),
+        ).rowcount > 0
+
+
+def compact_after_turn(case_id: int, session_id: int):
+    """Compact a session once its reply has been sent, so the next turn need not wait."""
+    conn = connect()
+    try:
+        compact(conn, case_id, session_id)
+    except Exception:
+        logger.exception("Compacting chat session %s failed", session_id)
+    finally:
+        conn.close()
+
+
+def delete_session(conn: sqlite3.Connection, session_id: int):
+    conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+    conn.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,))
+
+
+def remove_case(conn: sqlite3.Connection, case_id: int):
+    conn.execute(
+        "DELETE FROM chat_messages WHERE session_id IN (SELECT id FROM chat_sessions WHERE case_id = ?)",
+        (case_id,),
+    )
+    conn.execute("DELETE FROM chat_sessions WHERE case_id = ?", (case_id,))
@@ -0,0 +1,183 @@
+"""Verification of analysis citations against the extracted page text.
+
+Each ``{doc, page, quote}`` citation is matched against a shingle index of
+its document: every page is reduced to the set of word n-grams
+(``CITATION_SHINGLE_WORDS`` words) of its normalized text, with a posting
+list from each shingle to the pages holding it. A quote scores, per page,
+the share of its own shingles found there, so small OCR or wording
+differences lower the score instead of failing the match. The verified page
+is the best-scoring page nearest the cited one: the cited page when it
+holds the quote, else a neighbour, else wherever in the document it is.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from backend.config import CITATION_SHINGLE_WORDS, CITATION_INDEX_CACHE_SIZE
+
+# Scores at or above this count as verified
+VERIFIED_SCORE = 0.6
+
+
+def _words(text: str) -> list[str]:
+    # Rejoin words hyphenated across line breaks in the extracted text
+    return re.findall(r"\w+", re.sub(r"-\s*\n\s*", "", text).lower())
+
+
+def shingles(text: str, size: int = CITATION_SHINGLE_WORDS) -> set[tuple[str, ...]]:
+    words = _words(text)
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class ShingleIndex:
+    """Word-shingle postings over the pages of one document."""
+
+    def __init__(self, pages: dict[int, str]):
+        self.texts = pages
+        self.postings: dict[tuple[str, ...], list[int]] = {}
+        for page_no in sorted(pages):
+            for shingle in shingles(pages[page_no]):
+                self.postings.setdefault(shingle, []).append(page_no)
+        # Quotes shorter than a shingle, looked up by scanning the pages once
+        self._short: dict[tuple[str, ...], list[int]] = {}
+
+    def match(self, quote: str, cited_page: Optional[int]) -> tuple[Optional[int], float]:
+        """``(page, score)`` for a quote: the page holding most of it, nearest the cited page."""
+        quote_shingles = shingles(quote)
+        if not quote_shingles:
+            return None, 0.0
+        counts: Counter = Counter()
+        for shingle in quote_shingles:
+            if len(shingle) == CITATION_SHINGLE_WORDS:
+                counts.update(self.postings.get(shingle, ()))
+            else:
+                counts.update(self._pages_with(shingle))
+        if not counts:
+            return None, 0.0
+        best = max(counts.values())
+        anchor = cited_page if cited_page is not None else 0
+        page = min((p for p, n in counts.items() if n == best), key=lambda p: (abs(p - anchor), p))
+        return page, round(best / len(quote_shingles), 3)
+
+    def _pages_with(self, words: tuple[str, ...]) -> list[int]:
+        if words not in self._short:
+            phrase = f" {' '.join(words)} "
+            self._short[words] = [
+                p for p, text in sorted(self.texts.items())
+                if phrase in f" {' '.join(_words(text))} "
+            ]
+        return self._short[words]
+
+
+# Per-case indexes, rebuilt when the case's pages change
+_cache: "OrderedDict[int, tuple[tuple, dict[str, ShingleIndex]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_indexes(conn: sqlite3.Connection, case_id: int) -> dict[str, ShingleIndex]:
+    """Shingle index per document of a case (empty if no page text is stored)."""
+    version = tuple(
+        conn.execute(
+            "SELECT COUNT(*), MAX(id) FROM document_pages WHERE case_id = ?", (case_id,)
+        ).fetchone()
+    )
+    with _cache_lock:
+        cached = _cache.get(case_id)
+        if cached and cached[0] == version:
+            _cache.move_to_end(case_id)
+            return cached[1]
+
+    docs: dict[str, dict[int, str]] = {}
+    for doc, page_no, text in conn.execute(
+        "SELECT doc, page_no, text FROM document_pages WHERE case_id = ?", (case_id,)
+    ):
+        docs.setdefault(doc, {})[page_no] = text
+    indexes = {doc: ShingleIndex(pages) for doc, pages in docs.items()}
+
+    with _cache_lock:
+        _cache[case_id] = (version, indexes)
+        _cache.move_to_end(case_id)
+        while len(_cache) > CITATION_INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return indexes
+
+
+def _page(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def verify_case(conn: sqlite3.Connection, case_id: int, analysis: dict) -> bool:
+    """Check every citation in an analysis and store the results, inside the
+    caller's transaction. Returns False (storing nothing) if the case's page
+    text is not extracted yet."""
+    indexes = get_indexes(conn, case_id)
+    if not indexes:
+        return False
+
+    rows = []
+    cited = analysis.get("citations")
+    for path, entries in (cited.items() if isinstance(cited, dict) else ()):
+        for position, entry in enumerate(entries if isinstance(entries, list) else []):
+            if not isinstance(entry, dict):
+                continue
+            doc, page, quote = entry.get("doc"), _page(entry.get("page")), entry.get("quote")
+            index = indexes.get(doc)
+            verified_page, score = (
+                index.match(quote, page) if index and isinstance(quote, str) else (None, 0.0)
+            )
+            rows.append((case_id, path, position, doc, page, quote, verified_page, score))
+
+    conn.execute("DELETE FROM citation_checks WHERE case_id = ?", (case_id,))
+    conn.executemany(
+        """INSERT INTO citation_checks
+            (case_id, path, position, doc, page, quote, verified_page, score)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        rows,
+    )
+    return True
+
+
+def remove_case(conn: sqlite3.Connection, case_id: int):
+    conn.execute("DELETE FROM citation_checks WHERE case_id = ?", (case_id,))
+
+
+def backfill(conn: sqlite3.Connection):
+    """Verify every stored analysis with extracted pages (used by the migration)."""
+    from backend.services.case_data import decompress
+
+    rows = conn.execute(
+        """SELECT case_id, body FROM case_analysis
+           WHERE case_id IN (SELECT DISTINCT case_id FROM document_pages)"""
+    ).fetchall()
+    for case_id, body in rows:
+        analysis = json.loads(decompress(body))
+        if isinstance(analysis, dict):
+            verify_case(conn, case_id, analysis)
+
+
+def report(conn: sqlite3.Connection, case_id: int) -> dict:
+    """Stored verification results for a case, with counts by outcome."""
+    rows = conn.execute(
+        """SELECT path, position, doc, page, quote, verified_page, score
+           FROM citation_checks WHERE case_id = ? ORDER BY path, position""",
+        (case_id,),
+    ).fetchall()
+    citations = [dict(r) for r in rows]
+    verified = [c for c in citations if c["score"] >= VERIFIED_SCORE]
+    return {
+        "case_id": case_id,
+        "total": len(citations),
+        "verified": len(verified),
+        "corrected": sum(1 for c in verified if c["verified_page"] != c["page"]),
+        "unmatched": len(citations) - len(verified),
+        "citations": citations,
+    }
@@ -1,7 +1,37 @@
 """PDF text extraction (PyMuPDF) and media type helpers."""
 
+import json
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
 import fitz  # PyMuPDF
 
+from backend.config import EXTRACTION_WORKERS, EXTRACTION_PROCESSES, EXTRACTION_PAGES_PER_TASK
+from backend.database import connect, transaction
+from backend.services import case_data, citations, metrics
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS, thread_name_prefix="extract")
+
+# Page ranges of large PDFs are parsed in separate processes; created on first use.
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=EXTRACTION_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
 
 def get_media_type(filename: str) -> str:
     ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
@@ -12,14 +42,115 @@ def get_media_type(filename: str) -> str:
     return f"image/{ext}" if ext else "application/octet-stream"
 
 
-def extract_text(file_path: str, media_type: str) -> str:
-    """Extract text from a PDF using PyMuPDF. Returns empty string for images."""
-    if media_type != "application/pdf":
-        return ""
+def _extract_page_range(file_path: str, start: int, stop: int) -> list[str]:
+    doc = fitz.open(file_path)
     try:
-        doc = fitz.open(file_path)
-        text = "\n".join(page.get_text() for page in doc)
+        return [doc[i].get_text() for i in range(start, stop)]
+    finally:
         doc.close()
-        return text
-    except Exception:
-        return ""
+
+
+def extract_pages(file_path: str, media_type: str) -> list[str]:
+    """Extract text per page from a PDF. Returns an empty list for images.
+
+    PDFs longer than one task's page range are split across the process pool.
+    """
+    if media_type != "application/pdf":
+        return []
+
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+
+    step = EXTRACTION_PAGES_PER_TASK
+    if page_count <= step or EXTRACTION_PROCESSES <= 1:
+        return _extract_page_range(file_path, 0, page_count)
+
+    pool = _get_process_pool()
+    futures = [
+        pool.submit(_extract_page_range, file_path, start, min(start + step, page_count))
+        for start in range(0, page_count, step)
+    ]
+    return [text for future in futures for text in future.result()]
+
+
+def _store_pages(conn, case_id: int, doc: str, pages: list[str]):
+    conn.execute(
+        "DELETE FROM document_pages WHERE case_id = ? AND doc = ?", (case_id, doc)
+    )
+    conn.executemany(
+        "INSERT INTO document_pages (case_id, doc, page_no, text) VALUES (?, ?, ?, ?)",
+        [(case_id, doc, page_no, text) for page_no, text in enumerate(pages, start=1)],
+    )
+
+
+def extract_case_text(case_id: int):
+    """Extract per-page text for a case's documents and mark it ready (or failed)."""
+    conn = connect()
+    try:
+        row = conn.execute(
+            """SELECT settlement_path, settlement_media_type, bid_path, bid_media_type
+               FROM cases WHERE id = ?""",
+            (case_id,),
+        ).fetchone()
+        if not row:
+            return
+
+        started = time.perf_counter()
+        try:
+            with metrics.stage("extraction", "extract"):
+                settlement_pages = extract_pages(row["settlement_path"], row["settlement_media_type"])
+                bid_pages = None
+                if row["bid_path"]:
+                    bid_pages = extract_pages(row["bid_path"], row["bid_media_type"])
+        except Exception:
+            logger.exception("Text extraction failed for case %s", case_id)
+            with transaction(conn):
+                conn.execute(
+                    "UPDATE cases SET extraction_status = 'failed' WHERE id = ?", (case_id,)
+                )
+            return
+        elapsed = time.perf_counter() - started
+        page_count = len(settlement_pages) + len(bid_pages or [])
+
+        with metrics.stage("extraction", "store"), transaction(conn):
+            _store_pages(conn, case_id, "settlement", settlement_pages)
+            if bid_pages is not None:
+                _store_pages(conn, case_id, "bid", bid_pages)
+            case_data.save_text(conn, case_id, "settlement", "\n".join(settlement_pages))
+            case_data.save_text(
+                conn, case_id, "bid", "\n".join(bid_pages) if bid_pages is not None else None
+            )
+            conn.execute(
+                """UPDATE cases SET
+                    extraction_status = 'ready',
+                    page_count = ?,
+                    extraction_seconds = ?
+                WHERE id = ?""",
+                (page_count, elapsed, case_id),
+            )
+            # Analyses that finished before the page text was ready
+            analysis_json = case_data.load_analysis(conn, case_id)
+            if analysis_json:
+                citations.verify_case(conn, case_id, json.loads(analysis_json))
+        logger.info(
+            "Case %s: extracted %d pages in %.2fs (%.1f pages/s)",
+            case_id, page_count, elapsed, page_count / elapsed if elapsed else 0.0,
+        )
+    finally:
+        conn.close()
+
+
+def submit_extraction(case_id: int) -> Future:
+    """Queue text extraction for a case on the worker pool, off the event loop."""
+    return _executor.submit(extract_case_text, case_id)
+
+
+def resume_pending(conn) -> int:
+    """Queue extraction for every case left 'extracting': uploads cut off by a
+    restart and cases stored before per-page text. Returns how many."""
+    rows = conn.execute("SELECT id FROM cases WHERE extraction_status = 'extracting'").fetchall()
+    for row in rows:
+        submit_extraction(row["id"])
+    if rows:
+        logger.info("Resuming text extraction for %d cases", len(rows))
+    return len(rows)
@@ -0,0 +1,129 @@
+"""Hybrid analysis input: extracted text where the text layer is good, images elsewhere.
+
+Most settlements are born-digital, so their extracted text carries everything
+the model needs at a fraction of the tokens of a PDF document block (which
+sends every page as both text and an image). Each page's stored text is
+scored for quality:
+
+- pages with fewer than ``HYBRID_MIN_PAGE_CHARS`` non-blank characters are poor;
+- otherwise the score is the share of printable characters times the share
+  of word-like tokens (two or more letters or digits in a row), which is low
+  for OCR garbage, mis-encoded fonts and "s p a c e d" text.
+
+Pages scoring at least ``HYBRID_MIN_TEXT_QUALITY`` are sent as text tagged
+with their page number; the rest are rasterized to JPEG. A document with
+more poor pages than good is sent as its original PDF, as is everything when
+the page text is not extracted yet or more than ``HYBRID_MAX_IMAGES`` images
+would be needed.
+"""
+
+import base64
+import re
+import sqlite3
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+from backend.config import (
+    CLAUDE_MODEL,
+    CLAUDE_MAX_TOKENS,
+    HYBRID_MIN_PAGE_CHARS,
+    HYBRID_MIN_TEXT_QUALITY,
+    HYBRID_MAX_IMAGES,
+    HYBRID_RASTER_DPI,
+    IMAGE_MAX_EDGE,
+)
+from backend.prompts import build_hybrid_user_content, build_system_blocks
+
+_JPEG_QUALITY = 80
+
+_WORD = re.compile(r"[^\W_]{2,}")
+
+
+def page_quality(text: str) -> float:
+    """Text-layer quality of one page, from 0 (unusable) to 1."""
+    tokens = text.split()
+    chars = sum(len(t) for t in tokens)
+    if chars < HYBRID_MIN_PAGE_CHARS:
+        return 0.0
+    printable = sum(1 for t in tokens for ch in t if ch.isprintable() and ch != "\ufffd")
+    wordlike = sum(1 for t in tokens if _WORD.search(t))
+    return round(printable / chars * wordlike / len(tokens), 3)
+
+
+def _rasterize(page: fitz.Page) -> str:
+    scale = min(HYBRID_RASTER_DPI / 72, IMAGE_MAX_EDGE / max(page.rect.width, page.rect.height))
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
+    return base64.standard_b64encode(pixmap.tobytes("jpeg", jpg_quality=_JPEG_QUALITY)).decode("ascii")
+
+
+def _is_blank(page: fitz.Page) -> bool:
+    return not page.get_text().strip() and not page.get_images() and not page.get_drawings()
+
+
+def _document_pages(path: str, texts: dict[int, str]) -> Optional[list[dict]]:
+    """Page parts of one PDF, or None if it is better sent whole."""
+    poor = [p for p, text in texts.items() if page_quality(text) < HYBRID_MIN_TEXT_QUALITY]
+    if len(poor) * 2 > len(texts):
+        return None
+    poor = set(poor)
+    parts = []
+    with fitz.open(path) as doc:
+        if doc.page_count != len(texts):
+            return None  # the stored text is not for this file
+        for page_no in sorted(texts):
+            if page_no not in poor:
+                parts.append({"page": page_no, "text": texts[page_no]})
+                continue
+            page = doc[page_no - 1]
+            if _is_blank(page):
+                continue
+            parts.append({"page": page_no, "image": _rasterize(page)})
+    return parts
+
+
+def _pdf_part(path: str, media_type: str) -> dict:
+    with open(path, "rb") as f:
+        return {"data": base64.standard_b64encode(f.read()).decode("ascii"), "media_type": media_type}
+
+
+def build_params(conn: sqlite3.Connection, case_id: int, row) -> Optional[dict]:
+    """Messages API parameters for a hybrid analysis of a case, or None when
+    no document is better off sent as text (use the whole-PDF request)."""
+    ready = conn.execute(
+        "SELECT extraction_status FROM cases WHERE id = ?", (case_id,)
+    ).fetchone()
+    if not ready or ready[0] != "ready":
+        return None
+
+    texts: dict[str, dict[int, str]] = {}
+    for doc, page_no, text in conn.execute(
+        "SELECT doc, page_no, text FROM document_pages WHERE case_id = ?", (case_id,)
+    ):
+        texts.setdefault(doc, {})[page_no] = text
+
+    has_bid = bool(row["has_bid"])
+    documents = [("settlement", row["settlement_path"], row["settlement_media_type"])]
+    if has_bid and row["bid_path"]:
+        documents.append(("bid", row["bid_path"], row["bid_media_type"]))
+
+    parts, images, any_text = [], 0, False
+    for doc, path, media_type in documents:
+        pages = None
+        if media_type == "application/pdf" and texts.get(doc):
+            pages = _document_pages(path, texts[doc])
+        if pages is None:
+            parts.append({"doc": doc, "pdf": _pdf_part(path, media_type)})
+            continue
+        images += sum(1 for p in pages if "image" in p)
+        any_text = any_text or any("text" in p for p in pages)
+        parts.append({"doc": doc, "pages": pages})
+
+    if not any_text or images > HYBRID_MAX_IMAGES:
+        return None
+    return {
+        "model": CLAUDE_MODEL,
+        "max_tokens": CLAUDE_MAX_TOKENS,
+        "system": build_system_blocks(has_bid),
+        "messages": [{"role": "user", "content": build_hybrid_user_content(parts)}],
+    }
@@ -0,0 +1,367 @@
+"""Background analysis jobs: bounded concurrency, per-case coalescing, progress events."""
+
+import asyncio
+import contextvars
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+from backend.config import (
+    ANALYSIS_MAX_CONCURRENCY,
+    ANALYSIS_JOB_RETENTION_SECONDS,
+    ANALYSIS_EXECUTION,
+    ANALYSIS_INPUT_MODE,
+    ANALYSIS_QUEUE_POLL_SECONDS,
+)
+from backend.database import connect, transaction
+from backend.services import analysis_queue, bulk, case_data, metrics
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_EVENTS = ("completed", "failed")
+
+
+class JobConflict(ValueError):
+    """The case is already being analyzed in a way this request cannot share."""
+
+
+class AnalysisJob:
+    """One in-flight (or recently finished) analysis of a single case.
+
+    Progress is published as a list of events so that subscribers who attach
+    late still see the full history before live updates.
+    """
+
+    def __init__(
+        self, case_id: int, chunked: bool = False, input_mode: Optional[str] = None, force: bool = False
+    ):
+        self.id = uuid.uuid4().hex
+        self.case_id = case_id
+        self.chunked = chunked
+        self.input_mode = input_mode or ANALYSIS_INPUT_MODE
+        self.force = force
+        self.status = "queued"  # queued | running | completed | failed
+        self.stage = "queued"
+        self.result: Optional[dict] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.events: list[dict] = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._subscribers: list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self.publish({"type": "stage", "stage": "queued"})
+
+    def publish(self, event: dict):
+        event = {"job_id": self.id, "case_id": self.case_id, "ts": time.time(), **event}
+        with self._lock:
+            if event["type"] == "stage":
+                self.stage = event["stage"]
+            self.events.append(event)
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def set_stage(self, stage: str):
+        self.status = "running"
+        self.publish({"type": "stage", "stage": stage})
+
+    def add_section(self, key: str, value):
+        """Publish a top-level analysis section as soon as the model has finished it."""
+        self.publish({"type": "section", "key": key, "value": value})
+
+    def finish(self, result: dict):
+        self.result = result
+        self.status = result["analysis_status"]
+        self.finished_at = time.time()
+        self.publish({
+            "type": self.status,
+            "analysis_status": result["analysis_status"],
+            "analysis_error": result.get("analysis_error"),
+            "cached": result.get("cached", False),
+        })
+        self._done.set()
+
+    @property
+    def options(self) -> tuple[bool, str, bool]:
+        """(chunked, input_mode, force) the analysis was started with."""
+        return self.chunked, self.input_mode, self.force
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Block until the job finishes and return its run_analysis result."""
+        self._done.wait(timeout)
+        return self.result
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id": self.id,
+            "case_id": self.case_id,
+            "status": self.status,
+            "stage": self.stage,
+            "chunked": self.chunked,
+            "input_mode": self.input_mode,
+            "force": self.force,
+            "analysis_error": (self.result or {}).get("analysis_error"),
+            "events_url": f"/api/cases/jobs/{self.id}/events",
+        }
+
+    async def stream(self) -> AsyncIterator[dict]:
+        """Yield past events, then live ones, until the job reaches a terminal state."""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        subscriber = (loop, queue)
+        with self._lock:
+            history = list(self.events)
+            self._subscribers.append(subscriber)
+        try:
+            for event in history:
+                yield event
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+            while True:
+                event = await queue.get()
+                yield event
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            with self._lock:
+                self._subscribers.remove(subscriber)
+
+
+class JobManager:
+    """Runs analyses one job per case at a time, here or in worker processes.
+
+    Every analysis goes through the durable queue (``analysis_queue``). With
+    ``ANALYSIS_EXECUTION=inline`` a job claims its case at once and runs it on
+    a bounded thread pool under this process's lease. With ``workers`` the
+    job only queues the case for ``python -m backend.worker``. Jobs whose
+    case is running elsewhere are followed by a watcher thread that polls the
+    queue and the checkpointed sections, and publishes them as the job's
+    events. Inline, the watcher also claims analyses whose process died.
+    """
+
+    def __init__(self, max_concurrency: int, execution: str = ANALYSIS_EXECUTION):
+        self.inline = execution == "inline"
+        self.owner = analysis_queue.owner_id()
+        self._max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="analysis"
+        )
+        self._keeper = analysis_queue.LeaseKeeper(self.owner)
+        self._lock = threading.Lock()
+        self._jobs: dict[str, AnalysisJob] = {}
+        self._active: dict[int, AnalysisJob] = {}
+        # Jobs of analyses running in other processes: case_id -> [job, sections published]
+        self._watched: dict[int, list] = {}
+        self._running = 0
+        self._watcher: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the watcher (inline, it recovers analyses of dead processes)."""
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="analysis-watcher", daemon=True)
+                self._watcher.start()
+
+    def submit(
+        self,
+        conn: sqlite3.Connection,
+        case_id: int,
+        chunked: bool = False,
+        input_mode: Optional[str] = None,
+        force: bool = False,
+    ) -> tuple[AnalysisJob, bool]:
+        """Start an analysis for ``case_id`` or attach to the one already running.
+
+        ``conn`` is used to queue (and, inline, claim) the analysis. Returns
+        ``(job, created)``. Raises JobConflict if the running analysis was
+        started with options whose result would not answer this request, or
+        the case is waiting for its analysis in a running bulk import.
+        """
+        batch_id = bulk.active_batch(conn, case_id)
+        if batch_id is not None:
+            raise JobConflict(f"Case {case_id} is being analyzed by bulk import {batch_id}")
+        requested = (chunked, input_mode or ANALYSIS_INPUT_MODE, force)
+        with self._lock:
+            self._prune()
+            job = self._active.get(case_id)
+            if job is not None:
+                _check_options(case_id, job.options, requested)
+                return job, False
+            job = AnalysisJob(case_id, chunked, input_mode, force)
+            self._jobs[job.id] = job
+            self._active[case_id] = job
+        try:
+            with transaction(conn):
+                if not analysis_queue.enqueue(conn, case_id, chunked, input_mode, force):
+                    # Already queued or running in another process
+                    row = conn.execute(
+                        "SELECT chunked, input_mode, force FROM analysis_queue WHERE case_id = ?",
+                        (case_id,),
+                    ).fetchone()
+                    running = (bool(row["chunked"]), row["input_mode"] or ANALYSIS_INPUT_MODE, bool(row["force"]))
+                    _check_options(case_id, running, requested)
+                    job.chunked, job.input_mode, job.force = running
+                claimed = analysis_queue.claim(conn, self.owner, case_id) if self.inline else None
+        except Exception:
+            with self._lock:
+                self._active.pop(case_id, None)
+                del self._jobs[job.id]
+            raise
+        if claimed is not None:
+            # In the submitting request's context, so its timings include the job's stages
+            self._start(job, claimed, contextvars.copy_context())
+        else:
+            with self._lock:
+                self._watched[case_id] = [job, 0]
+            self.start()
+        return job, True
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_for_case(self, case_id: int) -> Optional[AnalysisJob]:
+        with self._lock:
+            return self._active.get(case_id)
+
+    def _start(self, job: AnalysisJob, claimed, context: contextvars.Context):
+        self._keeper.start()
+        with self._lock:
+            self._running += 1
+        self._executor.submit(context.run, self._run, job, claimed)
+
+    def _run(self, job: AnalysisJob, claimed):
+        conn = connect()
+        try:
+            with metrics.ANALYSES_IN_FLIGHT.track():
+                result = analysis_queue.execute(
+                    conn, self.owner, claimed, progress=job.set_stage, on_section=job.add_section
+                )
+        except Exception as e:
+            result = {
+                "id": job.case_id,
+                "analysis_status": "failed",
+                "analysis_json": None,
+                "analysis_error": str(e),
+                "cached": False,
+            }
+        finally:
+            conn.close()
+        with self._lock:
+            self._active.pop(job.case_id, None)
+            self._running -= 1
+        job.finish(result)
+
+    def _watch(self):
+        conn = connect()
+        next_prune = 0.0
+        try:
+            while True:
+                time.sleep(ANALYSIS_QUEUE_POLL_SECONDS)
+                try:
+                    if self.inline:
+                        self._reclaim(conn)
+                    self._follow(conn)
+                    if time.monotonic() >= next_prune:
+                        with transaction(conn):
+                            analysis_queue.prune(conn, time.time() - ANALYSIS_JOB_RETENTION_SECONDS)
+                        next_prune = time.monotonic() + 60
+                except Exception:
+                    logger.exception("Following queued analyses failed")
+        finally:
+            conn.close()
+
+    def _reclaim(self, conn):
+        """Claim queued analyses and those of dead processes, up to the free slots."""
+        while True:
+            with self._lock:
+                if self._running >= self._max_concurrency:
+                    return
+            with transaction(conn):
+                claimed = analysis_queue.claim(conn, self.owner)
+            if claimed is None:
+                return
+            case_id = claimed["case_id"]
+            logger.info("Claimed the analysis of case %s (attempt %s)", case_id, claimed["attempts"])
+            with self._lock:
+                watched = self._watched.pop(case_id, None)
+                job = watched[0] if watched else AnalysisJob(
+                    case_id, bool(claimed["chunked"]), claimed["input_mode"], bool(claimed["force"])
+                )
+                self._jobs[job.id] = job
+                self._active[case_id] = job
+            self._start(job, claimed, contextvars.Context())
+
+    def _follow(self, conn):
+        """Publish the progress of watched analyses and finish the jobs of ended ones."""
+        with self._lock:
+            watched = dict(self._watched)
+        if not watched:
+            return
+        marks = ",".join("?" * len(watched))
+        rows = {
+            row["case_id"]: row
+            for row in conn.execute(
+                f"SELECT case_id, status, stage, cached, error FROM analysis_queue WHERE case_id IN ({marks})",
+                list(watched),
+            )
+        }
+        for row in conn.execute(
+            f"""SELECT case_id, position, key, value FROM analysis_checkpoints
+                WHERE case_id IN ({marks}) ORDER BY case_id, position""",
+            list(watched),
+        ):
+            entry = watched[row["case_id"]]
+            if row["position"] >= entry[1]:
+                entry[0].add_section(row["key"], json.loads(row["value"]))
+                entry[1] = row["position"] + 1
+
+        for case_id, (job, _) in watched.items():
+            row = rows.get(case_id)
+            if row is not None and row["status"] not in analysis_queue.TERMINAL:
+                if row["stage"] not in ("queued", job.stage):
+                    job.set_stage(row["stage"])
+                continue
+            if row is None:
+                result = {"analysis_status": "failed", "analysis_error": f"Case {case_id} not found"}
+            else:
+                result = {"analysis_status": row["status"], "analysis_error": row["error"]}
+            completed = result["analysis_status"] == "completed"
+            result.update({
+                "id": case_id,
+                "analysis_json": case_data.load_analysis(conn, case_id) if completed else None,
+                "cached": bool(row and row["cached"]),
+            })
+            with self._lock:
+                self._watched.pop(case_id, None)
+                self._active.pop(case_id, None)
+            job.finish(result)
+
+    def _prune(self):
+        cutoff = time.time() - ANALYSIS_JOB_RETENTION_SECONDS
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+
+def _check_options(case_id: int, running: tuple, requested: tuple):
+    """Raise JobConflict unless the running analysis's result answers the request.
+
+    Options are (chunked, input_mode, force); a forced analysis also answers
+    unforced requests, but not the reverse.
+    """
+    chunked, input_mode, force = running
+    if (chunked, input_mode) == requested[:2] and (force or not requested[2]):
+        return
+    raise JobConflict(
+        f"Case {case_id} is already being analyzed with chunked={str(chunked).lower()}, "
+        f"input_mode={input_mode}, force={str(force).lower()}"
+    )
+
+
+job_manager = JobManager(ANALYSIS_MAX_CONCURRENCY)
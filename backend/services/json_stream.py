@@ -0,0 +1,70 @@
+"""Incremental parsing of a streamed JSON object, one top-level member at a time."""
+
+import json
+
+
+class MemberParser:
+    """Feed text as it arrives; get back each top-level ``(key, value)`` of the
+    object as soon as that member is complete.
+
+    Text before the opening brace (e.g. a markdown fence) is skipped, and
+    nothing after the closing brace is read. Only the member currently being
+    read is buffered. Raises ValueError if a member is not valid JSON.
+
+    Once ``done``, ``result`` holds the whole object built from its members.
+    """
+
+    def __init__(self):
+        self.done = False
+        self.result: dict = {}
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member: list[str] = []
+
+    def feed(self, text: str) -> list[tuple[str, object]]:
+        members = []
+        start = 0  # start of the slice of ``text`` that belongs to the current member
+        for i, ch in enumerate(text):
+            if self.done:
+                break
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    start = i + 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._member.append(text[start:i])
+                    self._emit(members)
+                    self.done = True
+            elif ch == "," and self._depth == 1:
+                self._member.append(text[start:i])
+                self._emit(members)
+                start = i + 1
+        if self._started and not self.done:
+            self._member.append(text[start:])
+        return members
+
+    def _emit(self, members: list):
+        member = "".join(self._member).strip()
+        self._member = []
+        if member:
+            key, value = next(iter(json.loads("{" + member + "}").items()))
+            self.result[key] = value
+            members.append((key, value))
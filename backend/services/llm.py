@@ -0,0 +1,353 @@
+"""Shared Anthropic clients with connection pooling, rate limiting and retries.
+
+Every model call goes through this module so that one process keeps a single
+pooled HTTP client per flavour (sync/async) and all callers draw from the same
+requests-per-minute and input-tokens-per-minute budget.
+"""
+
+import asyncio
+import contextlib
+import random
+import threading
+import time
+from typing import Optional
+
+import anthropic
+
+from backend.config import (
+    ANTHROPIC_API_KEY,
+    ANTHROPIC_BASE_URL,
+    ANTHROPIC_TIMEOUT_SECONDS,
+    ANTHROPIC_MAX_CONNECTIONS,
+    ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS,
+    ANTHROPIC_ASYNC_MAX_CONNECTIONS,
+    ANTHROPIC_REQUESTS_PER_MINUTE,
+    ANTHROPIC_INPUT_TOKENS_PER_MINUTE,
+    ANTHROPIC_MAX_RETRIES,
+    ANTHROPIC_RETRY_BASE_SECONDS,
+    ANTHROPIC_RETRY_MAX_SECONDS,
+)
+
+# Rough bytes-per-token for base64 document/image payloads. Only used to
+# reserve rate-limit budget up front; the reservation is corrected with the
+# real input token count once the response arrives.
+_MEDIA_BYTES_PER_TOKEN = 16
+_CHARS_PER_TOKEN = 4
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class RateLimiter:
+    """Token buckets for requests/min and input tokens/min.
+
+    Callers reserve capacity before sending and sleep for however long the
+    buckets need to refill, so concurrent callers queue up instead of all
+    bursting into 429s. Rate-limit response headers pull the local buckets
+    down to the server's view, and ``retry-after`` pauses everyone.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self.request_rate = requests_per_minute / 60.0
+        self.token_rate = tokens_per_minute / 60.0
+        self.requests = self.request_capacity
+        self.tokens = self.token_capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_rate)
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_rate)
+
+    def reserve(self, tokens: int) -> float:
+        """Take one request and ``tokens`` from the buckets; return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.requests -= 1
+            self.tokens -= min(tokens, self.token_capacity)
+            return max(
+                0.0,
+                -self.requests / self.request_rate,
+                -self.tokens / self.token_rate,
+                self.blocked_until - now,
+            )
+
+    def acquire(self, tokens: int):
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int):
+        wait = self.reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def reconcile(self, estimated: int, actual: int):
+        """Return (or take) the difference between a reservation and real usage."""
+        with self._lock:
+            self.tokens = min(self.token_capacity, self.tokens + estimated - actual)
+
+    def update_from_headers(self, headers):
+        if headers is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            remaining = _int_header(headers, "anthropic-ratelimit-requests-remaining")
+            if remaining is not None:
+                self.requests = min(self.requests, float(remaining))
+            remaining = _int_header(headers, "anthropic-ratelimit-input-tokens-remaining")
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+            retry_after = _retry_after(headers)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+def _int_header(headers, name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(headers) -> Optional[float]:
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+limiter = RateLimiter(ANTHROPIC_REQUESTS_PER_MINUTE, ANTHROPIC_INPUT_TOKENS_PER_MINUTE)
+
+_client: Optional[anthropic.Anthropic] = None
+_async_client: Optional[anthropic.AsyncAnthropic] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_client_lock = threading.Lock()
+
+
+def _limits(max_connections: int):
+    # Built from the SDK's own default so it matches its HTTP client library
+    return type(anthropic.DEFAULT_CONNECTION_LIMITS)(
+        max_connections=max_connections,
+        max_keepalive_connections=ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS,
+    )
+
+
+def get_client() -> anthropic.Anthropic:
+    """Process-wide sync client. Retries are handled here, not by the SDK."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = anthropic.Anthropic(
+                api_key=ANTHROPIC_API_KEY,
+                base_url=ANTHROPIC_BASE_URL,
+                timeout=ANTHROPIC_TIMEOUT_SECONDS,
+                max_retries=0,
+                http_client=anthropic.DefaultHttpxClient(limits=_limits(ANTHROPIC_MAX_CONNECTIONS)),
+            )
+        return _client
+
+
+def get_async_client() -> anthropic.AsyncAnthropic:
+    """Shared async client for the running event loop. Retries are handled here,
+    not by the SDK.
+
+    Async connection pools belong to the loop that created them, so a new
+    client is made if the loop changes (e.g. test clients, worker restarts).
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        if _async_client is None or _async_client_loop is not loop:
+            _async_client = anthropic.AsyncAnthropic(
+                api_key=ANTHROPIC_API_KEY,
+                base_url=ANTHROPIC_BASE_URL,
+                timeout=ANTHROPIC_TIMEOUT_SECONDS,
+                max_retries=0,
+                http_client=anthropic.DefaultAsyncHttpxClient(
+                    limits=_limits(ANTHROPIC_ASYNC_MAX_CONNECTIONS)
+                ),
+            )
+            _async_client_loop = loop
+        return _async_client
+
+
+def reset_clients():
+    """Drop the shared clients (e.g. after changing ANTHROPIC_BASE_URL in tests)."""
+    global _client, _async_client
+    with _client_lock:
+        _client = None
+        _async_client = None
+
+
+def estimate_input_tokens(params: dict) -> int:
+    """Rough input token count for a Messages API request, for rate-limit reservations."""
+    total = 0
+
+    def visit(value):
+        nonlocal total
+        if isinstance(value, dict):
+            source = value.get("source")
+            if isinstance(source, dict) and source.get("type") == "base64":
+                total += len(source.get("data", "")) * 3 // 4 // _MEDIA_BYTES_PER_TOKEN
+                return
+            if value.get("type") == "text" and isinstance(value.get("text"), str):
+                total += len(value["text"]) // _CHARS_PER_TOKEN
+                return
+            for v in value.values():
+                visit(v)
+        elif isinstance(value, list):
+            for v in value:
+                visit(v)
+        elif isinstance(value, str):
+            total += len(value) // _CHARS_PER_TOKEN
+
+    visit(params.get("system"))
+    visit(params.get("messages"))
+    return max(total, 1)
+
+
+def _input_tokens(usage) -> int:
+    """Input tokens that count against the rate limit (cache reads do not)."""
+    if usage is None:
+        return 0
+    return sum(
+        getattr(usage, f, None) or 0 for f in ("input_tokens", "cache_creation_input_tokens")
+    )
+
+
+def stream_usage(stream):
+    """Usage reported so far on a (possibly unfinished) message stream."""
+    try:
+        return stream.current_message_snapshot.usage
+    except AssertionError:  # no message_start received
+        return None
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, anthropic.APIConnectionError):
+        return True
+    if isinstance(e, anthropic.APIStatusError):
+        return e.status_code in RETRYABLE_STATUS or e.status_code >= 500
+    return False
+
+
+def _backoff(attempt: int, e: Exception) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's retry-after."""
+    delay = random.uniform(
+        0, min(ANTHROPIC_RETRY_MAX_SECONDS, ANTHROPIC_RETRY_BASE_SECONDS * 2 ** attempt)
+    )
+    response = getattr(e, "response", None)
+    retry_after = _retry_after(response.headers) if response is not None else None
+    return max(delay, retry_after or 0.0)
+
+
+def _on_error(attempt: int, e: Exception) -> float:
+    """Feed a failed attempt into the limiter; return the backoff delay or re-raise."""
+    if not is_retryable(e) or attempt >= ANTHROPIC_MAX_RETRIES:
+        raise e
+    response = getattr(e, "response", None)
+    if response is not None:
+        limiter.update_from_headers(response.headers)
+    return _backoff(attempt, e)
+
+
+def call_with_retries(fn, *args, **kwargs):
+    """Call a (non-Messages) API method on the shared client's retry policy."""
+    attempt = 0
+    while True:
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            time.sleep(_on_error(attempt, e))
+            attempt += 1
+
+
+def create_message(**params):
+    """``messages.create`` on the shared client, rate limited and retried."""
+    estimate = estimate_input_tokens(params)
+    attempt = 0
+    while True:
+        limiter.acquire(estimate)
+        try:
+            raw = get_client().messages.with_raw_response.create(**params)
+        except Exception as e:
+            time.sleep(_on_error(attempt, e))
+            attempt += 1
+            continue
+        limiter.update_from_headers(raw.headers)
+        message = raw.parse()
+        limiter.reconcile(estimate, _input_tokens(message.usage))
+        return message
+
+
+async def acreate_message(**params):
+    """``messages.create`` on the shared async client, rate limited and retried."""
+    estimate = estimate_input_tokens(params)
+    attempt = 0
+    while True:
+        await limiter.acquire_async(estimate)
+        try:
+            raw = await get_async_client().messages.with_raw_response.create(**params)
+        except Exception as e:
+            await asyncio.sleep(_on_error(attempt, e))
+            attempt += 1
+            continue
+        limiter.update_from_headers(raw.headers)
+        message = await raw.parse()
+        limiter.reconcile(estimate, _input_tokens(message.usage))
+        return message
+
+
+@contextlib.contextmanager
+def stream_message(**params):
+    """``messages.stream`` on the shared client.
+
+    Opening the stream is rate limited and retried; once tokens are flowing
+    errors propagate to the caller.
+    """
+    estimate = estimate_input_tokens(params)
+    attempt = 0
+    with contextlib.ExitStack() as stack:
+        while True:
+            limiter.acquire(estimate)
+            try:
+                stream = stack.enter_context(get_client().messages.stream(**params))
+                break
+            except Exception as e:
+                time.sleep(_on_error(attempt, e))
+                attempt += 1
+        limiter.update_from_headers(stream.response.headers)
+        try:
+            yield stream
+        finally:
+            limiter.reconcile(estimate, _input_tokens(stream_usage(stream)))
+
+
+@contextlib.asynccontextmanager
+async def astream_message(**params):
+    """``messages.stream`` on the shared async client (see ``stream_message``)."""
+    estimate = estimate_input_tokens(params)
+    attempt = 0
+    async with contextlib.AsyncExitStack() as stack:
+        while True:
+            await limiter.acquire_async(estimate)
+            try:
+                stream = await stack.enter_async_context(
+                    get_async_client().messages.stream(**params)
+                )
+                break
+            except Exception as e:
+                await asyncio.sleep(_on_error(attempt, e))
+                attempt += 1
+        limiter.update_from_headers(stream.response.headers)
+        try:
+            yield stream
+        finally:
+            limiter.reconcile(estimate, _input_tokens(stream_usage(stream)))
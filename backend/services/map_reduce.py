@@ -0,0 +1,235 @@
+"""Chunked (map-reduce) analysis of long Settlement Agreements.
+
+The settlement PDF is split into page ranges of ``ANALYSIS_CHUNK_PAGES``,
+overlapping by ``ANALYSIS_CHUNK_OVERLAP_PAGES`` so a clause that straddles a
+boundary is seen whole at least once. Each range is analyzed concurrently
+against the usual schema, with the complete Bid alongside (from the prompt
+cache after the first call), and the partial results are merged into one
+``OUTPUT_SCHEMA`` document:
+
+- scalars take the first real value in page order (placeholders such as
+  "[TBD]" only when no excerpt has more), booleans are true if any excerpt
+  says so and counts take the largest value;
+- lists are concatenated in page order without duplicates (milestones by
+  label and date, checklist items by task, claim tiers by tier, conflicts by
+  category and settlement text);
+- citations follow their field to its merged position, and settlement pages
+  are shifted from excerpt-relative to global page numbers.
+"""
+
+import base64
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+from backend.config import (
+    CLAUDE_MODEL,
+    CLAUDE_MAX_TOKENS,
+    ANALYSIS_CHUNK_PAGES,
+    ANALYSIS_CHUNK_OVERLAP_PAGES,
+    ANALYSIS_CHUNK_CONCURRENCY,
+)
+from backend.prompts import OUTPUT_SCHEMA, build_chunk_system_blocks, build_chunk_user_content
+from backend.services import llm
+from backend.services.portfolio import parse_date
+
+NOT_SPECIFIED = "[Not Specified]"
+
+
+def page_ranges(
+    page_count: int, size: int = ANALYSIS_CHUNK_PAGES, overlap: int = ANALYSIS_CHUNK_OVERLAP_PAGES
+) -> list[tuple[int, int]]:
+    """Zero-based ``(start, stop)`` page ranges covering ``page_count`` pages."""
+    if page_count <= size:
+        return [(0, page_count)]
+    step = max(size - overlap, 1)
+    ranges = []
+    start = 0
+    while True:
+        stop = min(start + size, page_count)
+        ranges.append((start, stop))
+        if stop >= page_count:
+            return ranges
+        start += step
+
+
+def plan_chunks(row) -> Optional[list[tuple[int, int]]]:
+    """Page ranges for a case's settlement, or None if it is one chunk or not a PDF."""
+    if row["settlement_media_type"] != "application/pdf":
+        return None
+    with fitz.open(row["settlement_path"]) as doc:
+        ranges = page_ranges(doc.page_count)
+    return ranges if len(ranges) > 1 else None
+
+
+def _split_pdf(path: str, ranges: list[tuple[int, int]]) -> list[bytes]:
+    parts = []
+    with fitz.open(path) as src:
+        for start, stop in ranges:
+            with fitz.open() as part:
+                part.insert_pdf(src, from_page=start, to_page=stop - 1)
+                parts.append(part.tobytes(garbage=1, deflate=True))
+    return parts
+
+
+def build_chunk_params(row, ranges: list[tuple[int, int]]) -> list[dict]:
+    """Messages API parameters for each page range of a case's settlement."""
+    b2 = None
+    if row["has_bid"] and row["bid_path"]:
+        with open(row["bid_path"], "rb") as f:
+            b2 = base64.standard_b64encode(f.read()).decode("ascii")
+
+    system = build_chunk_system_blocks(b2 is not None)
+    total_pages = ranges[-1][1]
+    return [
+        {
+            "model": CLAUDE_MODEL,
+            "max_tokens": CLAUDE_MAX_TOKENS,
+            "system": system,
+            "messages": [{
+                "role": "user",
+                "content": build_chunk_user_content(
+                    base64.standard_b64encode(part).decode("ascii"),
+                    "application/pdf",
+                    start + 1,
+                    stop,
+                    total_pages,
+                    b2=b2,
+                    media_type2=row["bid_media_type"],
+                ),
+            }],
+        }
+        for (start, stop), part in zip(ranges, _split_pdf(row["settlement_path"], ranges))
+    ]
+
+
+def _timed_call(params: dict) -> tuple:
+    started = time.perf_counter()
+    response = llm.create_message(**params)
+    return response, time.perf_counter() - started
+
+
+def call_chunks(params: list[dict]) -> list[tuple]:
+    """Send every chunk request concurrently; ``(response, seconds)`` in chunk order."""
+    workers = max(1, min(len(params), ANALYSIS_CHUNK_CONCURRENCY))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-chunk") as pool:
+        return list(pool.map(_timed_call, params))
+
+
+def _norm(value) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True)
+    return re.sub(r"\W+", " ", value).strip().lower()
+
+
+def _is_placeholder(value) -> bool:
+    return isinstance(value, str) and value.strip().startswith("[")
+
+
+def _item_key(path: str, item) -> tuple:
+    if not isinstance(item, dict):
+        return (_norm(item),)
+    if path == "timeline.milestones":
+        return (_norm(item.get("label")), parse_date(item.get("date")) or _norm(item.get("date")))
+    if path.startswith("operational_checklist."):
+        return (_norm(item.get("task")),)
+    if path == "claims_logic.claim_tiers":
+        return (_norm(item.get("tier")),)
+    if path == "conflict_audit":
+        return (_norm(item.get("category")), _norm(item.get("settlement_says")))
+    return (_norm(item),)
+
+
+class _Merger:
+    def __init__(self, ranges: list[tuple[int, int]]):
+        self.ranges = ranges
+        self.positions: dict[tuple[str, int, int], int] = {}  # (list path, chunk, index) -> merged index
+        self.sources: dict[str, int] = {}  # scalar path -> chunk its value came from
+
+    def merge(self, schema, values: list[tuple[int, object]], path: str = ""):
+        if isinstance(schema, dict):
+            merged = {}
+            for key, sub_schema in schema.items():
+                sub_path = f"{path}.{key}" if path else key
+                if sub_path == "citations":
+                    continue
+                merged[key] = self.merge(
+                    sub_schema,
+                    [(c, v.get(key)) for c, v in values if isinstance(v, dict)],
+                    sub_path,
+                )
+            return merged
+
+        if isinstance(schema, list):
+            merged, seen = [], {}
+            for chunk, items in values:
+                for i, item in enumerate(items if isinstance(items, list) else []):
+                    if item in (None, "", {}):
+                        continue
+                    key = _item_key(path, item)
+                    if key not in seen:
+                        seen[key] = len(merged)
+                        merged.append(item)
+                    self.positions[(path, chunk, i)] = seen[key]
+            return merged
+
+        present = [(c, v) for c, v in values if v not in (None, "") and not isinstance(v, (dict, list))]
+        if not present:
+            return NOT_SPECIFIED if isinstance(schema, str) and schema != "number" else None
+        if isinstance(schema, bool):
+            chunk, value = next(((c, v) for c, v in present if v is True), present[0])
+        elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for _, v in present):
+            chunk, value = max(present, key=lambda cv: cv[1])
+        else:
+            chunk, value = next(((c, v) for c, v in present if not _is_placeholder(v)), present[0])
+        self.sources[path] = chunk
+        return value
+
+    def _citation_key(self, key: str, chunk: int) -> Optional[str]:
+        match = re.match(r"^([\w.]+)\[(\d+)\](.*)$", key)
+        if match:
+            merged = self.positions.get((match.group(1), chunk, int(match.group(2))))
+            return None if merged is None else f"{match.group(1)}[{merged}]{match.group(3)}"
+        if self.sources.get(key, chunk) != chunk:
+            return None  # the merged value came from another excerpt
+        return key
+
+    def _global_page(self, entry: dict, chunk: int) -> dict:
+        if entry.get("doc") != "settlement":
+            return entry
+        start, stop = self.ranges[chunk]
+        try:
+            page = int(entry.get("page"))
+        except (TypeError, ValueError):
+            return entry
+        if not 1 <= page <= stop - start and start < page <= stop:
+            return entry  # already a global page number
+        return {**entry, "page": start + page}
+
+    def citations(self, chunks: list[dict]) -> dict:
+        merged: dict[str, list] = {}
+        for chunk, analysis in enumerate(chunks):
+            cited = analysis.get("citations")
+            for key, entries in (cited.items() if isinstance(cited, dict) else ()):
+                key = self._citation_key(key, chunk)
+                if key is None or not isinstance(entries, list):
+                    continue
+                bucket = merged.setdefault(key, [])
+                for entry in entries:
+                    if isinstance(entry, dict):
+                        entry = self._global_page(entry, chunk)
+                        if entry not in bucket:
+                            bucket.append(entry)
+        return {k: v for k, v in merged.items() if v}
+
+
+def merge(chunks: list[dict], ranges: list[tuple[int, int]]) -> dict:
+    """Merge per-range analyses (in page order) into one analysis."""
+    merger = _Merger(ranges)
+    analysis = merger.merge(OUTPUT_SCHEMA, list(enumerate(chunks)))
+    analysis["citations"] = merger.citations(chunks)
+    return analysis
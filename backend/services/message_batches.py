@@ -0,0 +1,118 @@
+"""Message Batches backends: the Anthropic API, and a local in-process fake.
+
+Both expose ``create(requests) -> batch id``, ``retrieve(batch_id)`` and
+``results(batch_id)``; results are yielded as plain dicts::
+
+    {"custom_id": str, "type": "succeeded" | "errored" | "canceled" | "expired",
+     "message": Message or None, "error": str or None}
+"""
+
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator
+
+from backend.config import ANALYSIS_MAX_CONCURRENCY, BATCH_BACKEND
+from backend.services import llm
+
+
+class BatchNotFound(LookupError):
+    """The backend has no batch with this id (e.g. a local batch lost on restart)."""
+
+
+class AnthropicBatches:
+    """The Message Batches API on the shared client, with its retry policy."""
+
+    def create(self, requests: list[dict]) -> str:
+        batches = llm.get_client().messages.batches
+        return llm.call_with_retries(batches.create, requests=requests).id
+
+    def retrieve(self, batch_id: str) -> dict:
+        batches = llm.get_client().messages.batches
+        batch = llm.call_with_retries(batches.retrieve, batch_id)
+        return {"status": batch.processing_status, "counts": batch.request_counts.model_dump()}
+
+    def results(self, batch_id: str) -> Iterator[dict]:
+        batches = llm.get_client().messages.batches
+        for response in llm.call_with_retries(batches.results, batch_id):
+            result = response.result
+            error = None
+            if result.type == "errored":
+                error = getattr(getattr(result.error, "error", None), "message", None)
+            yield {
+                "custom_id": response.custom_id,
+                "type": result.type,
+                "message": getattr(result, "message", None),
+                "error": error or (None if result.type == "succeeded" else result.type),
+            }
+
+
+class LocalBatches:
+    """In-process stand-in for the Message Batches API (``BATCH_BACKEND=local``).
+
+    Each request is sent as an ordinary ``messages.create`` through the
+    shared, rate-limited client on a small thread pool. Tests and development
+    can run the batch pipeline against a stub server (ANTHROPIC_BASE_URL).
+    Batches live in memory and are lost on restart.
+    """
+
+    def __init__(self, workers: int = ANALYSIS_MAX_CONCURRENCY):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="local-batch")
+        self._lock = threading.Lock()
+        self._batches: dict[str, list[tuple[str, Future]]] = {}
+
+    def create(self, requests: list[dict]) -> str:
+        batch_id = f"local_{uuid.uuid4().hex}"
+        futures = [
+            (r["custom_id"], self._executor.submit(llm.create_message, **r["params"]))
+            for r in requests
+        ]
+        with self._lock:
+            self._batches[batch_id] = futures
+        return batch_id
+
+    def _get(self, batch_id: str) -> list[tuple[str, Future]]:
+        with self._lock:
+            if batch_id not in self._batches:
+                raise BatchNotFound(batch_id)
+            return self._batches[batch_id]
+
+    def retrieve(self, batch_id: str) -> dict:
+        futures = self._get(batch_id)
+        done = [f for _, f in futures if f.done()]
+        errored = sum(1 for f in done if f.exception() is not None)
+        return {
+            "status": "ended" if len(done) == len(futures) else "in_progress",
+            "counts": {
+                "processing": len(futures) - len(done),
+                "succeeded": len(done) - errored,
+                "errored": errored,
+                "canceled": 0,
+                "expired": 0,
+            },
+        }
+
+    def results(self, batch_id: str) -> Iterator[dict]:
+        futures = self._get(batch_id)
+        for custom_id, future in futures:
+            error = future.exception()
+            yield {
+                "custom_id": custom_id,
+                "type": "errored" if error else "succeeded",
+                "message": None if error else future.result(),
+                "error": str(error) if error else None,
+            }
+        with self._lock:
+            self._batches.pop(batch_id, None)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = LocalBatches() if BATCH_BACKEND == "local" else AnthropicBatches()
+        return _backend
@@ -0,0 +1,266 @@
+"""In-process metrics in the Prometheus text format, and request timing.
+
+Counters, gauges and histograms live in this module and are rendered by
+``GET /api/metrics``. Code times a step with ``stage(pipeline, name)``:
+the duration goes to ``settlement_ops_stage_duration_seconds`` and, when the step
+runs on behalf of an HTTP request (including in the thread pool and in an
+analysis job the request started), to that request's timings. Those are
+sent as a ``Server-Timing`` header when ``METRICS_TIMING_HEADER`` is set,
+and logged for requests slower than ``METRICS_SLOW_REQUEST_SECONDS``.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from backend.config import METRICS_TIMING_HEADER, METRICS_SLOW_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "settlement_ops_"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = _PREFIX + name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: dict[tuple, object] = {}
+        REGISTRY.append(self)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key: tuple, value) -> list[str]:
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, amount: float = 1, *labels):
+        self.inc(-amount, *labels)
+
+    @contextmanager
+    def track(self, *labels):
+        """Count the block as in progress while it runs."""
+        self.inc(1, *labels)
+        try:
+            yield
+        finally:
+            self.dec(1, *labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = ()):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, key: tuple, value) -> list[str]:
+        counts, total, count = value
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            le = 'le="%s"' % _number(bound)
+            lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+        inf = 'le="+Inf"'
+        lines.append(f"{self.name}_bucket{_labels(self.labels, key, inf)} {count}")
+        lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+        lines.append(f"{self.name}_count{_labels(self.labels, key)} {count}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+_DB_SECONDS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route", "status"), _SECONDS,
+)
+HTTP_RESPONSE_BYTES = Counter(
+    "http_response_bytes_total", "Response body bytes sent, by route template and Content-Encoding.",
+    ("route", "encoding"),
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served.")
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds", "Duration of upload, extraction and analysis stages.",
+    ("pipeline", "stage"), _SECONDS,
+)
+MODEL_CALLS = Counter("model_calls_total", "Model calls with recorded usage.", ("kind",))
+MODEL_TOKENS = Counter(
+    "model_tokens_total", "Model tokens by call kind and token type.", ("kind", "type"),
+)
+ANALYSES_IN_FLIGHT = Gauge("analyses_in_flight", "Analysis jobs running.")
+CHATS_IN_FLIGHT = Gauge("chat_streams_in_flight", "Chat replies being streamed.")
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "SQLite statement execution time by statement type.",
+    ("statement",), _DB_SECONDS,
+)
+DB_TRANSACTION_SECONDS = Histogram(
+    "db_transaction_duration_seconds",
+    "Write transactions: waiting for the writer lock, and holding it.",
+    ("phase",), _DB_SECONDS,
+)
+DB_POOL = Gauge("db_pool_connections", "Pooled SQLite connections by state.", ("state",))
+
+
+# Timings of the HTTP request being served: "<pipeline>-<stage>" -> [seconds, count]
+_request_timings: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def _add_timing(key: str, seconds: float):
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.setdefault(key, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def stage(pipeline: str, name: str):
+    """Time a step of a pipeline (e.g. ``stage("analysis", "model_call")``)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, pipeline, name)
+        _add_timing(f"{pipeline}-{name}", elapsed)
+
+
+_STATEMENTS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "WITH", "PRAGMA"}
+
+
+def observe_query(sql: str, seconds: float):
+    words = sql.lstrip()[:10].split(None, 1)
+    statement = words[0].upper() if words else ""
+    DB_QUERY_SECONDS.observe(seconds, statement if statement in _STATEMENTS else "OTHER")
+    _add_timing("db", seconds)
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _server_timing(timings: dict, total: float) -> str:
+    parts = [f"{key};dur={seconds * 1000:.1f};desc=\"{count}x\"" for key, (seconds, count) in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-route latency, in-flight requests and request timings."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: dict = {}
+        token = _request_timings.set(timings)
+        status = 500
+        encoding = "identity"
+        sent = 0
+
+        async def send_with_timing(message):
+            nonlocal status, encoding, sent
+            if message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            elif message["type"] == "http.response.start":
+                status = message["status"]
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-encoding":
+                        encoding = value.decode("latin-1")
+                if METRICS_TIMING_HEADER:
+                    header = _server_timing(timings, time.perf_counter() - started)
+                    message = {
+                        **message,
+                        "headers": [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))],
+                    }
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            _request_timings.reset(token)
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(elapsed, scope["method"], route, str(status))
+            HTTP_RESPONSE_BYTES.inc(sent, route, encoding)
+            if METRICS_SLOW_REQUEST_SECONDS and elapsed >= METRICS_SLOW_REQUEST_SECONDS:
+                logger.warning(
+                    "Slow request %s %s (%s): %.2fs; %s",
+                    scope["method"], scope["path"], status, elapsed,
+                    _server_timing(timings, elapsed),
+                )
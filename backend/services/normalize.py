@@ -0,0 +1,382 @@
+"""Ingest-time normalization of uploaded documents for the model.
+
+The format of each upload is read from its magic bytes, not its name. PDFs
+are used as they are. Images the Messages API accepts (JPEG, PNG, GIF, WebP)
+are kept when they are within ``IMAGE_MAX_EDGE`` pixels and the API's size
+limit; anything else (TIFF, BMP, HEIC, oversized phone photos) is rendered
+to a JPEG of at most ``IMAGE_MAX_EDGE`` pixels on its longest edge, or to a
+PDF of such pages for multi-page TIFFs.
+
+A document uploaded as several files (e.g. one photo per page) is bundled
+into one PDF. The bundle of the original files is what the case stores and
+``serve_pdf`` returns; the model is sent a copy made from the downscaled
+pages. Converted copies are stored as ``<doc>_model_path`` on the case, and
+what was done to each file, with its byte savings, in ``document_files``.
+
+Uploads are opened from the upload store by path, never read whole: the
+format comes from the first KB, the pixel size of images the model accepts
+from their headers, and only images that need converting are decoded.
+
+HEIC/HEIF photos need the optional ``pillow-heif`` package; without it they
+are rejected with a message asking for a JPEG export.
+"""
+
+import io
+import os
+import sqlite3
+import time
+from typing import Optional
+
+import fitz  # PyMuPDF
+
+from backend.config import IMAGE_MAX_EDGE, IMAGE_JPEG_QUALITY, IMAGE_UPLINK_MBPS
+from backend.services import storage
+
+try:
+    import pillow_heif
+except ImportError:
+    pillow_heif = None
+
+# Image types the Messages API accepts, and its per-image size limit
+MODEL_IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+MODEL_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+
+_HEIF_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+
+# MuPDF filetype for each image type it can decode
+_FILETYPES = {
+    "image/jpeg": "jpeg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/tiff": "tiff",
+    "image/bmp": "bmp",
+}
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Media type from a file's first bytes, or None if it is not a known format."""
+    if b"%PDF-" in head[:1024]:
+        return "application/pdf"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    if head[:2] == b"BM":
+        return "image/bmp"
+    if head[4:8] == b"ftyp" and head[8:12] in _HEIF_BRANDS:
+        return "image/heic"
+    return None
+
+
+def _read(path: str, size: int = -1) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(size)
+
+
+# JPEG start-of-frame markers, which carry the image size
+_JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_size(path: str) -> Optional[tuple[int, int]]:
+    # Skip from segment to segment (EXIF thumbnails included) to the frame header
+    with open(path, "rb") as f:
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF or marker[1] == 0xDA:
+                return None
+            if marker[1] in _JPEG_SOF:
+                frame = f.read(7)
+                if len(frame) < 7:
+                    return None
+                return int.from_bytes(frame[5:7], "big"), int.from_bytes(frame[3:5], "big")
+            f.seek(int.from_bytes(f.read(2), "big") - 2, os.SEEK_CUR)
+
+
+def _image_size(path: str, media_type: str, head: bytes) -> Optional[tuple[int, int]]:
+    """Pixel size of a JPEG, PNG, GIF or WebP from its header, or None if
+    it is not one or the header cannot be read."""
+    size = None
+    if media_type == "image/jpeg":
+        size = _jpeg_size(path)
+    elif media_type == "image/png":
+        size = int.from_bytes(head[16:20], "big"), int.from_bytes(head[20:24], "big")
+    elif media_type == "image/gif":
+        size = int.from_bytes(head[6:8], "little"), int.from_bytes(head[8:10], "little")
+    elif media_type == "image/webp":
+        chunk = head[12:16]
+        if chunk == b"VP8 ":
+            size = int.from_bytes(head[26:28], "little") & 0x3FFF, int.from_bytes(head[28:30], "little") & 0x3FFF
+        elif chunk == b"VP8L":
+            bits = int.from_bytes(head[21:25], "little")
+            size = (bits & 0x3FFF) + 1, (bits >> 14 & 0x3FFF) + 1
+        elif chunk == b"VP8X":
+            size = int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return size if size and min(size) > 0 else None
+
+
+def _open_image(path: str, media_type: str, filename: str) -> fitz.Document:
+    if media_type == "image/heic":
+        if pillow_heif is None:
+            raise ValueError(
+                f"{filename} is a HEIC/HEIF photo, which this server cannot read; "
+                "export it as JPEG and upload again"
+            )
+        buf = io.BytesIO()
+        pillow_heif.open_heif(path).to_pillow().convert("RGB").save(buf, "JPEG", quality=95)
+        try:
+            return fitz.open(stream=buf.getvalue(), filetype="jpeg")
+        except RuntimeError as e:
+            raise ValueError(f"{filename} could not be read as {media_type}: {e}") from e
+    try:
+        return fitz.open(path, filetype=_FILETYPES[media_type])
+    except RuntimeError as e:
+        raise ValueError(f"{filename} could not be read as {media_type}: {e}") from e
+
+
+def _page_count(path: str) -> Optional[int]:
+    # A damaged PDF is still accepted; text extraction reports it
+    try:
+        with fitz.open(path, filetype="pdf") as doc:
+            return doc.page_count
+    except RuntimeError:
+        return None
+
+
+def _pixel_size(page: fitz.Page) -> tuple[int, int]:
+    # An image page is sized by the image's DPI, not its pixels
+    images = page.get_image_info()
+    if images:
+        return images[0]["width"], images[0]["height"]
+    return round(page.rect.width), round(page.rect.height)
+
+
+def _fits_model(media_type: str, size: int, pixels: Optional[tuple[int, int]]) -> bool:
+    """Whether an image of ``size`` bytes and ``pixels`` can go to the model as it is."""
+    return (
+        media_type in MODEL_IMAGE_TYPES
+        and pixels is not None
+        and max(pixels) <= IMAGE_MAX_EDGE
+        and size <= MODEL_IMAGE_MAX_BYTES
+    )
+
+
+def _frames(doc: fitz.Document) -> list[dict]:
+    """Each page of an image document as a downscaled JPEG (``image``), with its sizes."""
+    frames = []
+    for page in doc:
+        width, height = _pixel_size(page)
+        scale = width / page.rect.width * min(1.0, IMAGE_MAX_EDGE / max(width, height))
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        frames.append({
+            "image": pixmap.tobytes("jpeg", jpg_quality=IMAGE_JPEG_QUALITY),
+            "rect": page.rect,
+            "original": (width, height),
+            "size": (pixmap.width, pixmap.height),
+        })
+    return frames
+
+
+def _frames_pdf(frames: list[dict], out: Optional[fitz.Document] = None) -> fitz.Document:
+    out = out if out is not None else fitz.open()
+    for frame in frames:
+        page = out.new_page(width=frame["rect"].width, height=frame["rect"].height)
+        page.insert_image(page.rect, stream=frame["image"])
+    return out
+
+
+def _report(filename: str, media_type: str, action: str, original_bytes: int,
+            normalized_bytes: int, frames: list[dict], pages: int, started: float) -> dict:
+    largest = max(frames, key=lambda f: f["original"][0] * f["original"][1]) if frames else None
+    return {
+        "filename": filename,
+        "detected_type": media_type,
+        "action": action,
+        "pages": pages,
+        "original_bytes": original_bytes,
+        "normalized_bytes": normalized_bytes,
+        "original_width": largest["original"][0] if largest else None,
+        "original_height": largest["original"][1] if largest else None,
+        "width": largest["size"][0] if largest else None,
+        "height": largest["size"][1] if largest else None,
+        "seconds": round(time.perf_counter() - started, 4),
+    }
+
+
+def _store(conn: sqlite3.Connection, data: bytes, name: str, stored: list) -> tuple[str, str]:
+    digest, path = storage.store_file(conn, io.BytesIO(data), name, len(data))
+    stored.append(digest)
+    return digest, path
+
+
+def _single(conn: sqlite3.Connection, filename: str, path: str, digest: str,
+            declared_type: str, stored: list) -> dict:
+    started = time.perf_counter()
+    size = os.path.getsize(path)
+    head = _read(path, 1024)
+    media_type = sniff(head) or declared_type
+    result = {
+        "filename": filename, "path": path, "media_type": media_type, "sha256": digest,
+        "model_path": None, "model_media_type": None, "model_sha256": None,
+    }
+    if media_type == "application/pdf":
+        pages = _page_count(path)
+        result["files"] = [_report(filename, media_type, "kept", size, size, [], pages, started)]
+        return result
+    if media_type not in _FILETYPES and media_type != "image/heic":
+        raise ValueError(f"{filename} is not a PDF or a supported image")
+
+    pixels = _image_size(path, media_type, head)
+    if _fits_model(media_type, size, pixels):
+        kept = [{"original": pixels, "size": pixels}]
+        result["files"] = [_report(filename, media_type, "kept", size, size, kept, 1, started)]
+        return result
+    with _open_image(path, media_type, filename) as doc:
+        frames = _frames(doc)
+
+    if len(frames) == 1:
+        model_data, model_type = frames[0]["image"], "image/jpeg"
+    else:
+        with _frames_pdf(frames) as out:
+            model_data, model_type = out.tobytes(garbage=1, deflate=True), "application/pdf"
+    model_sha256, model_path = _store(conn, model_data, filename, stored)
+    result.update(model_path=model_path, model_media_type=model_type, model_sha256=model_sha256)
+    action = "downscaled" if media_type in MODEL_IMAGE_TYPES else "converted"
+    result["files"] = [
+        _report(filename, media_type, action, size, len(model_data), frames, len(frames), started)
+    ]
+    return result
+
+
+def _bundle(conn: sqlite3.Connection, files: list[tuple], stored: list) -> dict:
+    original, model = fitz.open(), fitz.open()
+    reports = []
+    try:
+        for filename, path, _, declared_type in files:
+            started = time.perf_counter()
+            size = os.path.getsize(path)
+            head = _read(path, 1024)
+            media_type = sniff(head) or declared_type
+            if media_type == "application/pdf":
+                try:
+                    with fitz.open(path, filetype="pdf") as doc:
+                        original.insert_pdf(doc)
+                        model.insert_pdf(doc)
+                        pages = doc.page_count
+                except RuntimeError as e:
+                    raise ValueError(f"{filename} could not be read as a PDF: {e}") from e
+                reports.append(_report(filename, media_type, "bundled", size, size, [], pages, started))
+                continue
+            if media_type not in _FILETYPES and media_type != "image/heic":
+                raise ValueError(f"{filename} is not a PDF or a supported image")
+            pixels = _image_size(path, media_type, head)
+            with _open_image(path, media_type, filename) as doc:
+                if _fits_model(media_type, size, pixels):
+                    # Goes into the model's copy as it is
+                    frames = [{"image": _read(path), "rect": doc[0].rect, "original": pixels, "size": pixels}]
+                else:
+                    frames = _frames(doc)
+                with fitz.open(stream=doc.convert_to_pdf(), filetype="pdf") as pdf:
+                    original.insert_pdf(pdf)
+            _frames_pdf(frames, model)
+            reports.append(_report(
+                filename, media_type, "bundled", size,
+                sum(len(f["image"]) for f in frames), frames, len(frames), started,
+            ))
+        name = files[0][0].rsplit(".", 1)[0] + ".pdf"
+        sha256, path = _store(conn, original.tobytes(garbage=1, deflate=True), name, stored)
+        model_data = model.tobytes(garbage=1, deflate=True)
+        model_sha256, model_path = _store(conn, model_data, name, stored)
+    finally:
+        original.close()
+        model.close()
+    return {
+        "filename": name, "path": path, "media_type": "application/pdf", "sha256": sha256,
+        "model_path": model_path, "model_media_type": "application/pdf",
+        "model_sha256": model_sha256, "files": reports,
+    }
+
+
+def prepare(conn: sqlite3.Connection, files: list[tuple[str, str, str, str]]) -> dict:
+    """Normalize one document uploaded as ``files`` of ``(filename, path,
+    sha256, declared media type)``, already in the upload store.
+
+    Returns the case columns for the document (``filename``, ``path``,
+    ``media_type``, ``sha256`` and their ``model_`` counterparts, None when
+    the original goes to the model) plus a per-file report under ``files``.
+    A bundle takes over the references to its parts: they are released once
+    it is stored. Raises ValueError for a file that is neither a PDF nor a
+    readable image; the caller still owns the uploads then.
+    """
+    stored = []
+    try:
+        if len(files) == 1:
+            filename, path, digest, declared_type = files[0]
+            return _single(conn, filename, path, digest, declared_type, stored)
+        result = _bundle(conn, files, stored)
+    except Exception:
+        for digest in stored:
+            storage.release(conn, digest)
+        raise
+    for _, _, digest, _ in files:
+        storage.release(conn, digest)
+    return result
+
+
+_DOCUMENT_FIELDS = (
+    "filename", "path", "media_type", "sha256", "model_path", "model_media_type", "model_sha256",
+)
+
+
+def case_values(settlement: dict, bid: Optional[dict]) -> tuple:
+    """Values for the ``settlement_*`` then ``bid_*`` file columns of a new case."""
+    return tuple((doc or {}).get(k) for doc in (settlement, bid) for k in _DOCUMENT_FIELDS)
+
+
+def save_report(conn: sqlite3.Connection, case_id: int, doc: str, files: list[dict]):
+    """Store the per-file report of a document, inside the caller's transaction."""
+    conn.executemany(
+        """INSERT OR REPLACE INTO document_files
+            (case_id, doc, position, filename, detected_type, action, pages,
+             original_bytes, normalized_bytes, original_width, original_height,
+             width, height, seconds)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        [
+            (case_id, doc, position, f["filename"], f["detected_type"], f["action"], f["pages"],
+             f["original_bytes"], f["normalized_bytes"], f["original_width"],
+             f["original_height"], f["width"], f["height"], f["seconds"])
+            for position, f in enumerate(files)
+        ],
+    )
+
+
+def remove_case(conn: sqlite3.Connection, case_id: int):
+    conn.execute("DELETE FROM document_files WHERE case_id = ?", (case_id,))
+
+
+def with_savings(f: dict) -> dict:
+    """A report row with its byte savings and the transfer time they save."""
+    saved = f["original_bytes"] - f["normalized_bytes"]
+    return {
+        **f,
+        "bytes_saved": saved,
+        "transfer_seconds_saved": round(saved * 8 / (IMAGE_UPLINK_MBPS * 1_000_000), 3),
+    }
+
+
+def report(conn: sqlite3.Connection, case_id: int) -> list[dict]:
+    rows = conn.execute(
+        """SELECT doc, position, filename, detected_type, action, pages,
+                  original_bytes, normalized_bytes, original_width, original_height,
+                  width, height, seconds
+           FROM document_files WHERE case_id = ? ORDER BY doc DESC, position""",
+        (case_id,),
+    ).fetchall()
+    return [with_savings(dict(r)) for r in rows]
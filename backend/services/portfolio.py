@@ -0,0 +1,301 @@
+"""Relational projection of analysis sections for cross-case (portfolio) queries.
+
+Milestones (including the named timeline dates), checklist items, conflicts
+and fund logistics are copied out of the analysis JSON into indexed tables
+whenever an analysis is saved, so portfolio questions never parse
+``analysis_json``.
+"""
+
+import json
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+# Named dates in the analysis timeline, projected as milestones of that kind
+TIMELINE_DATES = (
+    "preliminary_approval",
+    "notice_deadline",
+    "exclusion_objection_deadline",
+    "claims_deadline",
+    "final_approval_hearing",
+    "distribution_date",
+)
+CHECKLIST_PHASES = (
+    "data_intake",
+    "notice_phase",
+    "claims_processing",
+    "support",
+    "payment",
+    "reporting",
+)
+
+_DATE_FORMATS = ("%Y-%m-%d", "%B %d, %Y", "%B %d %Y", "%b %d, %Y", "%b %d %Y", "%m/%d/%Y")
+_DATE_PATTERNS = (
+    r"\d{4}-\d{2}-\d{2}",
+    r"[A-Z][a-z]{2,8}\.? \d{1,2},? \d{4}",
+    r"\d{1,2}/\d{1,2}/\d{4}",
+)
+_MULTIPLIERS = {"thousand": 1e3, "k": 1e3, "million": 1e6, "m": 1e6, "billion": 1e9, "b": 1e9}
+
+
+def parse_date(text) -> Optional[str]:
+    """First calendar date in free text as ISO ``YYYY-MM-DD``, else None ("[TBD]", "T+30")."""
+    if not isinstance(text, str):
+        return None
+    for pattern in _DATE_PATTERNS:
+        for candidate in re.findall(pattern, text):
+            candidate = candidate.replace(".", "").replace("Sept ", "Sep ")
+            for fmt in _DATE_FORMATS:
+                try:
+                    return datetime.strptime(candidate, fmt).date().isoformat()
+                except ValueError:
+                    continue
+    return None
+
+
+def parse_amount(text) -> Optional[float]:
+    """First dollar amount in free text ("$2.5 million", "$1,250,000"), else None."""
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        return float(text)
+    if not isinstance(text, str):
+        return None
+    match = re.search(
+        r"\$\s*([\d,]+(?:\.\d+)?)\s*(thousand|million|billion|[kmb]\b)?", text, re.IGNORECASE
+    )
+    if not match:
+        return None
+    try:
+        value = float(match.group(1).replace(",", ""))
+    except ValueError:
+        return None
+    return value * _MULTIPLIERS.get((match.group(2) or "").lower(), 1)
+
+
+def _text(value) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _dicts(value) -> list[dict]:
+    return [v for v in value if isinstance(v, dict)] if isinstance(value, list) else []
+
+
+def remove_case(conn: sqlite3.Connection, case_id: int):
+    """Drop a case's projected rows, inside the caller's transaction."""
+    for table in ("milestones", "checklist_items", "conflicts", "fund_logistics"):
+        conn.execute(f"DELETE FROM {table} WHERE case_id = ?", (case_id,))
+
+
+def sync_analysis(conn: sqlite3.Connection, case_id: int, analysis: dict):
+    """Replace a case's projected rows from its analysis, inside the caller's transaction."""
+    remove_case(conn, case_id)
+
+    timeline = analysis.get("timeline") if isinstance(analysis.get("timeline"), dict) else {}
+    milestones = [
+        (case_id, key, i, key.replace("_", " ").capitalize(), _text(timeline[key]),
+         parse_date(timeline[key]), None, None, None, None)
+        for i, key in enumerate(TIMELINE_DATES)
+        if _text(timeline.get(key))
+    ]
+    milestones += [
+        (case_id, "milestone", i, _text(m.get("label")), _text(m.get("date")),
+         parse_date(m.get("date")), _text(m.get("t_minus")), _text(m.get("status")),
+         _text(m.get("owner")), _text(m.get("notes")))
+        for i, m in enumerate(_dicts(timeline.get("milestones")))
+    ]
+    conn.executemany(
+        """INSERT INTO milestones
+            (case_id, kind, position, label, date_text, due_date, t_minus, status, owner, notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        milestones,
+    )
+
+    checklist = analysis.get("operational_checklist")
+    checklist = checklist if isinstance(checklist, dict) else {}
+    conn.executemany(
+        """INSERT INTO checklist_items (case_id, phase, position, task, details, deadline_ref)
+        VALUES (?, ?, ?, ?, ?, ?)""",
+        [
+            (case_id, phase, i, _text(item.get("task")), _text(item.get("details")),
+             _text(item.get("deadline_ref")))
+            for phase in CHECKLIST_PHASES
+            for i, item in enumerate(_dicts(checklist.get(phase)))
+        ],
+    )
+
+    conn.executemany(
+        """INSERT INTO conflicts
+            (case_id, position, category, settlement_says, bid_says, severity, recommendation)
+        VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        [
+            (case_id, i, _text(c.get("category")), _text(c.get("settlement_says")),
+             _text(c.get("bid_says")), _text(c.get("severity")), _text(c.get("recommendation")))
+            for i, c in enumerate(_dicts(analysis.get("conflict_audit")))
+        ],
+    )
+
+    fund = analysis.get("fund_logistics")
+    if isinstance(fund, dict):
+        qsf = fund.get("qsf_required")
+        conn.execute(
+            """INSERT INTO fund_logistics
+                (case_id, gross_settlement, gross_settlement_amount, admin_cap, attorney_fees,
+                 service_awards, net_fund, net_fund_amount, qsf_required, tax_id_setup,
+                 payment_methods)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                case_id,
+                _text(fund.get("gross_settlement")),
+                parse_amount(fund.get("gross_settlement")),
+                _text(fund.get("admin_cap")),
+                _text(fund.get("attorney_fees")),
+                _text(fund.get("service_awards")),
+                _text(fund.get("net_fund")),
+                parse_amount(fund.get("net_fund")),
+                int(qsf) if isinstance(qsf, bool) else None,
+                _text(fund.get("tax_id_setup")),
+                json.dumps(fund.get("payment_methods") or []),
+            ),
+        )
+
+
+def backfill(conn: sqlite3.Connection):
+    """Project every stored analysis (used by the migration that adds the tables)."""
+    from backend.services.case_data import decompress
+
+    for case_id, body in conn.execute("SELECT case_id, body FROM case_analysis").fetchall():
+        analysis = json.loads(decompress(body))
+        if isinstance(analysis, dict):
+            sync_analysis(conn, case_id, analysis)
+
+
+# "Open" cases have not reached a distribution date in the past
+_OPEN_CASE = """NOT EXISTS (
+    SELECT 1 FROM milestones d
+    WHERE d.case_id = c.id AND d.kind = 'distribution_date' AND d.due_date < :today
+)"""
+
+
+def deadlines(
+    conn: sqlite3.Connection,
+    within_days: int = 30,
+    kind: Optional[str] = None,
+    status: Optional[str] = None,
+    owner: Optional[str] = None,
+    include_overdue: bool = False,
+    limit: int = 200,
+) -> list[dict]:
+    """Dated milestones due within ``within_days`` of today, soonest first."""
+    today = date.today()
+    where = ["m.due_date <= :until"]
+    where.append("m.due_date IS NOT NULL" if include_overdue else "m.due_date >= :today")
+    if kind:
+        where.append("m.kind = :kind")
+    if status:
+        where.append("m.status = :status")
+    if owner:
+        where.append("m.owner = :owner COLLATE NOCASE")
+    rows = conn.execute(
+        f"""SELECT m.case_id, c.case_name, c.case_number, m.kind, m.label, m.date_text,
+                   m.due_date, m.t_minus, m.status, m.owner, m.notes
+            FROM milestones m JOIN cases c ON c.id = m.case_id
+            WHERE {" AND ".join(where)}
+            ORDER BY m.due_date, m.case_id, m.position
+            LIMIT :limit""",
+        {
+            "today": today.isoformat(),
+            "until": (today + timedelta(days=within_days)).isoformat(),
+            "kind": kind,
+            "status": status,
+            "owner": owner,
+            "limit": limit,
+        },
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def conflicts(
+    conn: sqlite3.Connection,
+    severity: Optional[str] = None,
+    open_only: bool = False,
+    limit: int = 200,
+) -> list[dict]:
+    """Conflict-audit findings across cases, newest cases first."""
+    where = []
+    if severity:
+        where.append("f.severity = :severity")
+    if open_only:
+        where.append(_OPEN_CASE)
+    rows = conn.execute(
+        f"""SELECT f.case_id, c.case_name, c.case_number, f.category, f.settlement_says,
+                   f.bid_says, f.severity, f.recommendation
+            FROM conflicts f JOIN cases c ON c.id = f.case_id
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY f.case_id DESC, f.position
+            LIMIT :limit""",
+        {"severity": severity, "today": date.today().isoformat(), "limit": limit},
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def checklist(
+    conn: sqlite3.Connection,
+    phase: Optional[str] = None,
+    case_id: Optional[int] = None,
+    limit: int = 500,
+) -> list[dict]:
+    """Operational checklist items across cases, newest cases first."""
+    where = []
+    if phase:
+        where.append("i.phase = :phase")
+    if case_id is not None:
+        where.append("i.case_id = :case_id")
+    rows = conn.execute(
+        f"""SELECT i.case_id, c.case_name, c.case_number, i.phase, i.task, i.details,
+                   i.deadline_ref
+            FROM checklist_items i JOIN cases c ON c.id = i.case_id
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY i.case_id DESC, i.phase, i.position
+            LIMIT :limit""",
+        {"phase": phase, "case_id": case_id, "limit": limit},
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def funds(
+    conn: sqlite3.Connection,
+    qsf_required: Optional[bool] = None,
+    min_gross: Optional[float] = None,
+    limit: int = 200,
+) -> list[dict]:
+    """Fund logistics per case, largest gross settlement first."""
+    where = []
+    if qsf_required is not None:
+        where.append("f.qsf_required = :qsf_required")
+    if min_gross is not None:
+        where.append("f.gross_settlement_amount >= :min_gross")
+    rows = conn.execute(
+        f"""SELECT f.case_id, c.case_name, c.case_number, f.gross_settlement,
+                   f.gross_settlement_amount, f.admin_cap, f.attorney_fees, f.service_awards,
+                   f.net_fund, f.net_fund_amount, f.qsf_required, f.tax_id_setup,
+                   f.payment_methods
+            FROM fund_logistics f JOIN cases c ON c.id = f.case_id
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY f.gross_settlement_amount DESC NULLS LAST, f.case_id DESC
+            LIMIT :limit""",
+        {
+            "qsf_required": int(qsf_required) if qsf_required is not None else None,
+            "min_gross": min_gross,
+            "limit": limit,
+        },
+    ).fetchall()
+    return [
+        {
+            **dict(r),
+            "qsf_required": None if r["qsf_required"] is None else bool(r["qsf_required"]),
+            "payment_methods": json.loads(r["payment_methods"] or "[]"),
+        }
+        for r in rows
+    ]
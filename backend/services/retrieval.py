@@ -0,0 +1,198 @@
+"""Lexical (BM25) passage retrieval for grounding case chat in the documents."""
+
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from backend.config import (
+    CHAT_CONTEXT_BUDGET_CHARS,
+    CHAT_TOP_K,
+    CHAT_PASSAGE_CHARS,
+    CHAT_INDEX_CACHE_SIZE,
+)
+from backend.services import case_data
+from backend.services.search import flatten, HEADER_FIELDS
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its of on or "
+    "the this that to was what when where which who will with would there their they "
+    "we you me my our any all about".split()
+)
+
+# Sections sent on every chat turn (as part of the cached system prompt);
+# small and relevant to most questions.
+CORE_SECTIONS = HEADER_FIELDS + ("summary",)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+
+
+def chunk_pages(pages: list[dict], size: int = CHAT_PASSAGE_CHARS) -> list[dict]:
+    """Split page texts into passages of about ``size`` chars on line boundaries.
+
+    Passages never span pages, so each keeps the page number it came from.
+    """
+    passages = []
+    for page in pages:
+        current = ""
+        for line in page["text"].splitlines(keepends=True):
+            if current and len(current) + len(line) > size:
+                passages.append({**page, "text": current.strip()})
+                current = ""
+            current += line
+        if current.strip():
+            passages.append({**page, "text": current.strip()})
+    return [p for p in passages if p["text"]]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of passages."""
+
+    def __init__(self, passages: list[dict], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(p["text"])) for p in passages]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freq = Counter(term for tf in self.term_freqs for term in tf)
+        n = len(passages)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()
+        }
+
+    def top_k(self, query: str, k: int) -> list[tuple[float, dict]]:
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        if not terms:
+            return []
+        scored = []
+        for i, tf in enumerate(self.term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / (self.avg_length or 1))
+            score = sum(
+                self.idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm) for t in terms if t in tf
+            )
+            if score > 0:
+                scored.append((score, self.passages[i]))
+        scored.sort(key=lambda s: s[0], reverse=True)
+        return scored[:k]
+
+
+# Per-case indexes, rebuilt when the case's pages change
+_cache: "OrderedDict[int, tuple[tuple, BM25Index]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _load_pages(conn: sqlite3.Connection, case_id: int) -> list[dict]:
+    rows = conn.execute(
+        "SELECT doc, page_no, text FROM document_pages WHERE case_id = ? ORDER BY doc DESC, page_no",
+        (case_id,),
+    ).fetchall()
+    if rows:
+        return [dict(r) for r in rows]
+
+    # Cases extracted before per-page storage only have whole-document text
+    pages = []
+    for doc in ("settlement", "bid"):
+        text = case_data.load_text(conn, case_id, doc)
+        if text:
+            pages.append({"doc": doc, "page_no": None, "text": text})
+    return pages
+
+
+def get_index(conn: sqlite3.Connection, case_id: int) -> BM25Index:
+    version = tuple(
+        conn.execute(
+            "SELECT COUNT(*), MAX(id) FROM document_pages WHERE case_id = ?", (case_id,)
+        ).fetchone()
+    )
+    with _cache_lock:
+        cached = _cache.get(case_id)
+        if cached and cached[0] == version:
+            _cache.move_to_end(case_id)
+            return cached[1]
+
+    index = BM25Index(chunk_pages(_load_pages(conn, case_id)))
+
+    with _cache_lock:
+        _cache[case_id] = (version, index)
+        _cache.move_to_end(case_id)
+        while len(_cache) > CHAT_INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def core_sections(analysis: dict) -> dict:
+    return {k: analysis[k] for k in CORE_SECTIONS if k in analysis}
+
+
+def _select_sections(analysis: dict, query: str, budget: int) -> dict:
+    """Pick the non-core analysis sections sharing terms with the question, within budget."""
+    selected = {}
+    used = len(str(core_sections(analysis)))
+    terms = set(tokenize(query))
+
+    ranked = []
+    for key, value in analysis.items():
+        if key in CORE_SECTIONS or key == "citations":
+            continue
+        section_terms = set(tokenize(key.replace("_", " ") + " " + " ".join(flatten(value))))
+        overlap = len(terms & section_terms)
+        if overlap:
+            ranked.append((overlap, key))
+    ranked.sort(reverse=True)
+
+    for _, key in ranked:
+        size = len(str(analysis[key]))
+        if used + size > budget:
+            continue
+        selected[key] = analysis[key]
+        used += size
+    return selected
+
+
+def select_context(
+    conn: sqlite3.Connection,
+    case_id: int,
+    analysis: dict,
+    query: str,
+    budget: int = CHAT_CONTEXT_BUDGET_CHARS,
+    top_k: int = CHAT_TOP_K,
+) -> tuple[dict, list[dict]]:
+    """Choose the analysis sections and document passages to ground one chat turn.
+
+    Up to half of ``budget`` (in characters) goes to analysis sections, core
+    sections included; the rest is filled with the top-ranked passages in
+    rank order. The returned sections exclude the core ones.
+
+    When no passage matches the question (e.g. "summarize this"), the
+    opening passages of the documents are sent instead, settlement first,
+    as chat did before retrieval.
+    """
+    sections = _select_sections(analysis, query, budget // 2)
+    remaining = budget - len(str(core_sections(analysis))) - len(str(sections))
+
+    index = get_index(conn, case_id)
+    ranked = index.top_k(query, top_k)
+    matched = bool(ranked)
+    if not matched:
+        ranked = [(0.0, passage) for passage in index.passages]
+
+    passages = []
+    for score, passage in ranked:
+        if len(passage["text"]) > remaining:
+            if not matched:
+                break  # keep the opening passages contiguous
+            continue
+        passages.append({**passage, "score": round(score, 3)})
+        remaining -= len(passage["text"])
+    return sections, passages
+
+
+def retrieval_query(messages: list[dict]) -> Optional[str]:
+    """Retrieval query for a conversation: the last user turn plus the one before it."""
+    user_turns = [m["content"] for m in messages if m["role"] == "user"]
+    return "\n".join(user_turns[-2:]) if user_turns else None
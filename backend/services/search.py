@@ -0,0 +1,138 @@
+"""Full-text search (SQLite FTS5) over extracted document pages and analyses."""
+
+import json
+import re
+import sqlite3
+
+from backend.database import transaction
+from backend.services.case_data import decompress
+
+# Analysis sections indexed for search, besides the scalar header fields.
+SEARCH_SECTIONS = (
+    "summary",
+    "timeline",
+    "class_specs",
+    "notice_plan",
+    "fund_logistics",
+    "claims_logic",
+    "operational_checklist",
+    "conflict_audit",
+)
+HEADER_FIELDS = ("case_name", "case_number", "jurisdiction", "settlement_type")
+
+
+def flatten(value, key: str = "") -> list[str]:
+    """Turn a JSON value into "key: value" lines, with keys made word-like."""
+    label = key.replace("_", " ")
+    if isinstance(value, dict):
+        return [line for k, v in value.items() for line in flatten(v, k)]
+    if isinstance(value, list):
+        return [line for v in value for line in flatten(v, key)]
+    if value is None or value == "":
+        return []
+    return [f"{label}: {value}" if label else str(value)]
+
+
+def index_analysis(conn: sqlite3.Connection, case_id: int, analysis: dict):
+    """Replace a case's searchable analysis rows, inside the caller's transaction."""
+    conn.execute("DELETE FROM analysis_fields WHERE case_id = ?", (case_id,))
+    rows = []
+    header = "\n".join(
+        line for f in HEADER_FIELDS for line in flatten(analysis.get(f), f)
+    )
+    if header:
+        rows.append((case_id, "header", header))
+    for section in SEARCH_SECTIONS:
+        text = "\n".join(flatten(analysis.get(section)))
+        if text:
+            rows.append((case_id, section, text))
+    conn.executemany(
+        "INSERT INTO analysis_fields (case_id, field, text) VALUES (?, ?, ?)", rows
+    )
+
+
+def remove_case(conn: sqlite3.Connection, case_id: int):
+    """Drop everything indexed for a case, inside the caller's transaction."""
+    conn.execute("DELETE FROM document_pages WHERE case_id = ?", (case_id,))
+    conn.execute("DELETE FROM analysis_fields WHERE case_id = ?", (case_id,))
+
+
+def backfill(conn: sqlite3.Connection):
+    """Index analyses stored before search existed, and rebuild empty page indexes."""
+    with transaction(conn):
+        if conn.execute("SELECT 1 FROM document_pages LIMIT 1").fetchone() and not conn.execute(
+            "SELECT 1 FROM pages_fts LIMIT 1"
+        ).fetchone():
+            conn.execute("INSERT INTO pages_fts (pages_fts) VALUES ('rebuild')")
+
+        rows = conn.execute(
+            """SELECT case_id, body FROM case_analysis
+               WHERE case_id NOT IN (SELECT case_id FROM analysis_fields)"""
+        ).fetchall()
+        for row in rows:
+            index_analysis(conn, row["case_id"], json.loads(decompress(row["body"])))
+
+
+def to_fts_query(q: str) -> str:
+    """Convert user input into a safe FTS5 query.
+
+    Every word (or "quoted phrase") must match; a trailing ``*`` keeps prefix
+    matching. FTS5 operators in the input are treated as plain words.
+    """
+    terms = []
+    for token in re.findall(r'"[^"]*"|\S+', q):
+        prefix = token.endswith("*") and not token.startswith('"')
+        word = token.strip('"').rstrip("*").replace('"', '""')
+        if word.strip():
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def search(
+    conn: sqlite3.Connection,
+    q: str,
+    limit: int = 20,
+    case_id: int = None,
+    source: str = None,
+) -> list[dict]:
+    """Return ranked hits (best first) from document pages and analyses.
+
+    ``source`` narrows results to "documents" or "analysis".
+    """
+    query = to_fts_query(q)
+    if not query:
+        return []
+
+    case_filter = " AND t.case_id = :case_id" if case_id is not None else ""
+    params = {"query": query, "limit": limit, "case_id": case_id}
+    hits = []
+
+    if source in (None, "documents"):
+        hits += conn.execute(
+            f"""SELECT t.case_id, c.case_name, t.doc, t.page_no, NULL AS field,
+                       snippet(pages_fts, 0, '<mark>', '</mark>', '…', 16) AS snippet,
+                       bm25(pages_fts) AS score
+                FROM pages_fts
+                JOIN document_pages t ON t.id = pages_fts.rowid
+                JOIN cases c ON c.id = t.case_id
+                WHERE pages_fts MATCH :query{case_filter}
+                ORDER BY score LIMIT :limit""",
+            params,
+        ).fetchall()
+
+    if source in (None, "analysis"):
+        hits += conn.execute(
+            f"""SELECT t.case_id, c.case_name, 'analysis' AS doc, NULL AS page_no, t.field,
+                       snippet(analysis_fts, 0, '<mark>', '</mark>', '…', 16) AS snippet,
+                       bm25(analysis_fts) AS score
+                FROM analysis_fts
+                JOIN analysis_fields t ON t.id = analysis_fts.rowid
+                JOIN cases c ON c.id = t.case_id
+                WHERE analysis_fts MATCH :query{case_filter}
+                ORDER BY score LIMIT :limit""",
+            params,
+        ).fetchall()
+
+    # bm25() is lower-is-better; report it so that higher means more relevant
+    hits.sort(key=lambda r: r["score"])
+    return [{**dict(r), "score": -r["score"]} for r in hits[:limit]]
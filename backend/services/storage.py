@@ -0,0 +1,156 @@
+"""Content-addressed upload store: files are keyed by SHA-256 and reference-counted."""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from backend.config import UPLOAD_DIR, UPLOAD_CHUNK_SIZE
+from backend.database import transaction
+
+TMP_DIR = UPLOAD_DIR / "tmp"
+
+# Serializes the file-system and refcount updates so a blob can't be unlinked
+# while another upload of the same content is registering it.
+_lock = threading.Lock()
+
+
+def blob_path(digest: str) -> Path:
+    return UPLOAD_DIR / digest[:2] / digest
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds the configured size cap."""
+
+
+async def store_upload(
+    conn: sqlite3.Connection, upload: UploadFile, max_bytes: int
+) -> tuple[str, str]:
+    """Stream an upload to disk in chunks, hashing as it goes, and take a reference.
+
+    Memory use is bounded by the chunk size regardless of the file size.
+    Returns ``(sha256, path)``.
+    """
+    TMP_DIR.mkdir(exist_ok=True)
+    tmp = TMP_DIR / uuid.uuid4().hex
+    hasher = hashlib.sha256()
+    size = 0
+
+    f = await run_in_threadpool(open, tmp, "wb")
+    try:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(
+                    f"{upload.filename} exceeds the {max_bytes // (1024 * 1024)} MB upload limit"
+                )
+            hasher.update(chunk)
+            await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        await run_in_threadpool(f.close)
+        tmp.unlink(missing_ok=True)
+        raise
+    await run_in_threadpool(f.close)
+
+    digest = hasher.hexdigest()
+    path = await run_in_threadpool(_adopt, conn, tmp, digest, size)
+    return digest, path
+
+
+async def spool_upload(upload: UploadFile, max_bytes: int) -> Path:
+    """Stream an upload to a temp file outside the store (e.g. a bulk-import
+    archive). The caller deletes it."""
+    TMP_DIR.mkdir(exist_ok=True)
+    tmp = TMP_DIR / f"{uuid.uuid4().hex}.upload"
+    size = 0
+
+    f = await run_in_threadpool(open, tmp, "wb")
+    try:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(
+                    f"{upload.filename} exceeds the {max_bytes // (1024 * 1024)} MB upload limit"
+                )
+            await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        await run_in_threadpool(f.close)
+        tmp.unlink(missing_ok=True)
+        raise
+    await run_in_threadpool(f.close)
+    return tmp
+
+
+def store_file(
+    conn: sqlite3.Connection, src: BinaryIO, name: str, max_bytes: int
+) -> tuple[str, str]:
+    """Blocking ``store_upload`` for a file object read on a worker thread
+    (e.g. a member of a bulk-import archive). Returns ``(sha256, path)``."""
+    TMP_DIR.mkdir(exist_ok=True)
+    tmp = TMP_DIR / uuid.uuid4().hex
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(tmp, "wb") as f:
+            while chunk := src.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(
+                        f"{name} exceeds the {max_bytes // (1024 * 1024)} MB upload limit"
+                    )
+                hasher.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    digest = hasher.hexdigest()
+    return digest, _adopt(conn, tmp, digest, size)
+
+
+def _adopt(conn: sqlite3.Connection, tmp: Path, digest: str, size: int) -> str:
+    """Move a fully written temp file into the store (or drop it if already stored)."""
+    path = blob_path(digest)
+    with _lock:
+        if path.exists():
+            tmp.unlink()
+        else:
+            path.parent.mkdir(exist_ok=True)
+            os.replace(tmp, path)
+        _add_ref(conn, digest, str(path), size)
+    return str(path)
+
+
+def _add_ref(conn: sqlite3.Connection, digest: str, path: str, size: int):
+    with transaction(conn):
+        conn.execute(
+            """INSERT INTO blobs (sha256, path, size, refcount) VALUES (?, ?, ?, 1)
+               ON CONFLICT(sha256) DO UPDATE SET refcount = refcount + 1""",
+            (digest, path, size),
+        )
+
+
+def release(conn: sqlite3.Connection, digest: str):
+    """Drop one reference to a blob, deleting the file when none remain."""
+    with _lock:
+        with transaction(conn):
+            row = conn.execute(
+                "SELECT path, refcount FROM blobs WHERE sha256 = ?", (digest,)
+            ).fetchone()
+            if not row:
+                return
+            if row["refcount"] > 1:
+                conn.execute(
+                    "UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = ?", (digest,)
+                )
+                return
+            conn.execute("DELETE FROM blobs WHERE sha256 = ?", (digest,))
+        if os.path.exists(row["path"]):
+            os.remove(row["path"])
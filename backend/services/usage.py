@@ -0,0 +1,74 @@
+"""Per-case record of model token usage, including prompt-cache reads and writes."""
+
+import sqlite3
+from typing import Optional
+
+from backend.config import CLAUDE_MODEL
+from backend.services import metrics
+
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+def record_usage(
+    conn: sqlite3.Connection,
+    case_id: int,
+    kind: str,
+    usage,
+    model: str = CLAUDE_MODEL,
+    input_mode: Optional[str] = None,
+    request_bytes: Optional[int] = None,
+    latency_seconds: Optional[float] = None,
+):
+    """Store the ``usage`` block of a Messages API response, inside the caller's transaction."""
+    if usage is None:
+        return
+    values = [getattr(usage, f, None) or 0 for f in USAGE_FIELDS]
+    metrics.MODEL_CALLS.inc(1, kind)
+    for field, value in zip(USAGE_FIELDS, values):
+        metrics.MODEL_TOKENS.inc(value, kind, field.removesuffix("_tokens"))
+    conn.execute(
+        f"""INSERT INTO model_usage
+            (case_id, kind, model, {", ".join(USAGE_FIELDS)},
+             input_mode, request_bytes, latency_seconds)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (case_id, kind, model, *values, input_mode, request_bytes, latency_seconds),
+    )
+
+
+def usage_summary(conn: sqlite3.Connection, case_id: int) -> list[dict]:
+    """Token totals per call kind ("analysis", "chat") for a case."""
+    rows = conn.execute(
+        """SELECT kind,
+                  COUNT(*) AS calls,
+                  SUM(cache_read_input_tokens > 0) AS cache_hits,
+                  SUM(input_tokens) AS input_tokens,
+                  SUM(output_tokens) AS output_tokens,
+                  SUM(cache_creation_input_tokens) AS cache_creation_input_tokens,
+                  SUM(cache_read_input_tokens) AS cache_read_input_tokens
+           FROM model_usage WHERE case_id = ? GROUP BY kind ORDER BY kind""",
+        (case_id,),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def input_mode_summary(conn: sqlite3.Connection) -> list[dict]:
+    """Request size, tokens and latency per analysis input mode, across all cases."""
+    rows = conn.execute(
+        """SELECT input_mode,
+                  COUNT(*) AS calls,
+                  COUNT(DISTINCT case_id) AS cases,
+                  AVG(request_bytes) AS avg_request_bytes,
+                  AVG(input_tokens + cache_creation_input_tokens + cache_read_input_tokens)
+                      AS avg_input_tokens,
+                  AVG(output_tokens) AS avg_output_tokens,
+                  AVG(latency_seconds) AS avg_latency_seconds
+           FROM model_usage
+           WHERE kind = 'analysis' AND input_mode IS NOT NULL
+           GROUP BY input_mode ORDER BY input_mode"""
+    ).fetchall()
+    return [dict(r) for r in rows]
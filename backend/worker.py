@@ -0,0 +1,107 @@
+"""Standalone analysis worker: ``python -m backend.worker [--concurrency N]``.
+
+Claims queued analyses from the database (``services/analysis_queue.py``)
+and runs up to ``--concurrency`` of them at a time, holding a lease on each
+that is renewed while it runs. Run any number of workers next to the API
+with ``ANALYSIS_EXECUTION=workers`` set there, so analysis throughput scales
+with worker processes instead of web concurrency. The API rate limits
+(``ANTHROPIC_REQUESTS_PER_MINUTE`` etc.) apply per process: divide the
+account's limits between the workers.
+
+A worker that dies leaves its leases to expire, after which another process
+claims the analyses and resumes them from their checkpointed sections.
+SIGTERM or SIGINT hands the analyses in progress back to the queue at once.
+"""
+
+import argparse
+import logging
+import signal
+import threading
+import time
+
+from backend.config import (
+    ANALYSIS_MAX_CONCURRENCY,
+    ANALYSIS_JOB_RETENTION_SECONDS,
+    ANALYSIS_QUEUE_POLL_SECONDS,
+)
+from backend.database import connect, init_db, transaction
+from backend.services import analysis_queue, metrics
+
+logger = logging.getLogger("backend.worker")
+
+
+class Worker:
+    """Claims and runs analyses on ``concurrency`` threads under one lease owner."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.owner = analysis_queue.owner_id()
+        self.stopping = threading.Event()
+        self._keeper = analysis_queue.LeaseKeeper(self.owner)
+
+    def run(self):
+        """Work until ``stop()``, then release the analyses still running."""
+        logger.info("Worker %s started with %d slots", self.owner, self.concurrency)
+        self._keeper.start()
+        for i in range(self.concurrency):
+            threading.Thread(target=self._loop, name=f"analysis-{i}", daemon=True).start()
+
+        conn = connect()
+        try:
+            while not self.stopping.wait(60):
+                with transaction(conn):
+                    analysis_queue.prune(conn, time.time() - ANALYSIS_JOB_RETENTION_SECONDS)
+            self._keeper.stop()
+            with transaction(conn):
+                released = analysis_queue.release(conn, self.owner)
+        finally:
+            conn.close()
+        logger.info("Worker %s stopped; %d analyses handed back to the queue", self.owner, released)
+
+    def stop(self, *_):
+        self.stopping.set()
+
+    def _loop(self):
+        conn = connect()
+        try:
+            while not self.stopping.is_set():
+                try:
+                    with transaction(conn):
+                        claimed = analysis_queue.claim(conn, self.owner)
+                except Exception:
+                    logger.exception("Claiming an analysis failed")
+                    claimed = None
+                if claimed is None:
+                    self.stopping.wait(ANALYSIS_QUEUE_POLL_SECONDS)
+                    continue
+                case_id = claimed["case_id"]
+                logger.info("Analyzing case %s (attempt %s)", case_id, claimed["attempts"])
+                started = time.perf_counter()
+                with metrics.ANALYSES_IN_FLIGHT.track():
+                    result = analysis_queue.execute(conn, self.owner, claimed)
+                logger.info(
+                    "Case %s %s in %.1fs", case_id, result["analysis_status"],
+                    time.perf_counter() - started,
+                )
+        finally:
+            conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run queued analyses.")
+    parser.add_argument(
+        "--concurrency", type=int, default=ANALYSIS_MAX_CONCURRENCY,
+        help="analyses run at once by this process",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    init_db()
+    worker = Worker(args.concurrency)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""On-disk size and query latency of inline vs side-table (compressed) case payloads.
+
+Builds a database in the old layout (settlement_text, bid_text and
+analysis_json on the cases row), times the queries behind serve_pdf,
+get_case and list_cases, then runs the migration and VACUUM and times the
+queries the endpoints now issue.
+
+    python -m benchmarks.case_storage --cases 2000 --repeat 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+WORDS = (
+    "settlement class member claim notice administrator deadline fund payment "
+    "distribution objection opt-out court approval hearing counsel fees award "
+    "release period website mailing publication reminder check residual cy pres"
+).split()
+
+LEGACY_QUERIES = {
+    "serve_pdf": "SELECT * FROM cases WHERE id = ?",
+    "get_case": "SELECT * FROM cases WHERE id = ?",
+    "list_cases": """SELECT id, created_at, settlement_filename, bid_filename, has_bid,
+                            analysis_status, case_name, case_number, jurisdiction, settlement_type
+                     FROM cases WHERE jurisdiction = ? ORDER BY created_at DESC LIMIT 50""",
+}
+
+QUERIES = {
+    "serve_pdf": """SELECT settlement_path AS path, settlement_media_type AS media_type
+                    FROM cases WHERE id = ?""",
+    "get_case": """SELECT id, created_at, settlement_filename, bid_filename, has_bid,
+                          analysis_status, extraction_status, page_count, extraction_seconds,
+                          analysis_error, case_name, case_number, jurisdiction, settlement_type
+                   FROM cases WHERE id = ?;
+                   SELECT body FROM case_analysis WHERE case_id = ?""",
+    "list_cases": LEGACY_QUERIES["list_cases"],
+}
+
+
+def _text(words: int) -> str:
+    lines = []
+    for _ in range(words // 12):
+        lines.append(" ".join(random.choices(WORDS, k=12)))
+    return "\n".join(lines)
+
+
+# The cases table as first released, with the payload columns mid-row
+LEGACY_CASES = """
+CREATE TABLE cases (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at      TEXT NOT NULL DEFAULT (datetime('now')),
+    settlement_filename TEXT NOT NULL,
+    settlement_path     TEXT NOT NULL,
+    settlement_media_type TEXT NOT NULL,
+    bid_filename    TEXT,
+    bid_path        TEXT,
+    bid_media_type  TEXT,
+    has_bid         INTEGER NOT NULL DEFAULT 0,
+    settlement_text TEXT,
+    bid_text        TEXT,
+    analysis_json   TEXT,
+    analysis_status TEXT NOT NULL DEFAULT 'pending',
+    analysis_error  TEXT,
+    case_name       TEXT,
+    case_number     TEXT,
+    jurisdiction    TEXT,
+    settlement_type TEXT
+);
+"""
+LEGACY_VERSION = 1  # migrations applied before payloads moved to side tables
+
+
+def _seed_legacy(db_path: str, cases: int, text_words: int):
+    from backend import database
+
+    conn = sqlite3.connect(db_path)
+    conn.executescript(LEGACY_CASES)
+    conn.close()
+    migrations = database.MIGRATIONS
+    database.MIGRATIONS = migrations[:LEGACY_VERSION]
+    try:
+        database.init_db()
+    finally:
+        database.MIGRATIONS = migrations
+
+    conn = sqlite3.connect(db_path)
+    analysis = json.dumps({"case_name": "Bench v. Mark", "summary": _text(600)})
+    conn.executemany(
+        """INSERT INTO cases (id, settlement_filename, settlement_path, settlement_media_type,
+                              analysis_status, jurisdiction, settlement_text, bid_text, analysis_json)
+           VALUES (?, ?, ?, 'application/pdf', 'completed', ?, ?, ?, ?)""",
+        (
+            (
+                i, f"s{i}.pdf", f"/nonexistent/{i}", random.choice(["CA", "NY", "TX"]),
+                _text(text_words), _text(text_words // 4), analysis,
+            )
+            for i in range(1, cases + 1)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _time(conn: sqlite3.Connection, queries: dict, cases: int, repeat: int) -> dict:
+    results = {}
+    for name, sql in queries.items():
+        statements = [s for s in sql.split(";") if s.strip()]
+        samples = []
+        for _ in range(repeat):
+            case_id = random.randint(1, cases)
+            started = time.perf_counter()
+            for statement in statements:
+                arg = random.choice(["CA", "NY", "TX"]) if "jurisdiction = ?" in statement else case_id
+                conn.execute(statement, (arg,)).fetchall()
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        results[name] = {
+            "mean_ms": round(statistics.fmean(samples) * 1000, 4),
+            "p95_ms": round(samples[int(len(samples) * 0.95)] * 1000, 4),
+        }
+    return results
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    from backend.database import _configure
+
+    return _configure(sqlite3.connect(db_path))
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--text-words", type=int, default=40000, help="words per settlement")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="bench-storage-")
+    db_path = os.path.join(tmp, "bench.db")
+    os.environ["DB_PATH"] = db_path
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+
+    from backend.database import init_db
+
+    _seed_legacy(db_path, args.cases, args.text_words)
+    conn = sqlite3.connect(db_path)
+    conn.execute("VACUUM")
+    conn.close()
+    before_size = os.path.getsize(db_path)
+    conn = _connect(db_path)
+    before = _time(conn, LEGACY_QUERIES, args.cases, args.repeat)
+    conn.close()
+
+    started = time.perf_counter()
+    init_db()
+    migration_seconds = time.perf_counter() - started
+    conn = sqlite3.connect(db_path)
+    conn.execute("VACUUM")
+    conn.close()
+    after_size = os.path.getsize(db_path)
+    conn = _connect(db_path)
+    after = _time(conn, QUERIES, args.cases, args.repeat)
+    conn.close()
+
+    results = {
+        "db_bytes": {"inline": before_size, "side_tables": after_size},
+        "migration_seconds": round(migration_seconds, 2),
+        "inline": before,
+        "side_tables": after,
+    }
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Compare two ``benchmarks.load`` reports scenario by scenario.
+
+    python -m benchmarks.compare before.json after.json
+"""
+
+import argparse
+import json
+
+_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def _change(before, after) -> str:
+    if before in (None, 0) or after is None:
+        return ""
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(before: dict, after: dict) -> list[tuple]:
+    """Rows of (scenario, metric, before, after, change) for the scenarios in both reports."""
+    rows = []
+    for scenario, old in before["scenarios"].items():
+        new = after["scenarios"].get(scenario)
+        if new is None:
+            continue
+        for metric in ("throughput_per_sec", "errors", "peak_rss_mb"):
+            rows.append((scenario, metric, old.get(metric), new.get(metric), _change(old.get(metric), new.get(metric))))
+        for name, latencies in old.items():
+            if not isinstance(latencies, dict):
+                continue
+            for metric in _METRICS:
+                a, b = latencies.get(metric), new.get(name, {}).get(metric)
+                rows.append((scenario, f"{name}.{metric}", a, b, _change(a, b)))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args(argv)
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"{'':<34}{before['commit']:>12}{after['commit']:>12}")
+    for scenario, metric, a, b, change in compare(before, after):
+        print(f"{scenario + ' ' + metric:<34}{str(a):>12}{str(b):>12}  {change}")
+
+
+if __name__ == "__main__":
+    main()
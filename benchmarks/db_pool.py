@@ -0,0 +1,124 @@
+"""Requests/sec for get_case and list_cases with and without the connection pool.
+
+"unpooled" swaps in the original per-request ``sqlite3.connect`` dependency
+(no pragmas beyond WAL) so both modes run against the same app and data.
+
+    python -m benchmarks.db_pool --cases 2000 --seconds 5 --concurrency 16
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+
+def _seed(db_path: str, cases: int):
+    from backend.database import init_db
+    from backend.services.case_data import compress
+
+    init_db()
+    conn = sqlite3.connect(db_path)
+    analysis = compress(json.dumps({"case_name": "Bench v. Mark", "summary": "x" * 4000}))
+    conn.executemany(
+        """INSERT INTO cases (id, settlement_filename, settlement_path, settlement_media_type,
+                              analysis_status, case_name, jurisdiction)
+           VALUES (?, ?, ?, 'application/pdf', 'completed', ?, ?)""",
+        [
+            (i, f"s{i}.pdf", f"/nonexistent/{i}", f"Case {i}", random.choice(["CA", "NY", "TX"]))
+            for i in range(1, cases + 1)
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO case_analysis (case_id, body) VALUES (?, ?)",
+        [(i, analysis) for i in range(1, cases + 1)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _unpooled_get_db():
+    from backend.config import DB_PATH
+
+    conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _hammer(port: int, paths: list[str], seconds: float, concurrency: int) -> dict:
+    counts = [0] * concurrency
+    errors = [0] * concurrency
+    deadline = time.perf_counter() + seconds
+
+    def worker(i: int):
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        while time.perf_counter() < deadline:
+            conn.request("GET", random.choice(paths))
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status == 200:
+                counts[i] += 1
+            else:
+                errors[i] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"requests_per_sec": round(sum(counts) / seconds, 1), "errors": sum(errors)}
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="bench-db-")
+    os.environ["DB_PATH"] = os.path.join(tmp, "bench.db")
+    os.environ["UPLOAD_DIR"] = os.path.join(tmp, "uploads")
+
+    import uvicorn
+    from backend.database import get_db
+    from backend.main import app
+
+    _seed(os.environ["DB_PATH"], args.cases)
+
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    scenarios = {
+        "get_case": [f"/api/cases/{i}" for i in range(1, args.cases + 1)],
+        "list_cases": ["/api/cases"],
+    }
+    results = {}
+    for mode in ("unpooled", "pooled"):
+        if mode == "unpooled":
+            app.dependency_overrides[get_db] = _unpooled_get_db
+        else:
+            app.dependency_overrides.pop(get_db, None)
+        for name, paths in scenarios.items():
+            results[f"{name}/{mode}"] = _hammer(args.port, paths, args.seconds, args.concurrency)
+
+    server.should_exit = True
+    json.dump(results, sys.stdout, indent=2)
+    print()
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Synthetic Settlement Agreement and Bid PDFs for benchmarks.
+
+Pages read like the real documents (numbered sections, dates, dollar
+amounts, deadlines) so extraction, search, citation checks and hybrid input
+see realistic text. Output is deterministic for a given seed; different
+seeds give documents with different hashes, so the analysis cache does not
+short-circuit a run.
+
+    python -m benchmarks.documents --pages 200 --bid-pages 20 --count 5 --out /tmp/docs
+"""
+
+import argparse
+import os
+import random
+
+import fitz  # PyMuPDF
+
+SECTION_TITLES = [
+    "Definitions", "Class Certification", "Settlement Consideration", "Notice Program",
+    "Claims Process", "Exclusions and Objections", "Attorneys' Fees and Service Awards",
+    "Distribution of Settlement Fund", "Release of Claims", "Final Approval Hearing",
+    "Settlement Administration", "Qualified Settlement Fund", "Termination", "Miscellaneous",
+]
+
+SENTENCES = [
+    "The Settlement Administrator shall mail the Class Notice within {days} days after entry of the Preliminary Approval Order.",
+    "Class Members may submit a Claim Form no later than the Claims Deadline of {date}.",
+    "The Gross Settlement Amount of ${amount} shall be deposited into the Qualified Settlement Fund within {days} days.",
+    "Requests for exclusion must be postmarked on or before {date} and must include the Class Member's name and address.",
+    "Class Counsel shall apply for an award of attorneys' fees not to exceed {pct} percent of the Gross Settlement Amount.",
+    "Administration costs shall not exceed ${amount}, to be paid from the Settlement Fund.",
+    "Each Settlement Class Member who submits a valid claim shall receive a pro rata share of the Net Settlement Fund.",
+    "Uncashed checks shall be void {days} days after issuance and the residual distributed to the cy pres recipient.",
+    "The Final Approval Hearing shall be held on {date} before the Honorable Court.",
+    "The Settlement Website shall remain active until {days} days after the distribution of settlement payments.",
+    "Notice shall be provided by first-class mail, email and a targeted digital media campaign in English and Spanish.",
+    "The Settlement Administrator shall perform skip tracing on all notices returned as undeliverable.",
+]
+
+BID_SENTENCES = [
+    "Our team will establish a toll-free number and static website within {days} days of approval.",
+    "Printing and mailing of postcard notices is priced at ${cents} per unit.",
+    "The not-to-exceed estimate for administration is ${amount}, inclusive of postage.",
+    "Claims will be reviewed for fraud using address verification and duplicate detection.",
+    "Payments will be issued by check and electronic payment, with reissues handled within {days} days.",
+    "Weekly status reports will be provided to counsel, including claim and exclusion counts.",
+]
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December"]
+
+
+def _fill(rng: random.Random, sentence: str) -> str:
+    return sentence.format(
+        days=rng.choice([14, 21, 30, 45, 60, 90, 180]),
+        date=f"{rng.choice(MONTHS)} {rng.randint(1, 28)}, {rng.choice([2026, 2027])}",
+        amount=f"{rng.randint(1, 90) * 50_000:,}",
+        pct=rng.choice([25, 30, 33]),
+        cents=f"{rng.randint(30, 90) / 100:.2f}",
+    )
+
+
+def _pages(rng: random.Random, pages: int, sentences: list[str], title: str, words: int) -> bytes:
+    doc = fitz.open()
+    section = 0
+    for page_no in range(1, pages + 1):
+        lines = []
+        if page_no == 1:
+            lines.append(title)
+        if page_no == 1 or rng.random() < 0.3:
+            section += 1
+            lines.append(f"{section}. {SECTION_TITLES[(section - 1) % len(SECTION_TITLES)].upper()}")
+        body = []
+        while sum(len(s.split()) for s in body) < words:
+            body.append(_fill(rng, rng.choice(sentences)))
+        lines.append(f"{section}.{page_no} " + " ".join(body))
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(72, 72, 540, 740), "\n\n".join(lines), fontsize=10)
+        page.insert_text((300, 770), str(page_no), fontsize=9)
+    data = doc.tobytes(garbage=1, deflate=True)
+    doc.close()
+    return data
+
+
+def settlement_pdf(pages: int, seed: int = 0, words_per_page: int = 350) -> bytes:
+    """A Settlement Agreement of ``pages`` pages."""
+    rng = random.Random(f"settlement-{seed}")
+    title = f"SETTLEMENT AGREEMENT AND RELEASE - Bench v. Mark Corp., Case No. {seed:05d}"
+    return _pages(rng, pages, SENTENCES, title, words_per_page)
+
+
+def bid_pdf(pages: int, seed: int = 0, words_per_page: int = 300) -> bytes:
+    """An administration Bid/Proposal of ``pages`` pages."""
+    rng = random.Random(f"bid-{seed}")
+    title = f"PROPOSAL FOR SETTLEMENT ADMINISTRATION SERVICES - Case No. {seed:05d}"
+    return _pages(rng, pages, BID_SENTENCES, title, words_per_page)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=40, help="settlement pages")
+    parser.add_argument("--bid-pages", type=int, default=10, help="bid pages (0 for none)")
+    parser.add_argument("--count", type=int, default=1, help="settlement/bid pairs")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first pair")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    for seed in range(args.seed, args.seed + args.count):
+        with open(os.path.join(args.out, f"settlement-{seed}.pdf"), "wb") as f:
+            f.write(settlement_pdf(args.pages, seed))
+        if args.bid_pages:
+            with open(os.path.join(args.out, f"bid-{seed}.pdf"), "wb") as f:
+                f.write(bid_pdf(args.bid_pages, seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""A local stand-in for the Anthropic Messages API.
+
+Answers ``POST /v1/messages`` (plain and streamed) after a configurable time
+to first token, streams at a configurable output rate, and rejects a share of
+requests with 429 + ``retry-after`` so the client's rate limiting and retries
+are exercised. Analysis requests (system prompt carrying the output schema)
+get a complete, schema-shaped analysis; anything else (chat) gets prose.
+``GET /stats`` reports what was served.
+
+    python -m benchmarks.fake_api --port 8798 --latency-ms 800 --tokens-per-sec 400 --rate-limit 0.02
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import random
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from backend.prompts import OUTPUT_SCHEMA
+
+CHARS_PER_TOKEN = 4
+CHUNK_TOKENS = 20
+
+settings = {
+    "latency_ms": 800.0,
+    "tokens_per_sec": 400.0,
+    "rate_limit": 0.02,
+    "retry_after": 0.5,
+    "chat_tokens": 300,
+    "seed": 0,
+}
+stats = {"requests": 0, "streamed": 0, "rate_limited": 0, "input_tokens": 0, "output_tokens": 0}
+_rng = random.Random(0)
+
+app = FastAPI(title="Fake Messages API")
+
+_LIST_SIZES = {"timeline.milestones": 8, "conflict_audit": 3}
+
+
+def _value(schema, path: str):
+    if isinstance(schema, dict):
+        return {k: _value(v, f"{path}.{k}" if path else k) for k, v in schema.items() if k != "citations"}
+    if isinstance(schema, list):
+        return [_value(schema[0], path) for _ in range(_LIST_SIZES.get(path, 3))]
+    if isinstance(schema, bool):
+        return True
+    if schema == "number":
+        return 2
+    if "date" in path or "deadline" in path or path.startswith("timeline."):
+        return f"March {_rng.randint(1, 28)}, 2027"
+    if "|" in schema:
+        return schema.split("|")[0]
+    return f"Bench {path.rsplit('.', 1)[-1].replace('_', ' ')} {_rng.randint(1, 999)}"
+
+
+def fake_analysis() -> dict:
+    """A complete analysis in the shape of ``OUTPUT_SCHEMA``."""
+    analysis = _value(OUTPUT_SCHEMA, "")
+    analysis["settlement_type"] = "Claims-Made"
+    for i, milestone in enumerate(analysis["timeline"]["milestones"]):
+        milestone["label"] = f"Milestone {i + 1}"
+        milestone["page"] = i + 1
+        milestone["quote"] = "The Settlement Administrator shall mail the Class Notice"
+    analysis["citations"] = {
+        "fund_logistics.gross_settlement": [
+            {"doc": "settlement", "page": 1, "quote": "The Gross Settlement Amount of"}
+        ],
+        "timeline.claims_deadline": [
+            {"doc": "settlement", "page": 2, "quote": "Class Members may submit a Claim Form"}
+        ],
+    }
+    return analysis
+
+
+def _text_of(value) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "".join(_text_of(v) for v in value)
+    if isinstance(value, dict):
+        if value.get("type") == "text":
+            return value.get("text", "")
+        source = value.get("source")
+        if isinstance(source, dict) and source.get("type") == "base64":
+            # Documents and images: roughly what the real API bills per payload size
+            return "x" * (len(source.get("data", "")) // 3)
+        return "".join(_text_of(v) for v in value.values())
+    return ""
+
+
+def _reply(body: dict) -> str:
+    messages = body.get("messages", [])
+    prefill = ""
+    if messages and messages[-1].get("role") == "assistant":
+        prefill = _text_of(messages[-1].get("content"))
+    if '"case_name"' in _text_of(body.get("system")):
+        analysis = fake_analysis()
+        if not prefill:
+            return json.dumps(analysis)
+        # Resumed stream: continue after the prefilled sections ('{"a":..,"b":..,')
+        done = json.loads(prefill.rstrip().rstrip(",") + "}")
+        return json.dumps({k: v for k, v in analysis.items() if k not in done})[1:]
+    words = "The claims deadline is set out in the settlement agreement on page two".split()
+    return " ".join(_rng.choice(words) for _ in range(settings["chat_tokens"]))
+
+
+def _message(text: str, input_tokens: int, output_tokens: int, model: str) -> dict:
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        },
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    if _rng.random() < settings["rate_limit"]:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            {"type": "error", "error": {"type": "rate_limit_error", "message": "Rate limited"}},
+            status_code=429,
+            headers={"retry-after": str(settings["retry_after"])},
+        )
+
+    text = _reply(body)
+    input_tokens = len(_text_of(body.get("system"))) // CHARS_PER_TOKEN + len(
+        _text_of(body.get("messages"))
+    ) // CHARS_PER_TOKEN
+    output_tokens = max(1, len(text) // CHARS_PER_TOKEN)
+    stats["input_tokens"] += input_tokens
+    stats["output_tokens"] += output_tokens
+    message = _message(text, input_tokens, output_tokens, body.get("model", "fake"))
+    headers = {"anthropic-ratelimit-requests-remaining": "1000"}
+    chunk_seconds = CHUNK_TOKENS / settings["tokens_per_sec"] if settings["tokens_per_sec"] else 0
+
+    if not body.get("stream"):
+        await asyncio.sleep(settings["latency_ms"] / 1000 + output_tokens / CHUNK_TOKENS * chunk_seconds)
+        return JSONResponse(message, headers=headers)
+
+    stats["streamed"] += 1
+
+    async def events():
+        start = copy.deepcopy(message)
+        start["content"] = []
+        start["usage"]["output_tokens"] = 0
+        await asyncio.sleep(settings["latency_ms"] / 1000)
+        yield _sse("message_start", {"type": "message_start", "message": start})
+        yield _sse("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""},
+        })
+        step = CHUNK_TOKENS * CHARS_PER_TOKEN
+        for i in range(0, len(text), step):
+            yield _sse("content_block_delta", {
+                "type": "content_block_delta", "index": 0,
+                "delta": {"type": "text_delta", "text": text[i:i + step]},
+            })
+            if chunk_seconds:
+                await asyncio.sleep(chunk_seconds)
+        yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+        yield _sse("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": output_tokens},
+        })
+        yield _sse("message_stop", {"type": "message_stop"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+@app.get("/stats")
+def get_stats():
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8798)
+    parser.add_argument("--latency-ms", type=float, default=settings["latency_ms"], help="time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=settings["tokens_per_sec"], help="output rate (0: instant)")
+    parser.add_argument("--rate-limit", type=float, default=settings["rate_limit"], help="share of requests answered 429")
+    parser.add_argument("--retry-after", type=float, default=settings["retry_after"])
+    parser.add_argument("--chat-tokens", type=int, default=settings["chat_tokens"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    settings.update({k: v for k, v in vars(args).items() if k in settings})
+    _rng.seed(args.seed)
+
+    import uvicorn
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+"""End-to-end load scenarios against the app and a fake Messages API.
+
+Starts the fake API (``benchmarks.fake_api``) and the app (uvicorn) as
+subprocesses on a temporary database seeded with ``--cases`` analyzed cases,
+then runs each scenario with ``--concurrency`` clients:
+
+- ``upload``: settlement + bid uploads of synthetic PDFs (distinct per upload);
+- ``analyze``: synchronous analyses of the uploaded cases;
+- ``poll``: async analyses with clients polling ``GET /api/cases/{id}`` until done;
+- ``list_cases``: paging and filtering ``GET /api/cases`` over the seeded cases;
+- ``chat``: multi-turn chat sessions, streamed (time to first byte and total
+  per turn) with the sessions' token totals;
+- ``frontend``: cold loads of the built SPA (``index.html`` and the assets it
+  references), with and without compression: bytes on the wire and time until
+  every asset has arrived (skipped when ``dist/`` is not built).
+
+Each scenario reports request count, errors, throughput, latency
+percentiles and the app's resident memory, as JSON tagged with the commit so
+runs can be compared with ``python -m benchmarks.compare``. ``--workers N``
+runs analyses in N ``backend.worker`` processes instead of the API process.
+
+    python -m benchmarks.load --cases 20000 --uploads 20 --pages 60 --out before.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from benchmarks.db_pool import _seed
+from benchmarks.documents import bid_pdf, settlement_pdf
+
+SCENARIOS = ("upload", "analyze", "poll", "list_cases", "chat", "frontend")
+
+
+def percentiles(samples: list[float]) -> dict:
+    """p50/p95/p99/max of latencies in seconds, as milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {"p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+def memory(pid: int) -> dict:
+    """Resident and peak resident memory of a process, in MB (Linux)."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    fields[key] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        return {}
+    return {"rss_mb": fields.get("VmRSS"), "peak_rss_mb": fields.get("VmHWM")}
+
+
+class Recorder:
+    """Latencies and errors collected by concurrent clients."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = {}
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def result(self, pid: int, main: str) -> dict:
+        """Summary, with throughput counted from the ``main`` latencies."""
+        elapsed = self.elapsed
+        done = len(self.latencies.get(main, []))
+        return {
+            "requests": done,
+            "errors": self.errors,
+            "seconds": round(elapsed, 2),
+            "throughput_per_sec": round(done / elapsed, 2) if elapsed else None,
+            **{name: percentiles(samples) for name, samples in sorted(self.latencies.items())},
+            **memory(pid),
+        }
+
+
+class Client:
+    """One keep-alive HTTP connection per client thread."""
+
+    def __init__(self, port: int, timeout: float = 600):
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=self.timeout)
+        return conn
+
+    def open(self, method: str, path: str, params=None, body: bytes = None, headers=None):
+        """Send a request and return the response with its body unread."""
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        conn = self._conn()
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            return conn.getresponse()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def send(self, method: str, path: str, **kwargs) -> tuple[int, bytes]:
+        resp = self.open(method, path, **kwargs)
+        return resp.status, resp.read()
+
+    def get_json(self, path: str, params=None):
+        status, body = self.send("GET", path, params=params)
+        return status, json.loads(body) if status < 400 else None
+
+
+def multipart(files: list[tuple[str, str, bytes, str]]) -> tuple[bytes, dict]:
+    """Body and headers of a multipart/form-data upload of (field, filename, data, type)."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for field, filename, data, media_type in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f"Content-Type: {media_type}\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def _run(jobs, concurrency: int, work) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(work, jobs))
+    return time.perf_counter() - started
+
+
+def _timed(recorder: Recorder, name: str, send, raw: bool = False):
+    """Time ``send() -> (status, body)``; the decoded JSON body (the bytes if
+    ``raw``), or None on errors."""
+    started = time.perf_counter()
+    try:
+        status, body = send()
+    except (OSError, http.client.HTTPException):
+        recorder.error()
+        return None
+    if status >= 400:
+        recorder.error()
+        return None
+    recorder.add(name, time.perf_counter() - started)
+    if raw:
+        return body
+    return json.loads(body) if body else {}
+
+
+def upload(client: Client, args, seeds: list[int], recorder: Recorder) -> list[int]:
+    # Documents are generated up front so the scenario times the app, not PyMuPDF
+    documents = {s: (settlement_pdf(args.pages, s), bid_pdf(args.bid_pages, s)) for s in seeds}
+    case_ids = []
+
+    def work(seed: int):
+        settlement, bid = documents[seed]
+        files = [("files", f"settlement-{seed}.pdf", settlement, "application/pdf")]
+        if args.bid_pages:
+            files.append(("files", f"bid-{seed}.pdf", bid, "application/pdf"))
+        body, headers = multipart(files)
+        resp = _timed(
+            recorder, "upload",
+            lambda: client.send("POST", "/api/cases/upload", body=body, headers=headers),
+        )
+        if resp is not None:
+            case_ids.append(resp["id"])
+
+    recorder.elapsed = _run(seeds, args.concurrency, work)
+    return case_ids
+
+
+def analyze(client: Client, args, case_ids: list[int], recorder: Recorder):
+    params = {"input_mode": args.input_mode} if args.input_mode else {}
+
+    def work(case_id: int):
+        _timed(recorder, "analyze", lambda: client.send("POST", f"/api/cases/{case_id}/analyze", params=params))
+
+    recorder.elapsed = _run(case_ids, args.concurrency, work)
+
+
+def poll(client: Client, args, case_ids: list[int], recorder: Recorder):
+    params = {"mode": "async", **({"input_mode": args.input_mode} if args.input_mode else {})}
+
+    def work(case_id: int):
+        started = time.perf_counter()
+        submit = lambda: client.send("POST", f"/api/cases/{case_id}/analyze", params=params)
+        if _timed(recorder, "submit", submit) is None:
+            return
+        while True:
+            case = _timed(recorder, "get_case", lambda: client.send("GET", f"/api/cases/{case_id}"))
+            if case is None:
+                return
+            status = case["analysis_status"]
+            if status in ("completed", "failed"):
+                if status == "failed":
+                    recorder.error()
+                recorder.add("analysis", time.perf_counter() - started)
+                return
+            time.sleep(args.poll_interval)
+
+    recorder.elapsed = _run(case_ids, args.concurrency, work)
+
+
+def list_cases(client: Client, args, recorder: Recorder):
+    deadline = time.perf_counter() + args.seconds
+    filters = [{}, {"jurisdiction": "CA"}, {"status": "completed"}, {"limit": 200}]
+
+    def work(_):
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            params = dict(rng.choice(filters))
+            page = _timed(recorder, "list_cases", lambda: client.send("GET", "/api/cases", params=params))
+            # Follow the cursor a few pages deep, as a scrolling client would
+            for _ in range(rng.randint(0, 3)):
+                if page is None or not page.get("next_cursor"):
+                    break
+                params["cursor"] = page["next_cursor"]
+                page = _timed(recorder, "list_cases", lambda: client.send("GET", "/api/cases", params=params))
+
+    recorder.elapsed = _run(range(args.concurrency), args.concurrency, work)
+
+
+def chat(client: Client, args, case_ids: list[int], recorder: Recorder) -> dict:
+    """``--chats`` sessions of ``--chat-turns`` turns each; returns their token totals."""
+    headers = {"Content-Type": "application/json"}
+    questions = ["When is the claims deadline?", "Who pays the administration costs?",
+                 "What must the notice plan include?", "Are there any conflicts between the documents?"]
+    sessions = [case_ids[i % len(case_ids)] for i in range(args.chats)]
+    totals: dict[str, int] = {}
+    totals_lock = threading.Lock()
+
+    def turn(case_id: int, session_id, question: str):
+        body = json.dumps({"message": question, "session_id": session_id}).encode()
+        started = time.perf_counter()
+        try:
+            resp = client.open("POST", f"/api/cases/{case_id}/chat", body=body, headers=headers)
+            if resp.status >= 400:
+                resp.read()
+                recorder.error()
+                return None
+            if resp.read1(1):
+                recorder.add("first_byte", time.perf_counter() - started)
+            frames = resp.read().split(b"\n\n")
+        except (OSError, http.client.HTTPException):
+            recorder.error()
+            return None
+        recorder.add("chat", time.perf_counter() - started)
+        for frame in frames:
+            if b'"type": "session"' in frame:
+                return json.loads(frame[frame.index(b"{"):])["session_id"]
+        recorder.error()
+        return None
+
+    def work(case_id: int):
+        session_id = None
+        for i in range(args.chat_turns):
+            session_id = turn(case_id, session_id, questions[i % len(questions)])
+            if session_id is None:
+                return
+        status, session = client.get_json(f"/api/cases/{case_id}/chat/sessions/{session_id}")
+        if status == 200:
+            with totals_lock:
+                for k, v in session["usage"].items():
+                    totals[k] = totals.get(k, 0) + v
+
+    recorder.elapsed = _run(sessions, args.concurrency, work)
+    return {"session_tokens": totals}
+
+
+_ASSET = re.compile(r'(?:src|href)="(/assets/[^"]+)"')
+
+
+def frontend(client: Client, args, assets: list[str], encoding: str, recorder: Recorder) -> dict:
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    loaded = []
+
+    def work(_):
+        started = time.perf_counter()
+        sent = 0
+        for path in ["/", *assets]:
+            body = _timed(recorder, "file", lambda: client.send("GET", path, headers=headers), raw=True)
+            if body is None:
+                return
+            sent += len(body)
+        recorder.add("page_load", time.perf_counter() - started)
+        loaded.append(sent)
+
+    recorder.elapsed = _run(range(args.page_loads), args.concurrency, work)
+    return {"bytes_per_load": max(loaded) if loaded else None}
+
+
+def run_scenarios(client: Client, args, scenarios: list[str], pid: int) -> dict:
+    results = {}
+    uploaded, polled = [], []
+    if any(s in scenarios for s in ("upload", "analyze", "chat")):
+        recorder = Recorder()
+        uploaded = upload(client, args, list(range(args.uploads)), recorder)
+        if "upload" in scenarios:
+            results["upload"] = recorder.result(pid, "upload")
+    if "poll" in scenarios:
+        # Fresh cases: analyzed ones are answered from storage without a job
+        polled = upload(client, args, list(range(args.uploads, 2 * args.uploads)), Recorder())
+    if "analyze" in scenarios or "chat" in scenarios:
+        recorder = Recorder()
+        analyze(client, args, uploaded, recorder)
+        if "analyze" in scenarios:
+            results["analyze"] = recorder.result(pid, "analyze")
+    if "poll" in scenarios:
+        recorder = Recorder()
+        poll(client, args, polled, recorder)
+        results["poll"] = recorder.result(pid, "analysis")
+    if "list_cases" in scenarios:
+        recorder = Recorder()
+        list_cases(client, args, recorder)
+        results["list_cases"] = recorder.result(pid, "list_cases")
+    if "chat" in scenarios:
+        recorder = Recorder()
+        extra = chat(client, args, uploaded, recorder)
+        results["chat"] = {**recorder.result(pid, "chat"), **extra}
+    if "frontend" in scenarios:
+        status, page = client.send("GET", "/")
+        if status != 200 or b"<html" not in page.lower():
+            results["frontend"] = {"skipped": "frontend not built"}
+        else:
+            assets = _ASSET.findall(page.decode())
+            for label, encoding in (("frontend", "br, gzip"), ("frontend/identity", "")):
+                recorder = Recorder()
+                extra = frontend(client, args, assets, encoding, recorder)
+                results[label] = {**recorder.result(pid, "page_load"), **extra}
+    return results
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{' '.join(proc.args)} exited with {proc.returncode}")
+        try:
+            with urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--cases", type=int, default=5000, help="analyzed cases seeded for list_cases")
+    parser.add_argument("--uploads", type=int, default=10, help="cases uploaded (analyze and poll use them)")
+    parser.add_argument("--pages", type=int, default=40, help="settlement pages per upload")
+    parser.add_argument("--bid-pages", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of list_cases")
+    parser.add_argument("--chats", type=int, default=20, help="chat sessions")
+    parser.add_argument("--chat-turns", type=int, default=4, help="turns per chat session")
+    parser.add_argument("--page-loads", type=int, default=20, help="cold frontend loads")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--input-mode", choices=("pdf", "hybrid"))
+    parser.add_argument(
+        "--workers", type=int, default=0,
+        help="run analyses in this many `backend.worker` processes (0: in the API process)",
+    )
+    parser.add_argument("--latency-ms", type=float, default=800, help="fake API time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=400, help="fake API output rate")
+    parser.add_argument("--rate-limit", type=float, default=0.02, help="fake API share of 429s")
+    parser.add_argument("--port", type=int, default=8797)
+    parser.add_argument("--api-port", type=int, default=8798)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    tmp = tempfile.mkdtemp(prefix="bench-load-")
+    env = {
+        **os.environ,
+        "DB_PATH": os.path.join(tmp, "bench.db"),
+        "UPLOAD_DIR": os.path.join(tmp, "uploads"),
+        "ANTHROPIC_API_KEY": "bench",
+        "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{args.api_port}",
+        "ANTHROPIC_RETRY_BASE_SECONDS": os.environ.get("ANTHROPIC_RETRY_BASE_SECONDS", "0.2"),
+    }
+    os.environ.update({k: env[k] for k in ("DB_PATH", "UPLOAD_DIR")})
+    _seed(env["DB_PATH"], args.cases)
+
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_api", "--port", str(args.api_port),
+        "--latency-ms", str(args.latency_ms), "--tokens-per-sec", str(args.tokens_per_sec),
+        "--rate-limit", str(args.rate_limit),
+    ], env=env)
+    if args.workers:
+        env["ANALYSIS_EXECUTION"] = "workers"
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "backend.main:app",
+        "--port", str(args.port), "--log-level", "warning",
+    ], env=env)
+    workers = [
+        subprocess.Popen([sys.executable, "-m", "backend.worker"], env=env, stderr=subprocess.DEVNULL)
+        for _ in range(args.workers)
+    ]
+    report = {
+        "commit": _commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "args": vars(args),
+    }
+    try:
+        _wait_ready(f"http://127.0.0.1:{args.api_port}/stats", fake)
+        _wait_ready(f"http://127.0.0.1:{args.port}/api/health", app)
+        report["idle"] = memory(app.pid)
+        report["scenarios"] = run_scenarios(Client(args.port), args, scenarios, app.pid)
+        if workers:
+            report["workers"] = [memory(w.pid) for w in workers]
+        with urlopen(f"http://127.0.0.1:{args.api_port}/stats") as resp:
+            report["fake_api"] = json.load(resp)
+    finally:
+        for proc in (app, fake, *workers):
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+// Writes Brotli (.br) and gzip (.gz) variants of the compressible files in
+// dist/ after `vite build`; the backend serves them by Accept-Encoding
+// (backend/services/assets.py). Variants that are not smaller are skipped.
+import { readdirSync, readFileSync, statSync, writeFileSync } from "node:fs";
+import { extname, join } from "node:path";
+import { brotliCompressSync, gzipSync, constants } from "node:zlib";
+
+const COMPRESSIBLE = new Set([".html", ".js", ".mjs", ".css", ".svg", ".json", ".map", ".txt", ".wasm"]);
+const MIN_BYTES = 1024;
+
+function* files(dir) {
+  for (const name of readdirSync(dir)) {
+    const path = join(dir, name);
+    if (statSync(path).isDirectory()) yield* files(path);
+    else yield path;
+  }
+}
+
+let before = 0;
+let after = 0;
+for (const path of files(process.argv[2] || "dist")) {
+  if (!COMPRESSIBLE.has(extname(path))) continue;
+  const data = readFileSync(path);
+  if (data.length < MIN_BYTES) continue;
+  const br = brotliCompressSync(data, {
+    params: {
+      [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+      [constants.BROTLI_PARAM_SIZE_HINT]: data.length,
+    },
+  });
+  const gz = gzipSync(data, { level: 9 });
+  if (br.length < data.length) writeFileSync(`${path}.br`, br);
+  if (gz.length < data.length) writeFileSync(`${path}.gz`, gz);
+  before += data.length;
+  after += Math.min(br.length, data.length);
+}
+console.log(`precompressed ${before} bytes to ${after} (brotli)`);
@@ -1,4 +1,4 @@
-import { useState, useRef, useEffect } from "react";
+import { useState, useRef, useEffect, useMemo } from "react";
 import * as pdfjsLib from "pdfjs-dist";
 import pdfjsWorkerUrl from "pdfjs-dist/build/pdf.worker.min.mjs?url";
 pdfjsLib.GlobalWorkerOptions.workerSrc = pdfjsWorkerUrl;
@@ -121,6 +121,24 @@ function getCitations(data, path) {
   return null;
 }
 
+// Point citations at the page their quote was found on (GET /api/cases/:id/citations)
+function applyCitationChecks(data, report) {
+  if (!data?.citations || !report?.citations?.length) return data;
+  const citations = Object.fromEntries(Object.entries(data.citations).map(([k, v]) => [k, Array.isArray(v) ? [...v] : v]));
+  for (const check of report.citations) {
+    const list = citations[check.path];
+    if (!Array.isArray(list) || !list[check.position]) continue;
+    const verified = check.score >= 0.6;
+    list[check.position] = {
+      ...list[check.position],
+      page: verified ? check.verified_page : list[check.position].page,
+      citedPage: check.page,
+      verified,
+    };
+  }
+  return { ...data, citations };
+}
+
 function CiteBadge({ citations, onCiteClick }) {
   if (!citations || citations.length === 0) return null;
   return (
@@ -129,12 +147,13 @@ function CiteBadge({ citations, onCiteClick }) {
         <span
           key={i}
           onClick={(e) => { e.stopPropagation(); onCiteClick(c); }}
-          title={`${c.doc} p.${c.page}: "${c.quote}"`}
+          title={`${c.doc} p.${c.page}: "${c.quote}"${c.verified === false ? " (quote not found in the document)" : c.citedPage && c.citedPage !== c.page ? ` (cited as p.${c.citedPage})` : ""}`}
           style={{
             display: "inline-block", fontSize: 10, fontWeight: 700, padding: "1px 5px",
             borderRadius: 4, background: c.doc === "settlement" ? ACCENT_LIGHT : AMBER_BG,
             color: c.doc === "settlement" ? ACCENT : AMBER, cursor: "pointer",
             fontFamily: "monospace", lineHeight: 1.4, userSelect: "none",
+            opacity: c.verified === false ? 0.55 : 1,
           }}
         >
           p.{c.page}
@@ -508,7 +527,7 @@ function UploadModal({ open, onClose, onProcess, error }) {
 }
 
 /* ── Case Table ── */
-function CaseTable({ cases, loading, onSelectCase, searchQuery, onSearchChange }) {
+function CaseTable({ cases, total, loading, onLoadMore, onSelectCase, searchQuery, onSearchChange }) {
   const statusPill = (status) => {
     if (status === "completed") return <Pill bg={GREEN_BG} color={GREEN}>Completed</Pill>;
     if (status === "pending") return <Pill bg={AMBER_BG} color={AMBER}>Pending</Pill>;
@@ -543,7 +562,7 @@ function CaseTable({ cases, loading, onSelectCase, searchQuery, onSearchChange }
       <div style={{ padding: "18px 22px", display: "flex", alignItems: "center", justifyContent: "space-between", borderBottom: `1px solid ${BORDER}` }}>
         <div style={{ display: "flex", alignItems: "center", gap: 10 }}>
           <span style={{ fontSize: 16, fontWeight: 700, color: TEXT }}>Case List</span>
-          <Pill bg={ACCENT_LIGHT} color={ACCENT}>{cases.length} case{cases.length !== 1 ? "s" : ""}</Pill>
+          <Pill bg={ACCENT_LIGHT} color={ACCENT}>{total} case{total !== 1 ? "s" : ""}</Pill>
         </div>
         <div style={{ position: "relative" }}>
           <span style={{ position: "absolute", left: 10, top: "50%", transform: "translateY(-50%)", color: DIM, fontSize: 14 }}>&#128269;</span>
@@ -602,6 +621,14 @@ function CaseTable({ cases, loading, onSelectCase, searchQuery, onSearchChange }
               })}
             </tbody>
           </table>
+          {onLoadMore && (
+            <div style={{ textAlign: "center", padding: 14 }}>
+              <button onClick={onLoadMore}
+                style={{ background: WHITE, color: ACCENT, border: `1px solid ${BORDER}`, borderRadius: 8, padding: "8px 18px", fontSize: 13, fontWeight: 600, cursor: "pointer" }}>
+                Load more
+              </button>
+            </div>
+          )}
         </div>
       )}
     </Card>
@@ -609,7 +636,7 @@ function CaseTable({ cases, loading, onSelectCase, searchQuery, onSearchChange }
 }
 
 /* ── Home Screen ── */
-function HomeScreen({ onNewCase, cases, casesLoading, onSelectCase, error }) {
+function HomeScreen({ onNewCase, cases, casesTotal, casesLoading, onLoadMore, onSelectCase, error }) {
   const [search, setSearch] = useState("");
   return (
     <div style={{ padding: "32px 40px", maxWidth: 1280, margin: "0 auto" }}>
@@ -630,13 +657,13 @@ function HomeScreen({ onNewCase, cases, casesLoading, onSelectCase, error }) {
         </div>
       )}
 
-      <CaseTable cases={cases} loading={casesLoading} onSelectCase={onSelectCase} searchQuery={search} onSearchChange={setSearch} />
+      <CaseTable cases={cases} total={casesTotal} loading={casesLoading} onLoadMore={onLoadMore} onSelectCase={onSelectCase} searchQuery={search} onSearchChange={setSearch} />
     </div>
   );
 }
 
 /* ── Processing Screen ── */
-function ProcessingScreen({ progress, msg }) {
+function ProcessingScreen({ progress, msg, summary }) {
   return (
     <div style={{ display: "flex", alignItems: "center", justifyContent: "center", minHeight: "calc(100vh - 60px)" }}>
       <div style={{ textAlign: "center", maxWidth: 400, padding: 24 }}>
@@ -647,6 +674,7 @@ function ProcessingScreen({ progress, msg }) {
           <div style={{ height: "100%", borderRadius: 99, background: `linear-gradient(90deg, ${ACCENT}, #7C3AED)`, width: `${progress}%`, transition: "width .5s" }} />
         </div>
         <div style={{ fontSize: 12, color: DIM, fontFamily: "monospace" }}>{progress}%</div>
+        {summary && <div style={{ fontSize: 13, color: MUTED, marginTop: 24, textAlign: "left", lineHeight: 1.6 }}>{summary}</div>}
       </div>
     </div>
   );
@@ -682,7 +710,7 @@ function StarterQuestions({ data, onSend }) {
 }
 
 /* ── ChatPanel ── */
-function ChatPanel({ open, onClose, messages, loading, onSend, data }) {
+function ChatPanel({ open, onClose, messages, loading, onSend, data, sessions, sessionId, onSelectSession }) {
   const [input, setInput] = useState("");
   const messagesEndRef = useRef(null);
 
@@ -707,6 +735,17 @@ function ChatPanel({ open, onClose, messages, loading, onSend, data }) {
           <span style={{ fontSize: 16 }}>{"\uD83E\uDD16"}</span>
           <span style={{ fontSize: 14, fontWeight: 700, color: TEXT }}>Case Assistant</span>
         </div>
+        <div style={{ display: "flex", alignItems: "center", gap: 6, marginLeft: "auto", marginRight: 8, minWidth: 0 }}>
+          {sessions.length > 0 && (
+            <select value={sessionId ?? ""} disabled={loading} onChange={e => onSelectSession(e.target.value ? Number(e.target.value) : null)}
+              style={{ maxWidth: 170, fontSize: 12, color: TEXT_SEC, border: `1px solid ${BORDER}`, borderRadius: 6, padding: "3px 6px", background: WHITE }}>
+              {sessionId == null && <option value="">New chat</option>}
+              {sessions.map(s => <option key={s.id} value={s.id}>{s.title}</option>)}
+            </select>
+          )}
+          <button onClick={() => onSelectSession(null)} disabled={loading || sessionId == null}
+            style={{ fontSize: 12, fontWeight: 600, color: ACCENT, background: WHITE, border: `1px solid ${BORDER}`, borderRadius: 6, padding: "3px 8px", cursor: loading || sessionId == null ? "default" : "pointer" }}>New</button>
+        </div>
         <button onClick={onClose} style={{ background: "none", border: "none", cursor: "pointer", fontSize: 18, color: MUTED, padding: 4, lineHeight: 1 }}>&times;</button>
       </div>
 
@@ -760,26 +799,52 @@ function ChatPanel({ open, onClose, messages, loading, onSend, data }) {
   );
 }
 
-function Dashboard({ data, caseId, onBack, filenames }) {
+function Dashboard({ data: analysis, caseId, onBack, filenames }) {
+  const [citationChecks, setCitationChecks] = useState(null);
+  useEffect(() => {
+    if (!caseId) return;
+    fetch(`/api/cases/${caseId}/citations`).then(r => (r.ok ? r.json() : null)).then(setCitationChecks).catch(() => {});
+  }, [caseId]);
+  const data = useMemo(() => applyCitationChecks(analysis, citationChecks), [analysis, citationChecks]);
   const [tab, setTab] = useState("timeline");
   const [checks, setChecks] = useState({});
   const [pdfViewer, setPdfViewer] = useState(null);
   const [chatOpen, setChatOpen] = useState(false);
   const [chatMessages, setChatMessages] = useState([]);
   const [chatLoading, setChatLoading] = useState(false);
+  const [chatSessions, setChatSessions] = useState([]);
+  const [chatSessionId, setChatSessionId] = useState(null);
   const toggle = k => setChecks(p => ({ ...p, [k]: !p[k] }));
   const onCite = (c) => setPdfViewer(c);
 
+  // Conversations are stored per case on the server; reopening the panel resumes the latest one
+  const loadChatSessions = () =>
+    fetch(`/api/cases/${caseId}/chat/sessions`).then(r => (r.ok ? r.json() : { sessions: [] })).then(d => d.sessions);
+
+  const selectChatSession = async (id) => {
+    setChatSessionId(id);
+    if (id == null) { setChatMessages([]); return; }
+    const resp = await fetch(`/api/cases/${caseId}/chat/sessions/${id}`);
+    if (resp.ok) setChatMessages((await resp.json()).messages.map(m => ({ role: m.role, content: m.content })));
+  };
+
+  useEffect(() => {
+    if (!caseId || !chatOpen || chatSessions.length) return;
+    loadChatSessions().then(sessions => {
+      setChatSessions(sessions);
+      if (sessions.length && chatSessionId == null && chatMessages.length === 0) selectChatSession(sessions[0].id);
+    }).catch(() => {});
+  }, [caseId, chatOpen]);
+
   const sendChatMessage = async (text) => {
     const userMsg = { role: "user", content: text };
-    const newMessages = [...chatMessages, userMsg];
-    setChatMessages(newMessages);
+    setChatMessages(prev => [...prev, userMsg]);
     setChatLoading(true);
     try {
       const resp = await fetch(`/api/cases/${caseId}/chat`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ messages: newMessages }),
+        body: JSON.stringify({ message: text, session_id: chatSessionId }),
       });
       if (!resp.ok) throw new Error("Chat request failed");
       const reader = resp.body.getReader();
@@ -796,7 +861,9 @@ function Dashboard({ data, caseId, onBack, filenames }) {
         for (const line of lines) {
           if (!line.startsWith("data: ")) continue;
           const payload = JSON.parse(line.slice(6));
-          if (payload.type === "delta") {
+          if (payload.type === "session") {
+            setChatSessionId(payload.session_id);
+          } else if (payload.type === "delta") {
             assistantText += payload.text;
             setChatMessages(prev => {
               const updated = [...prev];
@@ -810,6 +877,7 @@ function Dashboard({ data, caseId, onBack, filenames }) {
       setChatMessages(prev => [...prev.filter(m => !(m.role === "assistant" && m.content === "")), { role: "assistant", content: "Sorry, something went wrong. Please try again." }]);
     } finally {
       setChatLoading(false);
+      loadChatSessions().then(setChatSessions).catch(() => {});
     }
   };
 
@@ -1172,6 +1240,9 @@ function Dashboard({ data, caseId, onBack, filenames }) {
         messages={chatMessages}
         loading={chatLoading}
         onSend={sendChatMessage}
+        sessions={chatSessions}
+        sessionId={chatSessionId}
+        onSelectSession={selectChatSession}
         data={data}
       />
 
@@ -1190,18 +1261,24 @@ export default function App() {
   const [error, setError] = useState(null);
   const [progress, setProgress] = useState(0);
   const [progressMsg, setProgressMsg] = useState("");
+  const [progressSummary, setProgressSummary] = useState(null);
   const [cases, setCases] = useState([]);
   const [casesLoading, setCasesLoading] = useState(true);
   const [activeCaseId, setActiveCaseId] = useState(null);
   const [showUpload, setShowUpload] = useState(false);
 
-  const fetchCases = async () => {
-    setCasesLoading(true);
+  const [casesCursor, setCasesCursor] = useState(null);
+  const [casesTotal, setCasesTotal] = useState(0);
+
+  const fetchCases = async (cursor = null) => {
+    if (!cursor) setCasesLoading(true);
     try {
-      const resp = await fetch("/api/cases");
+      const resp = await fetch(cursor ? `/api/cases?cursor=${encodeURIComponent(cursor)}` : "/api/cases");
       if (resp.ok) {
         const data = await resp.json();
-        setCases(data);
+        setCases(prev => cursor ? [...prev, ...data.items] : data.items);
+        setCasesCursor(data.next_cursor);
+        setCasesTotal(data.total);
       }
     } catch {
       // silently fail
@@ -1244,7 +1321,7 @@ export default function App() {
 
   const process = async (files) => {
     const hasBid = files.length > 1;
-    setStep("processing"); setError(null); setProgress(10); setProgressMsg("Uploading documents\u2026");
+    setStep("processing"); setError(null); setProgress(10); setProgressMsg("Uploading documents\u2026"); setProgressSummary(null);
     try {
       const form = new FormData();
       files.forEach(f => form.append("files", f));
@@ -1264,15 +1341,35 @@ export default function App() {
 
       setProgress(30); setProgressMsg(hasBid ? "AI cross-referencing Settlement vs. Bid\u2026" : "AI analyzing Settlement Agreement\u2026");
 
-      const analyzeResp = await fetch(`/api/cases/${id}/analyze`, { method: "POST" });
+      const analyzeResp = await fetch(`/api/cases/${id}/analyze?mode=async`, { method: "POST" });
       if (!analyzeResp.ok) {
         const err = await parseResp(analyzeResp, "Analysis failed");
         throw new Error(err.detail || "Analysis failed");
       }
-      const analyzeData = await parseResp(analyzeResp, "Analysis failed");
+      const job = await parseResp(analyzeResp, "Analysis failed");
+
+      // Sections arrive as the model finishes them; a reconnect replays them all
+      await new Promise((resolve, reject) => {
+        const events = new EventSource(job.events_url);
+        const received = new Set();
+        events.onmessage = (e) => {
+          const ev = JSON.parse(e.data);
+          if (ev.type === "section") {
+            received.add(ev.key);
+            if (ev.key === "summary" && typeof ev.value === "string") setProgressSummary(ev.value);
+            setProgress(Math.min(30 + received.size * 6, 88));
+            setProgressMsg(`Received ${ev.key.replace(/_/g, " ")}\u2026`);
+          } else if (ev.type === "completed") {
+            events.close(); resolve();
+          } else if (ev.type === "failed") {
+            events.close(); reject(new Error(ev.analysis_error || "Analysis failed"));
+          }
+        };
+      });
 
-      setProgress(90); setProgressMsg("Parsing analysis\u2026");
+      setProgress(90); setProgressMsg("Loading analysis\u2026");
 
+      const analyzeData = await parseResp(await fetch(`/api/cases/${id}`), "Analysis failed");
       if (analyzeData.analysis_status !== "completed" || !analyzeData.analysis_json) {
         throw new Error(analyzeData.analysis_error || "Analysis did not complete");
       }
@@ -1290,8 +1387,8 @@ export default function App() {
     <div style={{ minHeight: "100vh", background: BG, fontFamily: "'Inter', system-ui, -apple-system, sans-serif", color: TEXT }}>
       <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap" rel="stylesheet" />
       <NavBar activePage={step === "home" ? "cases" : ""} onNavigate={(id) => { if (id === "cases") goHome(); }} />
-      {step === "home" && <HomeScreen onNewCase={() => setShowUpload(true)} error={error} cases={cases} casesLoading={casesLoading} onSelectCase={selectCase} />}
-      {step === "processing" && <ProcessingScreen progress={progress} msg={progressMsg} />}
+      {step === "home" && <HomeScreen onNewCase={() => setShowUpload(true)} error={error} cases={cases} casesTotal={casesTotal} casesLoading={casesLoading} onLoadMore={casesCursor ? () => fetchCases(casesCursor) : null} onSelectCase={selectCase} />}
+      {step === "processing" && <ProcessingScreen progress={progress} msg={progressMsg} summary={progressSummary} />}
       {step === "dashboard" && <Dashboard data={result} caseId={activeCaseId} onBack={goHome} filenames={{ settlement: result?._settlementFilename, bid: result?._bidFilename }} />}
       <UploadModal open={showUpload} onClose={() => setShowUpload(false)} onProcess={process} error={error} />
     </div>
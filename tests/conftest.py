@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# backend.config reads these at import; point them at a scratch directory
+# before any test module imports the backend.
+_scratch = tempfile.mkdtemp(prefix="settlement-ops-tests-")
+os.environ.setdefault("DB_PATH", os.path.join(_scratch, "test.db"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_scratch, "uploads"))
@@ -0,0 +1,90 @@
+import json
+import random
+
+import pytest
+
+from backend.services.json_stream import MemberParser
+
+DOCUMENT = {
+    "case_name": 'Doe v. "Acme, Inc." {No. 1}',
+    "summary": "Braces } ] { [ and commas, inside strings; a backslash \\ and \\\"quotes\\\"",
+    "timeline": {"milestones": [{"label": "Notice", "date": "March 1, 2027"}], "notes": "}"},
+    "conflict_audit": [],
+    "count": 3,
+    "flag": True,
+}
+TEXT = json.dumps(DOCUMENT, indent=2)
+
+
+def feed_in_pieces(text: str, cuts: list[int]) -> tuple[MemberParser, list]:
+    parser = MemberParser()
+    members = []
+    bounds = [0, *sorted(cuts), len(text)]
+    for start, stop in zip(bounds, bounds[1:]):
+        members += parser.feed(text[start:stop])
+    return parser, members
+
+
+def test_whole_text_yields_every_member_in_order():
+    parser, members = feed_in_pieces(TEXT, [])
+    assert members == list(DOCUMENT.items())
+    assert parser.done
+
+
+def test_one_character_at_a_time():
+    parser, members = feed_in_pieces(TEXT, list(range(1, len(TEXT))))
+    assert members == list(DOCUMENT.items())
+    assert parser.done
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_chunk_boundaries(seed):
+    rng = random.Random(seed)
+    cuts = rng.sample(range(1, len(TEXT)), rng.randint(1, 40))
+    _, members = feed_in_pieces(TEXT, cuts)
+    assert members == list(DOCUMENT.items())
+
+
+def test_boundary_right_after_a_backslash():
+    text = '{"a": "x\\"}", "b": 1}'
+    cut = text.index("\\") + 1
+    _, members = feed_in_pieces(text, [cut])
+    assert members == [("a", 'x"}'), ("b", 1)]
+
+
+def test_member_is_emitted_as_soon_as_it_closes():
+    parser = MemberParser()
+    assert parser.feed('{"a": {"b": [1, 2]}') == []
+    assert parser.feed(", ") == [("a", {"b": [1, 2]})]
+    assert parser.feed('"c": "d"') == []
+    assert parser.feed("}") == [("c", "d")]
+
+
+def test_text_around_the_object_is_ignored():
+    parser, members = feed_in_pieces('```json\n{"a": 1}\n```\n{"b": 2}', [3, 12])
+    assert members == [("a", 1)]
+    assert parser.done
+    assert parser.feed('{"c": 3}') == []
+
+
+def test_empty_object():
+    parser, members = feed_in_pieces("{ }", [])
+    assert members == []
+    assert parser.done
+
+
+def test_malformed_member_raises():
+    parser = MemberParser()
+    with pytest.raises(ValueError):
+        parser.feed('{"a": tru, "b": 1}')
+
+
+def test_prefill_resume():
+    # stream_analysis feeds the prefilled sections, then the model's continuation
+    prefix = '{"a":{"x":"}"},"b":[1,2],'
+    parser = MemberParser()
+    assert parser.feed(prefix) == [("a", {"x": "}"}), ("b", [1, 2])]
+    assert parser.feed('"c": "3"') == []
+    assert parser.feed("}") == [("c", "3")]
+    assert parser.done
+    assert parser.result == {"a": {"x": "}"}, "b": [1, 2], "c": "3"}
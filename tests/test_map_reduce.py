@@ -0,0 +1,117 @@
+from backend.services.map_reduce import NOT_SPECIFIED, merge, page_ranges
+
+# Two excerpts of a 20-page settlement, overlapping on page 10
+RANGES = [(0, 10), (9, 20)]
+
+
+def milestone(label, date, **extra):
+    return {"label": label, "date": date, **extra}
+
+
+def test_page_ranges_overlap_and_cover_every_page():
+    assert page_ranges(10, size=40, overlap=1) == [(0, 10)]
+    assert page_ranges(100, size=40, overlap=1) == [(0, 40), (39, 79), (78, 100)]
+
+
+def test_milestones_are_deduplicated_by_label_and_date_in_page_order():
+    chunks = [
+        {"timeline": {"milestones": [
+            milestone("Preliminary Approval", "January 5, 2027"),
+            milestone("Notice Deadline", "March 1, 2027"),
+        ]}},
+        {"timeline": {"milestones": [
+            # Same milestone, repeated by the overlapping page with other formatting
+            milestone("notice deadline", "03/01/2027"),
+            milestone("Notice Deadline", "April 1, 2027"),
+            milestone("Final Approval Hearing", "June 10, 2027"),
+        ]}},
+    ]
+    merged = merge(chunks, RANGES)["timeline"]["milestones"]
+    assert [(m["label"], m["date"]) for m in merged] == [
+        ("Preliminary Approval", "January 5, 2027"),
+        ("Notice Deadline", "March 1, 2027"),
+        ("Notice Deadline", "April 1, 2027"),
+        ("Final Approval Hearing", "June 10, 2027"),
+    ]
+
+
+def test_checklist_items_are_deduplicated_by_task():
+    chunks = [
+        {"operational_checklist": {"notice_phase": [
+            {"task": "Mail the Class Notice", "details": "First-class mail"},
+        ]}},
+        {"operational_checklist": {
+            "notice_phase": [
+                {"task": "mail the class notice.", "details": "Repeated"},
+                {"task": "Launch the settlement website", "details": ""},
+            ],
+            "payment": [{"task": "Mail the Class Notice", "details": "Other category"}],
+        }},
+    ]
+    checklist = merge(chunks, RANGES)["operational_checklist"]
+    assert [i["task"] for i in checklist["notice_phase"]] == [
+        "Mail the Class Notice", "Launch the settlement website",
+    ]
+    assert checklist["notice_phase"][0]["details"] == "First-class mail"
+    assert [i["task"] for i in checklist["payment"]] == ["Mail the Class Notice"]
+    assert checklist["data_intake"] == []
+
+
+def test_scalars_prefer_real_values_over_placeholders():
+    chunks = [
+        {"case_name": "[Not Specified]", "class_specs": {"subclasses": 1}},
+        {"case_name": "Doe v. Acme", "class_specs": {"subclasses": 3}},
+    ]
+    merged = merge(chunks, RANGES)
+    assert merged["case_name"] == "Doe v. Acme"
+    assert merged["class_specs"]["subclasses"] == 3
+    assert merged["jurisdiction"] == NOT_SPECIFIED
+
+
+def test_settlement_citation_pages_become_global():
+    chunks = [
+        {"case_name": "Doe v. Acme",
+         "citations": {"case_name": [{"doc": "settlement", "page": 1, "quote": "a"}]}},
+        {"fund_logistics": {"gross_settlement": "$1,000,000"},
+         "citations": {"fund_logistics.gross_settlement": [
+             {"doc": "settlement", "page": 3, "quote": "b"},  # page 3 of the excerpt
+             {"doc": "bid", "page": 3, "quote": "c"},  # bid pages are already global
+             {"doc": "settlement", "page": 15, "quote": "d"},  # past the excerpt: already global
+         ]}},
+    ]
+    citations = merge(chunks, RANGES)["citations"]
+    assert citations["case_name"] == [{"doc": "settlement", "page": 1, "quote": "a"}]
+    assert [(c["doc"], c["page"]) for c in citations["fund_logistics.gross_settlement"]] == [
+        ("settlement", 12), ("bid", 3), ("settlement", 15),
+    ]
+
+
+def test_list_citations_follow_items_to_their_merged_position():
+    chunks = [
+        {"timeline": {"milestones": [milestone("Notice Deadline", "March 1, 2027")]},
+         "citations": {"timeline.milestones[0].date": [{"doc": "settlement", "page": 10, "quote": "a"}]}},
+        {"timeline": {"milestones": [
+            milestone("Final Approval Hearing", "June 10, 2027"),
+            milestone("Notice Deadline", "March 1, 2027"),
+        ]},
+         "citations": {
+             "timeline.milestones[0].date": [{"doc": "settlement", "page": 2, "quote": "b"}],
+             "timeline.milestones[1].date": [{"doc": "settlement", "page": 1, "quote": "a"}],
+         }},
+    ]
+    citations = merge(chunks, RANGES)["citations"]
+    # The duplicate's citation is page 1 of the second excerpt, the same global page 10
+    assert citations["timeline.milestones[0].date"] == [{"doc": "settlement", "page": 10, "quote": "a"}]
+    assert citations["timeline.milestones[1].date"] == [{"doc": "settlement", "page": 11, "quote": "b"}]
+
+
+def test_citations_of_scalars_taken_from_another_excerpt_are_dropped():
+    chunks = [
+        {"case_name": "Doe v. Acme",
+         "citations": {"case_name": [{"doc": "settlement", "page": 1, "quote": "a"}]}},
+        {"case_name": "Doe v. Acme Corp.",
+         "citations": {"case_name": [{"doc": "settlement", "page": 4, "quote": "b"}]}},
+    ]
+    merged = merge(chunks, RANGES)
+    assert merged["case_name"] == "Doe v. Acme"
+    assert merged["citations"]["case_name"] == [{"doc": "settlement", "page": 1, "quote": "a"}]
@@ -0,0 +1,104 @@
+import contextlib
+import json
+from types import SimpleNamespace
+
+import anthropic
+import pytest
+
+from backend.config import ANALYSIS_STREAM_RESUMES
+from backend.database import connect, init_db
+from backend.services import analysis, case_data, llm
+
+ANALYSIS = {"case_name": "Doe v. Acme", "summary": "A {braced} summary", "count": 2}
+TEXT = json.dumps(ANALYSIS)
+
+
+class FakeStream:
+    def __init__(self, chunks: list[str], error: Exception = None):
+        self.chunks = chunks
+        self.error = error
+        self.current_message_snapshot = SimpleNamespace(usage=None)
+
+    @property
+    def text_stream(self):
+        yield from self.chunks
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def conn():
+    init_db()
+    conn = connect()
+    yield conn
+    conn.execute("DELETE FROM analysis_checkpoints")
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Requests sent to the fake ``llm.stream_message``; tests append the streams to serve."""
+    sent = []
+    streams = []
+
+    @contextlib.contextmanager
+    def stream_message(**params):
+        sent.append(params)
+        stream = streams.pop(0)
+        if isinstance(stream, Exception):
+            raise stream
+        yield stream
+
+    monkeypatch.setattr(llm, "stream_message", stream_message)
+    return SimpleNamespace(sent=sent, streams=streams)
+
+
+def _params():
+    return {"model": "m", "max_tokens": 1, "messages": [{"role": "user", "content": "analyze"}]}
+
+
+def test_dropped_stream_resumes_after_checkpointed_sections(conn, calls):
+    cut = TEXT.index('"count"')
+    calls.streams += [
+        FakeStream([TEXT[:10], TEXT[10:cut]], error=RuntimeError("connection reset")),
+        FakeStream([TEXT[cut:]]),
+    ]
+    seen = []
+    result = analysis.stream_analysis(conn, 1, _params(), lambda k, v: seen.append(k))
+
+    assert result == ANALYSIS
+    assert seen == ["case_name", "summary", "count"]
+    prefill = calls.sent[1]["messages"][-1]
+    assert prefill["role"] == "assistant"
+    assert json.loads(prefill["content"].rstrip(",") + "}") == {
+        "case_name": ANALYSIS["case_name"], "summary": ANALYSIS["summary"],
+    }
+
+
+def test_interrupted_attempt_is_prefilled_only_in_the_same_input_mode(conn, calls):
+    cut = TEXT.index('"summary"')
+    calls.streams += [FakeStream([TEXT[:cut]], error=RuntimeError("dropped"))] * (ANALYSIS_STREAM_RESUMES + 1)
+    with pytest.raises(RuntimeError):
+        analysis.stream_analysis(conn, 1, _params(), input_mode="hybrid")
+    assert case_data.load_checkpoints(conn, 1, f"{analysis.PROMPT_VERSION}:hybrid")
+
+    calls.sent.clear()
+    calls.streams[:] = [FakeStream([TEXT])]
+    assert analysis.stream_analysis(conn, 1, _params(), input_mode="pdf") == ANALYSIS
+    assert calls.sent[0]["messages"][-1]["role"] == "user"
+
+
+def test_client_errors_are_not_resent(conn, calls):
+    # Built without an HTTP response; only the status is consulted
+    error = anthropic.BadRequestError.__new__(anthropic.BadRequestError)
+    error.status_code = 400
+    calls.streams += [error, FakeStream([TEXT])]
+    with pytest.raises(anthropic.BadRequestError):
+        analysis.stream_analysis(conn, 1, _params())
+    assert len(calls.sent) == 1
+
+
+def test_result_is_built_from_sections_not_trailing_prose(conn, calls):
+    calls.streams += [FakeStream(["```json\n", TEXT, "\n```\nNote: {see above}."])]
+    assert analysis.stream_analysis(conn, 1, _params()) == ANALYSIS